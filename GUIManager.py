@@ -16,6 +16,9 @@ import exhibit.visualization
 from exhibit.visualization import visualization_driver as vd
 import webbrowser
 import importlib
+import subprocess
+import sys
+from exhibit.shared.config import Config
 
 
 mqttActive = False
@@ -23,6 +26,7 @@ gameActive = False
 aiActive = False
 visualizationActive = False
 emulate3DActive = False
+cameraProcess = None
 killObject = "endThreads"
 q = Queue()
 q.put('noneActive')
@@ -77,10 +81,24 @@ def startGameDriver():
     # exhibit.game.game_driver.reload(gd)
     varText.update(value=emptyString)
     importlib.reload(gd)
+    startCameraDriver()
     # functionT = gd.main
     threading.Thread(target=gd.main, args=(q,), name='gameThread', daemon=True).start()
     time.sleep(0.5)
 
+def startCameraDriver():
+    # The camera tracker runs as its own process so its CPU work stays off the game loop's core
+    global cameraProcess
+    if Config.instance().USE_DEPTH_CAMERA and Config.instance().CAMERA_SERVICE:
+        if cameraProcess is None or cameraProcess.poll() is not None:
+            cameraProcess = subprocess.Popen([sys.executable, "-m", "exhibit.camera.camera_driver"])
+
+def stopCameraDriver():
+    global cameraProcess
+    if cameraProcess is not None:
+        cameraProcess.terminate()
+        cameraProcess = None
+
 def startAIDriver():
     threading.Thread(target=ai_driver.main, args=(q_ai,), name='ai_thread', daemon=True).start()
 
@@ -224,6 +242,7 @@ while True:
     #    print(event, values)
 q.put("endThreads")
 q_ai.put("endThreads")
+stopCameraDriver()
 closeEmulate3D()
 # if z.is_alive:
 #     z.join()
@@ -8,6 +8,8 @@ import numpy as np
 import cv2
 import threading
 from exhibit.shared.utils import Timer
+from exhibit.shared.latency import LatencyRecorder
+from exhibit.shared.activation_packet import ActivationStreamWriter
 
 from queue import Queue
 
@@ -42,6 +44,12 @@ class AIDriver:
             temp = AIDriver.level
             AIDriver.level = self.state.game_level
             print(f'level changed to {AIDriver.level}')
+            if self.state.predictor is not None:
+                print(f'predicting {self.state.predictor.horizon()} frames ahead')
+            print(self.state.latency.report())
+            print(self.state.backlog_report())
+            self.state.latency.reset()
+            self.state.reset_backlog()
             if self.state.game_level == 0:
                 self.agent = self.agent1
                 #self.agent1.load(AIDriver.MODEL_1)
@@ -62,6 +70,11 @@ class AIDriver:
         diff_state = self.state.render_latest_diff()
         
         current_frame_id = self.state.frame
+        received = self.state.frame_received
+        self.state.take_request()
+        inference_start = LatencyRecorder.now()
+        if received is not None:
+            self.state.latency.record("queue", inference_start - received)
 
         # Compute the number of frames that have passed since the last frame
         #frame_diff = self.state.frame - self.last_acted_frame
@@ -73,16 +86,32 @@ class AIDriver:
         # Infer on flattened state vector
         x = diff_state.ravel()
         action, _, probs = self.agent.act(x)
+        self.state.latency.record_since("inference", inference_start)
+        # Time spent on this frame inside the AI process, so the game can split its round trip into AI and network
+        ai_time = LatencyRecorder.now() - received if received is not None else None
         # Publish prediction
         if self.paddle1:
-            self.state.publish("paddle1/action", {"action": str(action)})
+            self.state.publish("paddle1/action", {"action": str(action), "frame": current_frame_id, "ai_time": ai_time})
             self.state.publish("paddle1/frame", {"frame": current_frame_id})
         elif self.paddle2:
-            self.state.publish("paddle2/action", {"action": str(action)})
+            self.state.publish("paddle2/action", {"action": str(action), "frame": current_frame_id, "ai_time": ai_time})
             self.state.publish("paddle2/frame", {"frame": current_frame_id})
+        self.state.latency.record("ai_total", ai_time)
 
-        model_activation = self.agent.get_activation_packet()
-        self.state.publish("ai/activation", model_activation)
+        activation_start = LatencyRecorder.now()
+
+        level = self.state.game_level if self.state.game_level is not None else 0
+        if self.config.BINARY_ACTIVATION_PACKETS:
+            model_activation = self.agent.get_binary_activation_packet(frame=current_frame_id, level=level)
+            self.state.publish_binary("ai/activation", model_activation)
+        else:
+            model_activation = self.agent.get_activation_packet()
+            self.state.publish("ai/activation", model_activation)
+        if self.activation_log is not None:
+            if not self.config.BINARY_ACTIVATION_PACKETS:
+                model_activation = self.agent.get_binary_activation_packet(frame=current_frame_id, level=level)
+            self.activation_log.write(model_activation)
+        self.state.latency.record_since("activation", activation_start)
 
         #if len(self.frame_diffs) > 10:
         #    print(
@@ -91,20 +120,29 @@ class AIDriver:
         #    self.frame_diffs = []
         #Timer.stop('inf')
 
+    def inference_step(self):
+        """
+        One pass of the inference loop: infer on the latest frame request, or sleep briefly if it was already acted on
+        :return: True if an inference was published
+        """
+        current_frame_id = self.state.frame
+        if self.last_acted_frame == current_frame_id:
+            time.sleep(0.001)
+            return False
+        self.publish_inference()
+        self.last_acted_frame = current_frame_id
+        return True
+
     def inference_loop(self):
         while True:
-            current_frame_id = self.state.frame
-            if self.last_acted_frame == current_frame_id:
-                time.sleep(0.001)
-            else:
-                self.publish_inference()
-                self.last_acted_frame = current_frame_id
+            self.inference_step()
 
     def __init__(self, config=Config.instance(), paddle1=True, in_q = Queue()):
         
         self.q = in_q
         self.config = config
         self.paddle1 = paddle1
+        self.activation_log = ActivationStreamWriter.from_config(config)
         self.paddle2 = not self.paddle1
 
         # We have all 3 agents already loaded instead of loading between levels. Saves a lot of time and prevents freezing
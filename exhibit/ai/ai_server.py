@@ -0,0 +1,211 @@
+import sys
+import threading
+import time
+
+from exhibit.ai.ai_driver import AIDriver
+from exhibit.ai.ai_subscriber import AISubscriber
+from exhibit.ai.batch import InferenceRequest, run_batch
+from exhibit.ai.model import PGAgent
+from exhibit.shared.activation_packet import ActivationStreamWriter, encode_activation_packet
+from exhibit.shared.config import Config
+from exhibit.shared.latency import LatencyRecorder
+from exhibit.shared.topics import game_topic, split_game_topic
+from exhibit.shared.transport import MqttTransport
+
+"""
+Multi-tenant AI server.
+
+Where AIDriver plays one paddle of one game on the bare topics, AIServer subscribes to the namespaced topics of any
+number of games (games/<id>/..., see exhibit/shared/topics.py) and keeps an AISubscriber per game as its state. Each
+tick takes every game/frame request that arrived since the last one, for every paddle its game asked for (AI_PADDLES
+on the game side), and runs them through one forward pass per model (see exhibit/ai/batch.py). Replies go back to
+each game's namespace: games/<id>/paddle1/action, games/<id>/paddle1/frame and games/<id>/ai/activation
+(games/<id>/ai/activation/paddle2 for the second paddle of an AI vs AI game).
+
+Set GAME_ID on every station, then run `python -m exhibit.ai.ai_server [broker host]`.
+"""
+
+PADDLE_ACTIVATION_TOPICS = {"paddle1": "ai/activation", "paddle2": "ai/activation/paddle2"}
+GAME_TOPICS = ["puck/position", "player1/score", "player2/score", "paddle1/position", "paddle2/position",
+               "game/level", "game/frame"]
+
+
+def load_agents(config):
+    """
+    Load the model of every level, once per distinct file so levels sharing a model also share a batch
+    :return: dict of level -> PGAgent
+    """
+    loaded = {}
+    agents = {}
+    for level, path in [(1, AIDriver.MODEL_1), (2, AIDriver.MODEL_2), (3, AIDriver.MODEL_3)]:
+        if path not in loaded:
+            loaded[path] = PGAgent(config.CUSTOM_STATE_SIZE, config.CUSTOM_ACTION_SIZE, verbose=False)
+            loaded[path].load(path)
+        agents[level] = loaded[path]
+    return agents
+
+
+class AIServer:
+    def __init__(self, config=Config.instance(), agents=None, transport=None, host="localhost", port=1883):
+        """
+        :param agents: dict of level -> agent with act_batch, loaded from AIDriver's model files by default
+        :param transport: message transport, an MqttTransport to host:port by default
+        """
+        self.config = config
+        self.agents = agents if agents is not None else load_agents(config)
+        self.tenants = {}  # game id -> AISubscriber holding that game's state
+        self.pending = set()  # game ids with a game/frame request that hasn't been inferred on
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = True
+        self.inference_thread = None
+        self.latency = LatencyRecorder("ai_server", enabled=config.LATENCY_HISTOGRAMS)
+        self.ticks = 0
+        self.forward_passes = 0
+        self.inferences = 0
+        self.activation_log = ActivationStreamWriter.from_config(config)
+        self.transport = transport if transport is not None else MqttTransport("ai_server", host=host, port=port)
+        self.transport.on_connect = self.on_connect
+        self.transport.on_message = self.on_message
+
+    def on_connect(self):
+        for topic in GAME_TOPICS:
+            self.transport.subscribe(game_topic("+", topic))
+        self.transport.subscribe("diagnostics/latency")
+
+    def on_message(self, full_topic, payload):
+        game_id, topic = split_game_topic(full_topic)
+        if game_id is None:
+            if topic == "diagnostics/latency":
+                print(self.report())
+                self.transport.publish("diagnostics/latency/ai_server", self.summary())
+            return
+        with self.lock:
+            tenant = self.tenants.get(game_id)
+            if tenant is None:
+                print(f"Serving game {game_id}")
+                tenant = self.tenants[game_id] = AISubscriber(self.config, connect=False)
+            tenant.handle(topic, payload)
+            if topic == "game/frame":
+                self.pending.add(game_id)
+                self.wake.set()
+
+    def agent_for_level(self, level):
+        return self.agents.get(level, self.agents[1])
+
+    def collect(self):
+        """
+        Take every pending request, rendered for each paddle its game wants played
+        :return: list of InferenceRequest
+        """
+        with self.lock:
+            self.wake.clear()
+            pending, self.pending = self.pending, set()
+            requests = []
+            for game_id in pending:
+                tenant = self.tenants[game_id]
+                tenant.take_request()
+                level = tenant.game_level if tenant.game_level is not None else 0
+                for paddle in tenant.paddles:
+                    state = tenant.render_latest_diff(paddle).ravel()
+                    requests.append(InferenceRequest(game_id, paddle, tenant.frame, tenant.frame_received, state,
+                                                     level))
+            return requests
+
+    def tick(self):
+        """
+        Infer and answer all pending requests in one batch
+        :return: number of requests answered
+        """
+        requests = self.collect()
+        if not requests:
+            return 0
+        inference_start = LatencyRecorder.now()
+        for request in requests:
+            if request.received is not None:
+                self.latency.record("queue", inference_start - request.received)
+        results = run_batch(requests, self.agent_for_level)
+        self.latency.record_since("inference", inference_start)
+        self.ticks += 1
+        self.forward_passes += len({id(self.agent_for_level(request.level)) for request in requests})
+        self.inferences += len(requests)
+
+        for request, action, hidden, output in results:
+            ai_time = LatencyRecorder.now() - request.received if request.received is not None else None
+            self.publish(request.game_id, f"{request.paddle}/action",
+                         {"action": str(action), "frame": request.frame, "ai_time": ai_time})
+            self.publish(request.game_id, f"{request.paddle}/frame", {"frame": request.frame})
+            self.latency.record("ai_total", ai_time)
+
+        activation_start = LatencyRecorder.now()
+        for request, action, hidden, output in results:
+            packet = encode_activation_packet(request.state, hidden, output, frame=request.frame, level=request.level)
+            topic = game_topic(request.game_id, PADDLE_ACTIVATION_TOPICS[request.paddle])
+            if self.config.BINARY_ACTIVATION_PACKETS:
+                self.transport.publish_binary(topic, packet)
+            else:
+                self.transport.publish(topic, [request.state.tolist(), hidden.tolist(), output.tolist()])
+            if self.activation_log is not None:
+                self.activation_log.write(packet)
+        self.latency.record_since("activation", activation_start)
+        return len(requests)
+
+    def publish(self, game_id, topic, message):
+        self.transport.publish(game_topic(game_id, topic), message)
+
+    def inference_loop(self):
+        while self.running:
+            if not self.wake.wait(0.1):
+                continue
+            # Let requests from the other games that are due about now join this batch
+            if self.config.AI_SERVER_GATHER > 0:
+                time.sleep(self.config.AI_SERVER_GATHER)
+            self.tick()
+
+    def summary(self):
+        """
+        :return: latency summary plus batching and per-game backlog counts
+        """
+        summary = self.latency.summary()
+        summary["batching"] = {"ticks": self.ticks, "forward_passes": self.forward_passes,
+                               "inferences": self.inferences}
+        with self.lock:
+            summary["games"] = {game_id: {"requests": tenant.requests, "superseded": tenant.superseded}
+                                for game_id, tenant in self.tenants.items()}
+        return summary
+
+    def report(self):
+        """
+        :return: human readable latency, batching and backlog report
+        """
+        lines = [self.latency.report()]
+        per_pass = self.inferences / max(self.forward_passes, 1)
+        lines.append(f"Batching: {self.inferences} inferences in {self.forward_passes} forward passes over "
+                     f"{self.ticks} ticks ({per_pass:.2f} per pass)")
+        with self.lock:
+            for game_id, tenant in sorted(self.tenants.items()):
+                lines.append(f"  game {game_id}: {tenant.backlog_report()}")
+        return "\n".join(lines)
+
+    def start(self):
+        self.inference_thread = threading.Thread(target=self.inference_loop, name="ai-server-inference", daemon=True)
+        self.inference_thread.start()
+        self.transport.loop_forever()
+
+    def stop(self):
+        self.running = False
+        self.transport.disconnect()
+
+
+def main(host="localhost"):
+    config = Config.instance()
+    server = AIServer(config=config, host=host)
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        print(server.report())
+        server.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "localhost")
@@ -1,48 +1,89 @@
 import time
 
-import paho.mqtt.client as mqtt
 import numpy as np
-import json
 
 from exhibit.shared import utils
 from exhibit.shared.config import Config
+from exhibit.ai.predictor import StatePredictor
+from exhibit.shared.latency import LatencyRecorder
+from exhibit.shared.transport import make_transport
 import cv2
 import math
 
 class AISubscriber:
     """
-    MQTT compliant game state subscriber.
+    Game state subscriber, over MQTT or in process (see exhibit/shared/transport.py).
     Always stores the latest up-to-date combination of game state factors.
     """
 
-    def on_connect(self, client, userdata, flags, rc):
-        print("Connected with result code " + str(rc))
-        client.subscribe("puck/position")
-        client.subscribe("player1/score")
-        client.subscribe("player2/score")
-        client.subscribe("paddle1/position")
-        client.subscribe("paddle2/position")
-        client.subscribe("game/level")
-        client.subscribe("game/frame")
-
-    def on_message(self, client, userdata, msg):
-        topic = msg.topic
-        payload = json.loads(msg.payload)
+    def on_connect(self):
+        transport = self.transport
+        transport.subscribe("puck/position")
+        transport.subscribe("player1/score")
+        transport.subscribe("player2/score")
+        transport.subscribe("paddle1/position")
+        transport.subscribe("paddle2/position")
+        transport.subscribe("game/level")
+        transport.subscribe("game/frame")
+        transport.subscribe("diagnostics/latency")
+
+    def handle(self, topic, payload):
+        """
+        Update the game state from one message. Called by the transport, and by AIServer, which keeps a subscriber
+        per game.
+        :param topic: topic within the game, without any games/<id>/ namespace
+        :param payload: decoded message
+        """
         if topic == "puck/position":
             self.puck_x = payload["x"]
             self.puck_y = payload["y"]
+            if self.predictor is not None:
+                self.predictor.observe_ball(self.puck_x, self.puck_y)
         if topic == "paddle1/position":
             self.bottom_paddle_x = payload["position"]
         if topic == "paddle2/position":
             self.top_paddle_x = payload["position"]
         if topic == "game/level":
             self.game_level = payload["level"]
+            if self.predictor is not None:
+                self.predictor.reset()
         if topic == "game/frame":
+            self.frame_received = LatencyRecorder.now()
+            self.requests += 1
+            if self.request_pending:
+                # The previous request was never inferred on: the AI can't keep up with the game
+                self.superseded += 1
+            self.request_pending = True
             self.frame = payload["frame"]
+            if self.predictor is not None:
+                self.predictor.observe_round_trip(payload.get("rtt"))
+                self.predictor.observe_request()
             if Config.instance().NETWORK_TIMESTAMPS:
                 print(f'{time.time_ns() // 1_000_000} F{self.frame} RECV GM->AI')
-            self.trailing_frame = self.latest_frame
-            self.latest_frame = self.render_latest_preprocessed()
+            # A shared AI server can play either paddle, or both in AI vs AI games
+            self.paddles = payload.get("paddles", self.paddles)
+            current = self.snapshot()
+            shift = self.ball_shift()
+            for paddle in self.paddles:
+                bottom = paddle == "paddle2"
+                latest = self.render_latest_preprocessed(bottom=bottom, state=current, shift=shift)
+                if self.predictor is None:
+                    trailing = self.frames.get(paddle, (None, None))[1]
+                elif self.request_state is not None:
+                    # Move the previous request's ball by the same amount, so the diff shows the observed motion
+                    # moved ahead in time rather than a mix of predicted and observed positions
+                    trailing = self.render_latest_preprocessed(bottom=bottom, state=self.request_state, shift=shift)
+                else:
+                    trailing = None
+                self.frames[paddle] = (trailing, latest)
+            self.request_state = current
+            self.latency.record_since("render", self.frame_received)
+        if topic == "diagnostics/latency":
+            print(self.latency.report())
+            print(self.backlog_report())
+            summary = self.latency.summary()
+            summary["backlog"] = {"requests": self.requests, "superseded": self.superseded}
+            self.publish("diagnostics/latency/ai", summary)
 
     def draw_rect(self, screen, x, y, w, h, color):
         """
@@ -65,28 +106,60 @@ class AISubscriber:
         """
         Use the state subscriber to send a message since we have the connection open anyway
         :param topic: MQTT topic
-        :param message: payload object, will be JSON stringified
+        :param message: payload object, JSON stringified over MQTT and passed as is in process
         :return:
         """
         if topic == 'paddle1/frame' and Config.instance().NETWORK_TIMESTAMPS:
             print(f'{time.time_ns() // 1_000_000} F{message["frame"]} SEND AI->GM')
-        p = json.dumps(message)
-        self.client.publish(topic, payload=p, qos=qos)
+        self.transport.publish(topic, message, qos=qos)
+
+    def publish_binary(self, topic, payload, qos=0):
+        """
+        Send a raw bytes payload without JSON encoding
+        :param topic: MQTT topic
+        :param payload: bytes
+        :return:
+        """
+        self.transport.publish_binary(topic, payload, qos=qos)
+
+    def snapshot(self):
+        """
+        :return: (puck x, puck y, bottom paddle x, top paddle x) as last received
+        """
+        return self.puck_x, self.puck_y, self.bottom_paddle_x, self.top_paddle_x
 
-    def render_latest(self, bottom=False):
+    def ball_shift(self):
+        """
+        How far the predictor moves the ball from its latest position, to where it will be when this inference is
+        applied rather than where it was when requested
+        :return: (dx, dy), zero without a predictor or a prediction
+        """
+        if self.predictor is None:
+            return 0, 0
+        predicted = self.predictor.predict_ball()
+        if predicted is None:
+            return 0, 0
+        return predicted[0] - self.puck_x, predicted[1] - self.puck_y
+
+    def render_latest(self, bottom=False, state=None, shift=(0, 0)):
         """
         Render the current game pixel state by hand in an ndarray
+        :param state: snapshot() to render, the current state by default
+        :param shift: (dx, dy) added to the ball position, see ball_shift
         :return: ndarray of RGB screen pixels
         """
+        puck_x, puck_y, bottom_paddle_x, top_paddle_x = state if state is not None else self.snapshot()
+        puck_x += shift[0]
+        puck_y += shift[1]
         screen = np.zeros((self.config.HEIGHT, self.config.WIDTH, 3), dtype=np.float32)
         screen[:, :] = (140, 60, 0)  # BGR for a deep blue
         if bottom:
-            self.draw_rect(screen, self.bottom_paddle_x - self.config.PADDLE_WIDTH / 2, self.config.BOTTOM_PADDLE_Y - (self.config.PADDLE_HEIGHT / 2),
+            self.draw_rect(screen, bottom_paddle_x - self.config.PADDLE_WIDTH / 2, self.config.BOTTOM_PADDLE_Y - (self.config.PADDLE_HEIGHT / 2),
                   self.config.PADDLE_WIDTH, self.config.PADDLE_HEIGHT, 255)
         else:
-            self.draw_rect(screen, self.top_paddle_x - self.config.PADDLE_WIDTH / 2, self.config.TOP_PADDLE_Y - (self.config.PADDLE_HEIGHT / 2),
+            self.draw_rect(screen, top_paddle_x - self.config.PADDLE_WIDTH / 2, self.config.TOP_PADDLE_Y - (self.config.PADDLE_HEIGHT / 2),
                      self.config.PADDLE_WIDTH, self.config.PADDLE_HEIGHT, 255)
-        self.draw_rect(screen, self.puck_x - self.config.BALL_DIAMETER / 2, self.puck_y - (self.config.BALL_DIAMETER / 2),
+        self.draw_rect(screen, puck_x - self.config.BALL_DIAMETER / 2, puck_y - (self.config.BALL_DIAMETER / 2),
                   self.config.BALL_DIAMETER, self.config.BALL_DIAMETER, 255)
 
         if bottom:  # Flip screen vertically because the model is trained as the top paddle
@@ -95,24 +168,46 @@ class AISubscriber:
         #cv2.imwrite(f"frame{self.frame}{appendix}.png", screen)
         return screen
 
-    def render_latest_preprocessed(self):
+    def render_latest_preprocessed(self, bottom=False, state=None, shift=(0, 0)):
         """
         Render the current game pixel state by hand in an ndarray
         Scaled down for AI consumption
+        :param bottom: render for the bottom paddle (flipped, see render_latest)
+        :param state: snapshot() to render, the current state by default
+        :param shift: (dx, dy) added to the ball position
         :return: ndarray of RGB screen pixels
         """
-        latest = self.render_latest()
+        latest = self.render_latest(bottom=bottom, state=state, shift=shift)
         return utils.preprocess(latest)
 
-    def render_latest_diff(self):
+    def render_latest_diff(self, paddle="paddle1"):
         """
         Render the current game pixel state, subtracted from the previous
         Guarantees that adjacent frames are used for the diff
+        :param paddle: paddle the state is rendered for
         :return: ndarray of RGB screen pixels
         """
-        if self.trailing_frame is None:
-            return self.latest_frame
-        return self.latest_frame - self.trailing_frame
+        trailing_frame, latest_frame = self.frames.get(paddle, (None, None))
+        if trailing_frame is None:
+            return latest_frame
+        return latest_frame - trailing_frame
+
+    def take_request(self):
+        """
+        Mark the latest game/frame request as being inferred on. Called by the driver before each inference.
+        """
+        self.request_pending = False
+
+    def backlog_report(self):
+        """
+        :return: human readable count of requests skipped because the previous inference hadn't finished
+        """
+        share = self.superseded / max(self.requests, 1) * 100
+        return f"Frame requests: {self.requests} received, {self.superseded} superseded before inference ({share:.1f}%)"
+
+    def reset_backlog(self):
+        self.requests = 0
+        self.superseded = 0
 
     def ready(self):
         """
@@ -125,25 +220,33 @@ class AISubscriber:
                and self.top_paddle_x is not None \
                and self.game_level is not None
 
-    def __init__(self, config, trigger_event=None):
+    def __init__(self, config, trigger_event=None, connect=True):
         """
         :param trigger_event: Function to call each time a new state is received
+        :param connect: open a transport. AIServer passes False and feeds messages to handle() itself.
         """
         self.config = config
         self.trigger_event = trigger_event
-        self.client = mqtt.Client(client_id="ai_module")
-        self.client.on_connect = lambda client, userdata, flags, rc : self.on_connect(client, userdata, flags, rc)
-        self.client.on_message = lambda client, userdata, msg : self.on_message(client, userdata, msg)
-        print("Initializing subscriber")
-        self.client.connect_async("localhost", port=1883, keepalive=60)
+        self.transport = None
+        if connect:
+            print("Initializing subscriber")
+            self.transport = make_transport(config, "ai_module")
+            self.transport.on_connect = self.on_connect
+            self.transport.on_message = self.handle
         self.puck_x = None
         self.puck_y = None
         self.bottom_paddle_x = None
         self.top_paddle_x = None
         self.game_level = None
         self.frame = 0
-        self.latest_frame = None
-        self.trailing_frame = None
+        self.frame_received = None
+        self.paddles = ["paddle1"]  # Paddles rendered for on each game/frame request
+        self.frames = {}  # paddle -> (trailing, latest) preprocessed frames
+        self.request_state = None  # snapshot() taken at the previous game/frame request
+        self.request_pending = False  # A game/frame request arrived and hasn't been inferred on yet
+        self.reset_backlog()
+        self.latency = LatencyRecorder("ai", enabled=config.LATENCY_HISTOGRAMS)
+        self.predictor = StatePredictor(config, history=config.AI_PREDICT_HISTORY) if config.AI_PREDICT_STATE else None
 
     def start(self):
-        self.client.loop_forever()
+        self.transport.loop_forever()
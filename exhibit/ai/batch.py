@@ -0,0 +1,51 @@
+import numpy as np
+
+"""
+Cross-game inference batching for the shared AI server.
+
+Every game/frame request pending at the start of a tick becomes one InferenceRequest per paddle the game wants
+played. run_batch stacks the states of all requests that use the same model and runs them through a single forward
+pass, so serving several games (or both paddles of an AI vs AI game) costs little more than serving one.
+"""
+
+
+class InferenceRequest:
+    """
+    One paddle of one game waiting for an action
+    """
+
+    def __init__(self, game_id, paddle, frame, received, state, level):
+        """
+        :param game_id: game the request came from
+        :param paddle: "paddle1" or "paddle2"
+        :param frame: game frame id to answer
+        :param received: LatencyRecorder.now() when the request arrived, or None
+        :param state: flattened state diff rendered for this paddle
+        :param level: game level, picks the model
+        """
+        self.game_id = game_id
+        self.paddle = paddle
+        self.frame = frame
+        self.received = received
+        self.state = state
+        self.level = level
+
+
+def run_batch(requests, agent_for_level):
+    """
+    Infer every request, with one forward pass per distinct model
+    :param requests: list of InferenceRequest
+    :param agent_for_level: function returning the agent for a game level. Levels sharing an agent share a batch.
+    :return: list of (request, action, hidden activations, output probabilities), in request order
+    """
+    groups = {}  # id(agent) -> (agent, request indices)
+    for i, request in enumerate(requests):
+        agent = agent_for_level(request.level)
+        groups.setdefault(id(agent), (agent, []))[1].append(i)
+    results = [None] * len(requests)
+    for agent, indices in groups.values():
+        states = np.stack([requests[i].state for i in indices])
+        actions, hidden, outputs = agent.act_batch(states)
+        for row, i in enumerate(indices):
+            results[i] = (requests[i], actions[row], hidden[row], outputs[row])
+    return results
@@ -6,6 +6,7 @@ from tensorflow.keras.optimizers import Adam
 
 from exhibit.shared.config import Config
 from exhibit.shared.utils import write
+from exhibit.shared.activation_packet import encode_activation_packet
 import numpy as np
 
 
@@ -82,6 +83,19 @@ class PGAgent:
 
         return action, None, self.last_output
 
+    def act_batch(self, states):
+        """
+        Infer actions for several states in one forward pass, e.g. the pending requests of every game an AIServer
+        drives. Doesn't touch the last_* attributes used by the single state activation packets.
+        :param states: ndarray with one flattened state per row
+        :return: (action ids, hidden activations, output probabilities), one row per state
+        """
+        states = states.reshape([len(states), self.state_size])
+        prob, activation = self.infer_model(states, training=False)
+        outputs = prob.numpy()
+        actions = np.array([np.random.choice(self.action_size, p=output) for output in outputs])
+        return actions, activation.numpy(), outputs
+
     def get_structure_packet(self):
         """
         Returns the state of the model suitable for realtime visualization
@@ -119,6 +133,16 @@ class PGAgent:
 
         return [input_activation, hidden_activations, output_activations]
 
+    def get_binary_activation_packet(self, frame=0, level=0):
+        """
+        Returns the same activations as get_activation_packet in the compact binary visualizer format
+        :param frame: game frame id the last inference was made on
+        :param level: current game level
+        :return: bytes (see exhibit/shared/activation_packet.py)
+        """
+        return encode_activation_packet(self.last_state, self.last_hidden_activation, self.last_output,
+                                        frame=frame, level=level)
+
 
     def discount_rewards(self, rewards):
         """
@@ -0,0 +1,139 @@
+import math
+from collections import deque
+
+
+class StatePredictor:
+    """
+    Extrapolates the ball forward to the frame an inference will actually be applied on.
+
+    The AI renders the game as it looked when game/frame was sent, but its action lands several frames later
+    (the configured AI delay plus network and inference time). This tracks the last few ball positions received on
+    puck/position (one per game frame), estimates the ball velocity, and replays the Pong ball physics (wall bounces,
+    constant speed within a volley) over the expected latency so the model reacts to where the ball will be.
+
+    Paddle hits are not predicted: extrapolation stops at the paddle lines, since the bounce angle depends on where
+    the opponent's paddle will be.
+    """
+
+    def __init__(self, config, history=4, smoothing=0.2):
+        """
+        :param config: Config instance with the game dimensions and timing
+        :param history: Number of recent ball positions kept for velocity estimation
+        :param smoothing: Weight given to each new round trip measurement in the running estimate (0-1)
+        """
+        self.config = config
+        self.history = max(history, 2)
+        self.smoothing = smoothing
+        self.positions = deque(maxlen=self.history)
+        self.round_trip = None
+        self.observed = 0  # Ball positions observed so far, one per game frame
+        self.request_observed = None  # Value of observed when the latest game/frame request arrived
+        # Anything moving further than this in one frame must be a serve/reset, not real motion
+        self.max_step = self.config.BALL_SPEED * self.config.SPEEDUP * 4 + self.config.VOLLEY_SPEEDUP * 20
+
+    def reset(self):
+        """
+        Forget ball history, e.g. on a level change
+        """
+        self.positions.clear()
+
+    def observe_ball(self, x, y):
+        """
+        Record the latest ball position. Should be called for every puck/position message.
+        :param x: ball x (px)
+        :param y: ball y (px)
+        """
+        self.observed += 1
+        if self.positions:
+            last_x, last_y = self.positions[-1]
+            if abs(x - last_x) > self.max_step or abs(y - last_y) > self.max_step:
+                self.positions.clear()
+            elif len(self.positions) > 1:
+                # A vertical direction change means a paddle hit. Speeds change there, so start a new volley.
+                previous_dy = last_y - self.positions[-2][1]
+                if (y - last_y) * previous_dy < 0:
+                    self.positions = deque([self.positions[-1]], maxlen=self.history)
+        self.positions.append((x, y))
+
+    def observe_round_trip(self, seconds):
+        """
+        Fold a measured request -> reply time into the running latency estimate
+        :param seconds: round trip time reported by the game
+        """
+        if seconds is None:
+            return
+        if self.round_trip is None:
+            self.round_trip = seconds
+        else:
+            self.round_trip += self.smoothing * (seconds - self.round_trip)
+
+    def observe_request(self):
+        """
+        Mark the latest ball position as belonging to the request frame. Should be called for every game/frame message.
+        """
+        self.request_observed = self.observed
+
+    def elapsed(self):
+        """
+        :return: frames observed since the latest request frame, which the horizon already covers
+        """
+        if self.request_observed is None:
+            return 0
+        return self.observed - self.request_observed
+
+    def horizon(self):
+        """
+        Estimate how many frames after its request frame an action will be applied
+        :return: frames to extrapolate
+        """
+        scheduled = self.config.AI_FRAME_DELAY * self.config.AI_FRAME_INTERVAL
+        if self.round_trip is None:
+            return scheduled
+        measured = int(math.ceil(self.round_trip * self.config.GAME_FPS))
+        if self.config.AI_JITTER_BUFFER:
+            # The game holds early actions until the scheduled frame, but late ones land when they arrive
+            return max(scheduled, measured)
+        return measured
+
+    def velocity(self):
+        """
+        Estimate the per-frame ball velocity from recent positions
+        :return: (x velocity, y velocity)
+        """
+        if len(self.positions) < 2:
+            return 0, 0
+        steps = [(b[0] - a[0], b[1] - a[1]) for a, b in zip(list(self.positions)[:-1], list(self.positions)[1:])]
+        dx, dy = steps[-1]
+        # Wall bounces clamp the ball to the edge, which shortens that frame's step.
+        # Horizontal speed is constant within a volley, so use the largest recent step for magnitude.
+        speed_x = max(abs(step[0]) for step in steps)
+        return math.copysign(speed_x, dx), dy
+
+    def predict_ball(self, frames=None):
+        """
+        Extrapolate the ball position forward
+        :param frames: Frames to extrapolate from the latest position. Defaults to the estimated horizon, less the
+            frames that have already passed since the request frame
+        :return: predicted (x, y), or None if no position has been observed
+        """
+        if not self.positions:
+            return None
+        if frames is None:
+            frames = max(self.horizon() - self.elapsed(), 0)
+        x, y = self.positions[-1]
+        vx, vy = self.velocity()
+        top = self.config.TOP_PADDLE_Y
+        bottom = self.config.BOTTOM_PADDLE_Y
+        for i in range(frames):
+            if (vy < 0 and y <= top) or (vy > 0 and y >= bottom):
+                break
+            # Same ordering and clamping as Pong.Ball.update
+            x += vx
+            y += vy
+            if x > self.config.WIDTH:
+                x = self.config.WIDTH
+                vx = -vx
+            if x < 0:
+                x = 0
+                vx = -vx
+        return x, y
@@ -0,0 +1,110 @@
+import warnings
+
+import numpy as np
+
+"""
+Static background model for depth segmentation.
+"""
+
+
+class BackgroundModel:
+    """
+    Learns the depth of the empty scene so that only pixels noticeably closer than it count as foreground.
+
+    A plain clipping distance treats any wall, table or barrier nearer than it as part of a player. The model takes
+    the per-pixel median of the first `learn_frames` frames as the background, then blends in new frames slowly while
+    nobody is playing, so sensor drift or a moved bench is absorbed over a few seconds. Pixels with no depth reading
+    during learning have no background and fall back to the clipping distance alone.
+
+    The background and clipping distance are folded into one per-pixel threshold, so segmenting a frame costs the same
+    two comparisons as the old depth cutoff.
+    """
+
+    def __init__(self, tolerance, learn_frames=30, rate=0.005):
+        """
+        :param tolerance: how much closer than the background (in camera depth units) a pixel must be to be foreground
+        :param learn_frames: frames collected at startup to build the initial background
+        :param rate: weight of each empty frame when updating the learned background
+        """
+        self.tolerance = tolerance
+        self.learn_frames = learn_frames
+        self.rate = rate
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the background and learn it again from the next frames
+        """
+        self.samples = []
+        self.background = None
+        self.threshold = None
+        self.clipping_distance = None
+        self.updates = 0
+
+    def ready(self):
+        return self.background is not None
+
+    def foreground_mask(self, depth_cropped, clipping_distance, columns=slice(None)):
+        """
+        :param depth_cropped: 2D depth image in camera units
+        :param clipping_distance: anything at or beyond this depth is background
+        :param columns: column slice of the full image that depth_cropped holds
+        :return: boolean mask of pixels that may belong to a player
+        """
+        if self.background is None or depth_cropped.shape[0] != self.background.shape[0]:
+            return (depth_cropped < clipping_distance) & (depth_cropped > 0.1)
+        if clipping_distance != self.clipping_distance:
+            self.clipping_distance = clipping_distance
+            self.update_threshold()
+        threshold = self.threshold[:, columns]
+        if threshold.shape != depth_cropped.shape:
+            return (depth_cropped < clipping_distance) & (depth_cropped > 0.1)
+        return (depth_cropped < threshold) & (depth_cropped > 0.1)
+
+    def observe(self, depth_cropped, player_present):
+        """
+        Learn from one full cropped frame
+        :param depth_cropped: 2D depth image in camera units
+        :param player_present: True while a player is (or may be) in front of the camera, which pauses updates
+        """
+        if self.background is not None and depth_cropped.shape != self.background.shape:
+            # The decimation or crop changed, so the learned pixels no longer line up
+            print(f"background model: frame size changed to {depth_cropped.shape}, relearning")
+            self.reset()
+
+        if self.samples and depth_cropped.shape != self.samples[0].shape:
+            # Same while learning: a median over frames of different sizes can't be taken
+            print(f"background model: frame size changed to {depth_cropped.shape} while learning, restarting")
+            self.samples = []
+
+        if self.background is None:
+            self.samples.append(np.array(depth_cropped, dtype=np.float32))
+            if len(self.samples) >= self.learn_frames:
+                stack = np.stack(self.samples)
+                stack[stack <= 0.1] = np.nan
+                with warnings.catch_warnings():
+                    # All-NaN columns are expected where the camera never got a reading
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    background = np.nanmedian(stack, axis=0)
+                # No valid reading: nothing to compare against, only the clipping distance applies
+                background[np.isnan(background)] = np.inf
+                self.background = background
+                self.samples = []
+                self.update_threshold()
+                print(f"background model: learned from {self.learn_frames} frames")
+            return
+
+        if player_present:
+            return
+        depth = depth_cropped.astype(np.float32)
+        valid = depth > 0.1
+        # Pixels without a learned background stay that way, so someone walking into them is never absorbed
+        known = valid & np.isfinite(self.background)
+        self.background[known] += self.rate * (depth[known] - self.background[known])
+        self.updates += 1
+        self.update_threshold()
+
+    def update_threshold(self):
+        if self.background is None or self.clipping_distance is None:
+            return
+        self.threshold = np.minimum(self.background - self.tolerance, self.clipping_distance)
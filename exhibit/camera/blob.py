@@ -0,0 +1,105 @@
+import numpy as np
+
+"""
+Vectorized player blob detection for the depth camera.
+
+The player's position is the median column of the biggest "island" of foreground pixels, where islands are groups
+of occupied columns separated by at least one empty column. Only the column of each foreground pixel matters, so
+everything is computed from a per-column pixel count (one mask.sum) instead of collecting pixel coordinates one by
+one. The island rules reproduce the original pixel loop exactly, including its quirks, so positions don't change:
+    - each island leaves out its last pixel (the loop sliced avg_x_array[i_min:i_max])
+    - a column run made of a single pixel that starts an island is merged into the following run
+    - ties between islands go to the leftmost one
+"""
+
+MIN_PLAYER_PIXELS = 40  # A frame needs more foreground pixels than this to contain a player
+
+
+def crop(depth_image, crop_percentage_w, crop_percentage_h):
+    """
+    Keep the centre of the depth image
+    :param depth_image: 2D depth image
+    :param crop_percentage_w: fraction of axis 0 to keep
+    :param crop_percentage_h: fraction of axis 1 to keep
+    :return: cropped view of the image
+    """
+    w, h = depth_image.shape
+    ws, we = int(w/2 - (w * crop_percentage_w)/2), int(w/2 + (w * crop_percentage_w)/2)
+    hs, he = int(h/2 - (h * crop_percentage_h)/2), int(h/2 + (h * crop_percentage_h)/2)
+    return depth_image[ws:we, hs:he]
+
+
+def foreground_mask(depth_cropped, clipping_distance):
+    """
+    :param depth_cropped: 2D depth image in camera units
+    :param clipping_distance: anything at or beyond this depth is background
+    :return: boolean mask of pixels that may belong to a player
+    """
+    return (depth_cropped < clipping_distance) & (depth_cropped > 0.1)
+
+
+def column_histogram(mask):
+    """
+    :param mask: boolean foreground mask
+    :return: number of foreground pixels in each column
+    """
+    return np.count_nonzero(mask, axis=0)
+
+
+def find_islands(histogram):
+    """
+    Split occupied columns into islands
+    :param histogram: per-column foreground pixel counts
+    :return: (columns, cumulative, starts, sizes). columns/cumulative describe the occupied columns and the running
+        pixel count through each one. starts/sizes are the islands' offsets and lengths in the sorted list of
+        foreground pixel columns, with empty islands already removed.
+    """
+    columns = np.flatnonzero(histogram)
+    counts = histogram[columns]
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+
+    # Runs of adjacent occupied columns, as offsets into the sorted pixel column list
+    run_first = np.concatenate(([0], np.flatnonzero(np.diff(columns) > 1) + 1))
+    run_offsets = np.concatenate(([0], cumulative))[run_first]
+    run_sizes = np.diff(np.concatenate((run_offsets, [total])))
+
+    # A one-pixel run that starts an island swallows the next run. In a streak of one-pixel runs that happens to
+    # every other run, counting from the start of the streak.
+    single = run_sizes == 1
+    index = np.arange(run_sizes.size)
+    streak_start = np.maximum.accumulate(np.where(~single, index + 1, 0))
+    merges_next = single & ((index - streak_start) % 2 == 0)
+    keep = np.concatenate(([True], ~merges_next[:-1]))
+
+    starts = run_offsets[keep]
+    ends = np.concatenate((starts[1:], [total])) - 1
+    sizes = ends - starts
+    nonempty = sizes > 0
+    return columns, cumulative, starts[nonempty], sizes[nonempty]
+
+
+def largest_island_median(histogram):
+    """
+    :param histogram: per-column foreground pixel counts with at least two foreground pixels
+    :return: median column of the biggest island (float)
+    """
+    columns, cumulative, starts, sizes = find_islands(histogram)
+    biggest = np.argmax(sizes)
+    start, size = starts[biggest], sizes[biggest]
+    middle = np.array([start + (size - 1) // 2, start + size // 2])
+    low, high = columns[np.searchsorted(cumulative, middle, side='right')]
+    return (low + high) / 2
+
+
+def find_player(mask, min_pixels=MIN_PLAYER_PIXELS):
+    """
+    Locate the player in a foreground mask
+    :param mask: boolean foreground mask (see foreground_mask)
+    :param min_pixels: frames with this many foreground pixels or fewer have no player
+    :return: median column of the player, or None if there is no player
+    """
+    histogram = column_histogram(mask)
+    if histogram.sum() <= min_pixels:
+        return None
+    return largest_island_median(histogram)
@@ -0,0 +1,113 @@
+import time
+
+"""
+Keeps depth tracking within a per-frame CPU budget by trading resolution for speed.
+"""
+
+# (decimation filter magnitude, fraction of columns around the last player position to process, column stride)
+# from best quality to cheapest. The first level is what the exhibit has always used.
+DEFAULT_LEVELS = [(6, 1.0, 1), (6, 1.0, 2), (6, 0.6, 2), (8, 0.6, 2), (8, 0.5, 3)]
+
+
+class ProcessingBudget:
+    """
+    Measures how long each frame takes to track and moves along a ladder of cheaper settings when frames go over
+    budget, and back up when there is plenty of headroom.
+
+    Settings only change after the smoothed cost has been over (or well under) budget for `patience` frames, so a
+    single slow frame (GC pause, USB hiccup) doesn't make the tracking resolution flap.
+    """
+
+    def __init__(self, budget_ms, levels=None, smoothing=0.2, patience=15, headroom=0.5):
+        """
+        :param budget_ms: target tracking cost per frame in milliseconds
+        :param levels: list of (decimation, roi fraction, stride), best quality first
+        :param smoothing: weight of each new measurement in the running cost
+        :param patience: frames a condition has to hold before the level changes
+        :param headroom: step back up once the cost is below this fraction of the budget
+        """
+        self.budget_ms = budget_ms
+        self.levels = levels if levels is not None else DEFAULT_LEVELS
+        self.smoothing = smoothing
+        self.patience = patience
+        self.headroom = headroom
+        self.level = 0
+        self.cost_ms = None
+        self.over = 0
+        self.under = 0
+        self.last_position = None
+        self.started = None
+        self.changes = 0
+
+    @property
+    def decimation(self):
+        return self.levels[self.level][0]
+
+    @property
+    def roi(self):
+        return self.levels[self.level][1]
+
+    @property
+    def stride(self):
+        return self.levels[self.level][2]
+
+    def region(self, width):
+        """
+        Columns to process this frame
+        :param width: columns in the cropped depth image
+        :return: (start, stop, stride) column slice
+        """
+        if self.roi >= 1 or self.last_position is None:
+            return 0, width, self.stride
+        span = max(int(width * self.roi), 1)
+        start = min(max(int(self.last_position * width - span / 2), 0), width - span)
+        return start, start + span, self.stride
+
+    def begin(self):
+        """
+        Mark the start of a frame's tracking work
+        """
+        self.started = time.perf_counter()
+
+    def end(self, position):
+        """
+        Mark the end of a frame's tracking work and adapt the settings
+        :param position: tracked player position as a fraction of the width, or None if nobody was found
+        :return: True if the settings changed
+        """
+        # Losing the player inside a narrowed region means the next frame has to look everywhere again
+        self.last_position = position
+        if self.started is None:
+            return False
+        cost = (time.perf_counter() - self.started) * 1000
+        self.started = None
+        self.cost_ms = cost if self.cost_ms is None else self.cost_ms + self.smoothing * (cost - self.cost_ms)
+
+        self.over = self.over + 1 if self.cost_ms > self.budget_ms else 0
+        self.under = self.under + 1 if self.cost_ms < self.budget_ms * self.headroom else 0
+        if self.over >= self.patience and self.level < len(self.levels) - 1:
+            return self.set_level(self.level + 1)
+        if self.under >= self.patience and self.level > 0:
+            return self.set_level(self.level - 1)
+        return False
+
+    def set_level(self, level):
+        self.level = level
+        self.over = 0
+        self.under = 0
+        self.changes += 1
+        return True
+
+    def summary(self):
+        """
+        :return: dict of the current settings and smoothed cost
+        """
+        return {
+            "level": self.level,
+            "decimation": self.decimation,
+            "roi": self.roi,
+            "stride": self.stride,
+            "cost_ms": round(self.cost_ms, 3) if self.cost_ms is not None else None,
+            "budget_ms": self.budget_ms,
+            "changes": self.changes,
+        }
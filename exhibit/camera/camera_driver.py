@@ -4,74 +4,180 @@ from exhibit.camera.camera_subscriber import CameraSubscriber
 import time
 import numpy as np
 
-import pyrealsense2 as rs
 import cv2
 import threading
 from exhibit.shared.utils import Timer
+from exhibit.camera import blob
+from exhibit.camera.preview import DepthPreviewWorker
+from exhibit.camera.presence import PresenceDetector
+from exhibit.camera.budget import ProcessingBudget
+from exhibit.camera.background import BackgroundModel
+from exhibit.camera.recording import DepthPlayback, RecordedDecimationFilter, FILTER_MAGNITUDE
+from exhibit.game.depth_feed_publisher import DepthFeedPublisher
 
 from queue import Queue
 
+"""
+Camera tracking service.
+
+Owns the RealSense pipeline and tracks the player at camera rate in its own process, publishing to:
+    camera/position   every camera frame: {"seq", "time", "present", "x", "raw_x", "pixels"}
+                      x is the paddle position Pong.get_human_x used to return (0.5 when nobody is there),
+                      raw_x the position check_for_still_player used to return (-5.0 when nobody is there)
+    camera/budget     once a second: the adaptive tracking settings and cost (see ProcessingBudget)
+    camera/presence   retained, whenever the PresenceDetector state changes: {"present", "still", "size", "time"}
+                      cleared to not present when the service stops or its connection drops
+    depth/feed        the depth preview for the visualizer (see DepthFeedPublisher)
+
+Run with `python -m exhibit.camera.camera_driver`. The game consumes these when CAMERA_SERVICE is enabled.
+"""
+
 
 class CameraDriver:
 
-    def publish_inference(self):
-        #Timer.start('inf')
-        
-        # check if a kill/quit message has been sent via the queue
-        if not self.q.empty():
-            dataQ = self.q.get()
-            if dataQ == "endThreads":
-                print('ai thread quitting')
-                while not self.q.empty: # empty the rest of the q
-                    dataQ = self.q.get()
-                self.q.put('noneActive') 
-                # a message that goes back to the main program to tell it that the ai_driver has stopped
-                sys.exit()
-                print('the sys exit didnt work')
-
-        
-
-        # Infer on flattened state vector
-        x = diff_state.ravel()
-        action, _, probs = self.agent.act(x)
-        # Publish prediction
-        if self.paddle1:
-            self.state.publish("paddle1/action", {"action": str(action)})
-            self.state.publish("paddle1/frame", {"frame": current_frame_id})
-        elif self.paddle2:
-            self.state.publish("paddle2/action", {"action": str(action)})
-            self.state.publish("paddle2/frame", {"frame": current_frame_id})
-
-        model_activation = self.agent.get_activation_packet()
-        self.state.publish("ai/activation", model_activation)
-
-
-
-    def __init__(self, config=Config.instance(), in_q = Queue(), pipeline = rs.pipeline(), decimation_filter = rs.decimation_filter(), crop_percentage_w = 1.0, crop_percentage_h = 0.1, clipping_distance_in_meters = 1.6):
-        self.pipeline = pipeline # = pipeline
-        self.decimation_filter = decimation_filter
+    def track(self, depth_image):
+        """
+        Find the player in one decimated depth image
+        :param depth_image: 2D depth image
+        :return: (camera/position message, cropped depth image, player column or None)
+        """
+        # cropping the image based on a width and height percentage
+        depth_cropped = blob.crop(depth_image, self.crop_percentage_w, self.crop_percentage_h)
+        width = np.size(depth_cropped, 1)
+        # Under CPU pressure only every stride-th column near the last known player position is looked at
+        start, stop, stride = self.budget.region(width) if self.budget is not None else (0, width, 1)
+        if self.background is not None:
+            cutoffImage = self.background.foreground_mask(depth_cropped[:, start:stop:stride], self.clipping_distance, columns=slice(start, stop, stride))
+        else:
+            cutoffImage = blob.foreground_mask(depth_cropped[:, start:stop:stride], self.clipping_distance)
+        pixels = int(np.count_nonzero(cutoffImage)) * stride
+        m = blob.find_player(cutoffImage, min_pixels=blob.MIN_PLAYER_PIXELS // stride)
+        if m is not None:
+            m = start + m * stride
+
+        self.sequence += 1
+        message = {"seq": self.sequence, "time": time.time(), "present": m is not None, "pixels": pixels}
+        if m is None:
+            message["x"] = 0.5
+            message["raw_x"] = -5.0
+        else:
+            # we multiply by 1.4 and subtract -0.2 so that the player can reach the edges of the Pong game.
+            message["x"] = (m / width * 1.4) - 0.2
+            message["raw_x"] = m / width
+        return message, depth_cropped, m
+
+    def adapt(self, message):
+        """
+        Feed the frame's tracking cost to the budget controller and apply any change in settings
+        :param message: camera/position message for the frame
+        """
+        decimation = self.budget.decimation
+        if self.budget.end(message["raw_x"] if message["present"] else None):
+            print(f"camera: tracking settings now {self.budget.summary()}")
+            if self.budget.decimation != decimation:
+                self.decimation_filter.set_option(self.magnitude_option, self.budget.decimation)
+        now = time.monotonic()
+        if now - self.last_budget_report >= 1:
+            self.last_budget_report = now
+            self.subscriber.publish("camera/budget", self.budget.summary())
+
+    def publish_position(self, message):
+        self.subscriber.publish("camera/position", message)
+        events = self.presence.update(message["pixels"], message["raw_x"] if message["present"] else None)
+        state = self.presence.state()
+        if events or state["present"] != self.presence_state["present"] or state["still"] != self.presence_state["still"]:
+            for event in events:
+                print(f"camera: player {event}")
+            state["time"] = message["time"]
+            self.subscriber.publish("camera/presence", state, qos=1, retain=True)
+            self.presence_state = state
+
+    def run(self):
+        while True:
+            # check if a kill/quit message has been sent via the queue
+            if not self.q.empty():
+                dataQ = self.q.get()
+                if dataQ == "endThreads":
+                    print('camera thread quitting')
+                    while not self.q.empty(): # empty the rest of the q
+                        dataQ = self.q.get()
+                    self.pipeline.stop()
+                    self.depth_preview.stop()
+                    self.subscriber.clear_presence()
+                    self.q.put('noneActive')
+                    return
+
+            try:
+                frames = self.pipeline.wait_for_frames()
+            except Exception as ex:
+                print(ex)
+                continue
+            depth = frames.get_depth_frame()
+            if not depth: continue
+
+            if self.budget is not None:
+                self.budget.begin()
+            # filtering the image to make it less noisy and inconsistent
+            depth_filtered = self.decimation_filter.process(depth)
+            depth_image = np.asanyarray(depth_filtered.get_data())
+
+            message, depth_cropped, m = self.track(depth_image)
+            if self.budget is not None:
+                self.adapt(message)
+            self.publish_position(message)
+            if self.background is not None:
+                # Only learn the scene while nobody is, or might be, standing in it
+                self.background.observe(depth_cropped, self.presence.present or message["present"])
+
+            # Previews are rendered on their own thread, and only when the feed would actually send them
+            self.depth_preview.submit(depth_cropped, self.clipping_distance, m)
+
+    def __init__(self, config=Config.instance(), in_q = Queue(), pipeline = None, decimation_filter = None, crop_percentage_w = 1.0, crop_percentage_h = 1.0, clipping_distance_in_meters = 1.6):
+        self.q = in_q
+        self.config = config
+        if pipeline is None and self.config.CAMERA_PLAYBACK_FILE is not None:
+            print(f"Playing back depth recording {self.config.CAMERA_PLAYBACK_FILE}")
+            pipeline = DepthPlayback(self.config.CAMERA_PLAYBACK_FILE, loop=True)
+            decimation_filter = RecordedDecimationFilter()
+        if type(pipeline) == DepthPlayback:
+            # Playback needs no RealSense SDK at all
+            self.magnitude_option = FILTER_MAGNITUDE
+        else:
+            import pyrealsense2 as rs
+            self.magnitude_option = rs.option.filter_magnitude
+            if pipeline is None:
+                pipeline = rs.pipeline()
+            if decimation_filter is None:
+                decimation_filter = rs.decimation_filter()
+        self.pipeline = pipeline
+        self.decimation_filter = decimation_filter if decimation_filter is not None else RecordedDecimationFilter()
         self.crop_percentage_w = crop_percentage_w
         self.crop_percentage_h = crop_percentage_h
         self.clipping_distance_in_meters = clipping_distance_in_meters
         self.clipping_distance = clipping_distance_in_meters
-        self.config = config
-        self.subscriber = CameraSubscriber() #= subscriber
-        
-
-        #self.state = AISubscriber(self.config, trigger_event=lambda: self.publish_inference())
-        #self.last_frame_id = self.state.frame
-        # self.last_tick = time.time()
-        # self.frame_diffs = []
-        # self.last_acted_frame = 0
-        # self.inference_thread = threading.Thread(target=self.inference_loop)
-        # self.inference_thread.start()
-        # self.state.start()
+        self.sequence = 0
+        self.budget = ProcessingBudget(self.config.CAMERA_BUDGET_MS) if self.config.CAMERA_ADAPTIVE else None
+        self.last_budget_report = 0
+        self.background = None
+        self.presence = PresenceDetector(min_pixels=blob.MIN_PLAYER_PIXELS)
+        self.presence_state = {"present": None, "still": None}
+        self.depth_feed = DepthFeedPublisher(self.config, emit=lambda payload: self.subscriber.publish_binary("depth/feed", payload))
+        self.subscriber = CameraSubscriber(self.config, on_visualizer_status=self.depth_feed.visualizer_seen)
+        self.depth_preview = DepthPreviewWorker(self.depth_feed)
+        self.depth_preview.start()
 
         self.configure_pipeline()
-    
+
     def configure_pipeline(self):
-        # decimation_filter = rs.decimation_filter()
-        self.decimation_filter.set_option(rs.option.filter_magnitude, 6)
+        self.decimation_filter.set_option(self.magnitude_option, self.budget.decimation if self.budget is not None else 6)
+        if type(self.pipeline) == DepthPlayback:
+            self.pipeline.start()
+            self.clipping_distance = self.clipping_distance_in_meters / self.pipeline.get_depth_scale()
+            print(f'the Clipping Distance is : {self.clipping_distance}')
+            self.configure_background(self.pipeline.get_depth_scale())
+            return
+
+        import pyrealsense2 as rs
 
         # crop_percentage_w = 1.0
         # crop_percentage_h = 1.0
@@ -83,7 +189,7 @@ class CameraDriver:
 
         rs_config = rs.config()
         rs_config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-        rs_config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
+        # No color stream: it was only used to align the preview, which is drawn from depth alone
 
         profile = self.pipeline.start(rs_config)
 
@@ -98,127 +204,19 @@ class CameraDriver:
         # clipping_distance_in_meters = 1.6 #2 meter
         self.clipping_distance = self.clipping_distance_in_meters / depth_scale
         print(f'the Clipping Distance is : {self.clipping_distance}')
+        self.configure_background(depth_scale)
 
+    def configure_background(self, depth_scale):
+        if self.config.BACKGROUND_MODEL:
+            # Learned from the first frames, so the scene should be empty when the service starts
+            self.background = BackgroundModel(self.config.BACKGROUND_TOLERANCE / depth_scale)
 
-    # checks if theres a big enough player sized blob
-    #check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance)
-    def check_for_player(self):
-        #try to get the frame 50 times
-        for i in range(50): 
-            frames = self.pipeline.wait_for_frames()
-            depth = frames.get_depth_frame()
-            #color = frames.get_color_frame()
-            if not depth: continue
-
-            # filtering the image to make it less noisy and inconsistent
-            depth_filtered = self.decimation_filter.process(depth)
-            depth_image = np.asanyarray(depth_filtered.get_data())
-            
-            # cropping the image based on a width and height percentage
-            w,h = depth_image.shape
-            ws, we = int(w/2 - (w * self.crop_percentage_w)/2), int(w/2 + (w * self.crop_percentage_w)/2)
-            hs, he = int(h/2 - (h * self.crop_percentage_h)/2), int(h/2 + (h * self.crop_percentage_h)/2)
-            #print("dimension: {}, {}, width: {},{} height: {},{}".format(w,h,ws,we,hs,he))
-            depth_cropped = depth_image[ws:we, hs:he]
-            #depth_cropped = depth_image
-
-            cutoffImage = np.where((depth_cropped < self.clipping_distance) & (depth_cropped > 0.1), True, False)
-
-            #print(f'cutoffImage shape is {cutoffImage.shape}, depth_cropped shape is {depth_cropped.shape}');
-            avg_x = 0
-            avg_x_array = np.array([])
-            countB = 0
-            for a in range(np.size(cutoffImage,0)):
-                for b in range(np.size(cutoffImage,1)):
-                    if cutoffImage[a,b] :
-                        avg_x += b
-                        #print(b)
-                        avg_x_array = np.append(avg_x_array,b)
-                        countB = countB+1
-            # if we got no pixels in depth, return false
-            if countB <= 40: 
-                return False
-
-            return True # successfully found a player, return true
-        return False # failed to get camera image, return false
-
-    # checks if there is a player and returns their position from 0 to 1 so that we can tell if theyre walking through or still to play
-    # check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance)
-
-    def check_for_still_player(self):
-        #try to get the frame 50 times
-        for i in range(20):
-            try:
-                # print('trying wait_for_frames')
-                frames = self.pipeline.wait_for_frames()
-            except Exception as ed:
-                print(ed)
-                continue
-
-            depth = frames.get_depth_frame()
-            #color = frames.get_color_frame()
-            if not depth: continue
-
-            # filtering the image to make it less noisy and inconsistent
-            depth_filtered = self.decimation_filter.process(depth)
-            depth_image = np.asanyarray(depth_filtered.get_data())
-
-            # cropping the image based on a width and height percentage
-            w,h = depth_image.shape
-            ws, we = int(w/2 - (w * self.crop_percentage_w)/2), int(w/2 + (w * self.crop_percentage_w)/2)
-            hs, he = int(h/2 - (h * self.crop_percentage_h)/2), int(h/2 + (h * self.crop_percentage_h)/2)
-            #print("dimension: {}, {}, width: {},{} height: {},{}".format(w,h,ws,we,hs,he))
-            depth_cropped = depth_image[ws:we, hs:he]
-            #depth_cropped = depth_image
-
-            cutoffImage = np.where((depth_cropped < self.clipping_distance) & (depth_cropped > 0.1), True, False)
-
-            #print(f'cutoffImage shape is {cutoffImage.shape}, depth_cropped shape is {depth_cropped.shape}');
-            avg_x = 0
-            avg_x_array = np.array([])
-            countB = 0
-            for a in range(np.size(cutoffImage,0)):
-                for b in range(np.size(cutoffImage,1)):
-                    if cutoffImage[a,b] :
-                        avg_x += b
-                        #print(b)
-                        avg_x_array = np.append(avg_x_array,b)
-                        countB = countB+1
-            # if we got no pixels in depth, return false
-            if countB <= 40:
-                return -5.0
-
-            avg_x_array.sort()
-            islands = []
-            i_min = 0
-            i_max = 0
-            p = avg_x_array[0]
-            for index in range(np.size(avg_x_array,0)) :
-                n = avg_x_array[index]
-                if n > p+1 and not i_min == i_max : # if the island is done
-                    islands.append(avg_x_array[i_min:i_max])
-                    i_min = index
-                i_max = index
-                p = n
-            if not i_min == i_max: islands.append(avg_x_array[i_min:i_max])
-
-
-            #print(islands)
-            bigIsland = np.array([])
-            for array in islands:
-                if np.size(array,0) > np.size(bigIsland,0): bigIsland = array
-
-            #print(np.median(bigIsland))
-            m = (np.median(bigIsland))
-
-            return (m/(np.size(cutoffImage,1)) * 1) # -0.2 # return value
-        return -5.0 # failed to get camera image, return bas value
 
 def main(in_q):
     # main is separated out so that we can call it and pass in the queue from GUI
     config = Config.instance()
-    instance = CameraDriver(config = config, in_q = in_q)
+    instance = CameraDriver(config = config, in_q = in_q if in_q else Queue())
+    instance.run()
 
 if __name__ == "__main__":
     main("")
-
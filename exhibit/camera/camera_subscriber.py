@@ -0,0 +1,61 @@
+import json
+
+import paho.mqtt.client as mqtt
+
+from exhibit.shared.config import Config
+
+# Retained by the broker when the camera service disconnects, so the game doesn't keep a present player forever
+ABSENT_PRESENCE = {"present": False, "still": False, "size": 0, "time": None}
+
+
+class CameraSubscriber:
+    """
+    MQTT connection for the camera tracking service.
+    Publishes the tracked player and listens for the visualizer so the depth preview can be skipped when unwatched.
+    """
+
+    def on_connect(self, client, userdata, flags, rc):
+        print("Connected with result code " + str(rc))
+        client.subscribe("visualizer/status")
+
+    def on_message(self, client, userdata, msg):
+        topic = msg.topic
+        payload = json.loads(msg.payload)
+        if topic == "visualizer/status" and self.on_visualizer_status is not None:
+            self.on_visualizer_status(payload["online"])
+
+    def publish(self, topic, message, qos=0, retain=False):
+        """
+        :param topic: MQTT topic
+        :param message: payload object, will be JSON stringified
+        """
+        self.client.publish(topic, payload=json.dumps(message), qos=qos, retain=retain)
+
+    def clear_presence(self):
+        """
+        Replace the retained camera/presence state on a clean shutdown, which doesn't trigger the will
+        """
+        self.publish("camera/presence", ABSENT_PRESENCE, qos=1, retain=True)
+
+    def publish_binary(self, topic, payload, qos=0):
+        """
+        :param topic: MQTT topic
+        :param payload: bytes
+        """
+        self.client.publish(topic, payload=payload, qos=qos)
+
+    def __init__(self, config=None, on_visualizer_status=None):
+        """
+        :param on_visualizer_status: function taking a Boolean, called whenever the visualizer reports in
+        """
+        print("init CameraSubscriber")
+        if config is None:
+            config = Config.instance()
+        self.config = config
+        self.on_visualizer_status = on_visualizer_status
+        self.client = mqtt.Client(client_id="camera_module")
+        self.client.on_connect = lambda client, userdata, flags, rc : self.on_connect(client, userdata, flags, rc)
+        self.client.on_message = lambda client, userdata, msg : self.on_message(client, userdata, msg)
+        self.client.will_set("camera/presence", payload=json.dumps(ABSENT_PRESENCE), qos=1, retain=True)
+        self.client.connect_async("localhost", port=1883, keepalive=60)
+        self.client.loop_start()
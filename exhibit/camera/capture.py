@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import namedtuple
+
+"""
+Runs blocking camera work on its own thread so the game tick never waits on USB camera I/O.
+"""
+
+# value: whatever the capture function returned, timestamp: time.monotonic() when it was stored,
+# sequence: counts up with every stored sample so readers can tell a new sample from a repeated one
+Sample = namedtuple("Sample", ["value", "timestamp", "sequence"])
+
+
+class LatestValue:
+    """
+    Single slot holding the most recent sample.
+
+    The writer builds a new immutable Sample and swaps it in with one attribute assignment, which is atomic under
+    the GIL, so readers always see a complete sample without taking a lock. Older samples are simply dropped.
+    """
+
+    def __init__(self):
+        self.sample = None
+        self.sequence = 0
+
+    def put(self, value):
+        """
+        Store a new sample. Only call from one thread.
+        :param value: latest value
+        """
+        self.sequence += 1
+        self.sample = Sample(value, time.monotonic(), self.sequence)
+
+    def get(self):
+        """
+        :return: latest Sample, or None if nothing has been stored yet
+        """
+        return self.sample
+
+    def age(self):
+        """
+        :return: seconds since the latest sample was stored, or None if there is none
+        """
+        sample = self.sample
+        if sample is None:
+            return None
+        return time.monotonic() - sample.timestamp
+
+
+class CaptureThread:
+    """
+    Calls a blocking capture function in a loop on a daemon thread, keeping only the latest result.
+    """
+
+    def __init__(self, capture, name="camera-capture"):
+        """
+        :param capture: function taking no arguments that waits for the next camera frame and returns a value
+        :param name: thread name, for debugging
+        """
+        self.capture = capture
+        self.name = name
+        self.slot = LatestValue()
+        self.running = False
+        self.thread = None
+        self.errors = 0
+
+    def start(self):
+        """
+        Start capturing. Does nothing if already running.
+        """
+        if self.running:
+            return
+        self.running = True
+        if self.thread is not None and self.thread.is_alive():
+            # A previous stop() timed out and the old thread is still capturing, let it carry on
+            return
+        self.thread = threading.Thread(target=self.loop, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop capturing and wait for the current capture to finish, so the camera is free for other callers
+        :param timeout: seconds to wait for the thread, None to wait for as long as the capture takes
+        :return: True once the thread has finished, False if it is still blocked in a capture after the timeout
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print(f"{self.name} is still capturing after {timeout}s, the camera is not free yet")
+                return False
+            self.thread = None
+        return True
+
+    def loop(self):
+        while self.running:
+            try:
+                value = self.capture()
+            except Exception as ex:
+                # A flaky frame shouldn't kill tracking for the rest of the level
+                self.errors += 1
+                print(f"{self.name} capture failed: {ex}")
+                time.sleep(0.01)
+                continue
+            self.slot.put(value)
+
+    def latest(self):
+        """
+        :return: latest Sample, or None if nothing has been captured yet
+        """
+        return self.slot.get()
+
+    def age(self):
+        return self.slot.age()
@@ -0,0 +1,109 @@
+import numpy as np
+
+"""
+Streaming presence and stillness detection for the level state machine.
+"""
+
+PRESENT = "present"
+STILL = "still"
+LEFT = "left"
+
+
+class PresenceDetector:
+    """
+    Tracks whether a player is standing in front of the camera, and whether they are standing still, from one
+    tracking result per camera frame.
+
+    Replaces re-sampling the camera (check_for_player up to 50 grabs, then 30 check_for_still_player calls and an
+    np.std) with rolling statistics over the frames the tracker already processes. Each state only changes after it
+    has held for several frames, so a single noisy frame can't start or end a game.
+    """
+
+    def __init__(self, window=30, min_pixels=40, enter_frames=3, leave_frames=15, still_std=0.06, moving_std=0.09):
+        """
+        :param window: frames of position history used for stillness (30 is what the old check sampled)
+        :param min_pixels: a frame with more foreground pixels than this contains a player
+        :param enter_frames: consecutive frames with a player before they count as present
+        :param leave_frames: consecutive frames without a player before they count as gone
+        :param still_std: position standard deviation (fraction of width) at or below which the player is still
+        :param moving_std: standard deviation above which a still player counts as moving again
+        """
+        self.window = window
+        self.min_pixels = min_pixels
+        self.enter_frames = enter_frames
+        self.leave_frames = leave_frames
+        self.still_std = still_std
+        self.moving_std = moving_std
+        self.positions = np.zeros(window)
+        self.sizes = np.zeros(window)
+        self.reset()
+
+    def reset(self):
+        self.count = 0  # valid entries in the ring buffers
+        self.index = 0  # next write position
+        self.seen_run = 0
+        self.missing_run = 0
+        self.present = False
+        self.still = False
+
+    def update(self, pixels, position):
+        """
+        Fold in one camera frame
+        :param pixels: foreground pixel count
+        :param position: player position (0 to 1), ignored when there is no player
+        :return: list of events (PRESENT, STILL, LEFT) raised by this frame
+        """
+        events = []
+        if pixels > self.min_pixels and position is not None:
+            self.seen_run += 1
+            self.missing_run = 0
+            self.positions[self.index] = position
+            self.sizes[self.index] = pixels
+            self.index = (self.index + 1) % self.window
+            self.count = min(self.count + 1, self.window)
+        else:
+            self.missing_run += 1
+            self.seen_run = 0
+            # Stillness has to be measured over an unbroken run of frames with the player in them
+            self.count = 0
+
+        if not self.present and self.seen_run >= self.enter_frames:
+            self.present = True
+            events.append(PRESENT)
+        elif self.present and self.missing_run >= self.leave_frames:
+            self.present = False
+            self.still = False
+            events.append(LEFT)
+
+        if self.present:
+            spread = self.position_std()
+            if not self.still and spread is not None and spread <= self.still_std:
+                self.still = True
+                events.append(STILL)
+            elif self.still and spread is not None and spread > self.moving_std:
+                self.still = False
+        return events
+
+    def position_std(self):
+        """
+        :return: standard deviation of the buffered positions, or None until the window is full
+        """
+        if self.count < self.window:
+            return None
+        # The ring buffer is full, so every slot holds one of the last `window` frames
+        return float(np.std(self.positions))
+
+    def mean_size(self):
+        """
+        :return: average foreground pixel count over the buffered frames, or 0
+        """
+        if self.count == 0:
+            return 0
+        recent = (self.index - np.arange(1, self.count + 1)) % self.window
+        return float(np.mean(self.sizes[recent]))
+
+    def state(self):
+        """
+        :return: dict suitable for the camera/presence message
+        """
+        return {"present": self.present, "still": self.still, "size": round(self.mean_size())}
@@ -0,0 +1,116 @@
+import threading
+
+import cv2
+import numpy as np
+
+"""
+Renders the depth camera preview shown in the browser visualizer, off the tracking path.
+"""
+
+BACKGROUND_GREY = 40  # Color of pixels beyond the clipping distance
+
+
+class DepthPreviewRenderer:
+    """
+    Colorizes depth images into preallocated buffers, so rendering a preview doesn't allocate every frame.
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.scaled = None
+        self.colormap = None
+        self.background = None
+
+    def render(self, depth_cropped, clipping_distance, player_column=None):
+        """
+        Colorize the cropped depth image, grey out the background and mark the tracked player
+        :param depth_cropped: 2D depth image the player was tracked on
+        :param clipping_distance: anything at or beyond this depth is drawn as background
+        :param player_column: tracked player column, or None to skip the marker
+        :return: BGR uint8 image. The buffer is reused by the next render call.
+        """
+        if depth_cropped.shape != self.shape:
+            self.shape = depth_cropped.shape
+            self.scaled = np.empty(self.shape, dtype=np.uint8)
+            self.colormap = np.empty(self.shape + (3,), dtype=np.uint8)
+            self.background = np.empty(self.shape, dtype=bool)
+        # Identical to colorizing a 3 channel stack of the depth image (OpenCV converts that to grey first)
+        cv2.convertScaleAbs(depth_cropped, self.scaled, alpha=0.03)
+        cv2.applyColorMap(self.scaled, cv2.COLORMAP_RAINBOW, self.colormap)
+        np.greater_equal(depth_cropped, clipping_distance, out=self.background)
+        self.background |= depth_cropped <= 0.1
+        self.colormap[self.background] = BACKGROUND_GREY
+        if player_column is not None:
+            cv2.line(self.colormap, (int(player_column), self.shape[0]), (int(player_column), 0), (255, 255, 255), 1)
+        return self.colormap
+
+
+class DepthPreviewWorker:
+    """
+    Renders and publishes the depth preview on its own thread at the preview rate.
+
+    The tracking code only hands over the depth image it already has (submit is a cheap copy, and skipped entirely
+    when no preview is due), so tracking latency is just decimation plus blob detection. Colorizing, JPEG encoding
+    and publishing happen here, at most DEPTH_FEED_MAX_FPS times a second and only while the feed is active.
+    Python threads can't be given a lower OS priority portably; the worker instead sleeps between previews and
+    drops any frame submitted while it is busy.
+    """
+
+    def __init__(self, publisher):
+        """
+        :param publisher: DepthFeedPublisher that encodes and sends the rendered images
+        """
+        self.publisher = publisher
+        self.renderer = DepthPreviewRenderer()
+        self.pending = None
+        self.sequence = 0
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def wanted(self):
+        """
+        :return: True if a submitted frame would be rendered, so callers can skip preparing one
+        """
+        return self.running and self.pending is None and self.publisher.active() and self.publisher.due()
+
+    def submit(self, depth_cropped, clipping_distance, player_column=None):
+        """
+        Offer the latest tracked frame for preview. Never blocks.
+        :param depth_cropped: depth image the player was tracked on (copied, camera buffers get recycled)
+        :param clipping_distance: background depth threshold
+        :param player_column: tracked player column or None
+        """
+        if not self.wanted():
+            return
+        self.sequence += 1
+        self.pending = (self.sequence, np.array(depth_cropped), clipping_distance, player_column)
+        self.wakeup.set()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, name="depth-preview", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(1)
+            self.thread = None
+
+    def loop(self):
+        while self.running:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            pending, self.pending = self.pending, None
+            if pending is None:
+                continue
+            sequence, depth_cropped, clipping_distance, player_column = pending
+            try:
+                image = self.renderer.render(depth_cropped, clipping_distance, player_column)
+                self.publisher.offer(sequence, image)
+            except Exception as ex:
+                print(f"depth preview failed: {ex}")
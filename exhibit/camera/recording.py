@@ -0,0 +1,318 @@
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+"""
+Record depth camera streams to disk and play them back through the same interface as a RealSense pipeline.
+
+Every depth code path only touches a small part of the pyrealsense2 API:
+    frames = pipeline.wait_for_frames()
+    depth = frames.get_depth_frame()
+    depth_image = np.asanyarray(decimation_filter.process(depth).get_data())
+DepthPlayback and PassthroughFilter (or RecordedDecimationFilter) implement exactly that surface, so check_for_player, CameraDriver etc. can run
+on a recording on a machine with no camera (or without pyrealsense2 installed at all).
+
+Frames are stored after decimation (that is what the tracking code works on), which keeps files small. File layout:
+
+    header  b"DREC", version uint8, depth scale float32
+    chunks  compressed size uint32, frame count uint32, height uint16, width uint16,
+            then zlib(timestamps float64[count] + frames uint16[count, height, width])
+"""
+
+# Stand-in for rs.option.filter_magnitude, for setting the magnitude of a RecordedDecimationFilter
+FILTER_MAGNITUDE = "filter_magnitude"
+
+MAGIC = b"DREC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sBf")
+CHUNK_HEADER = struct.Struct("<IIHH")
+
+
+class DepthRecorder:
+    """
+    Writes decimated depth frames to a recording file in compressed chunks.
+    """
+
+    def __init__(self, path, depth_scale=0.001, chunk_frames=30):
+        """
+        :param path: output file
+        :param depth_scale: metres per depth unit, from the camera's depth sensor
+        :param chunk_frames: frames buffered and compressed together
+        """
+        self.file = open(path, "wb")
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, depth_scale))
+        self.chunk_frames = chunk_frames
+        self.frames = []
+        self.timestamps = []
+        self.count = 0
+
+    def record(self, depth_image, timestamp=None):
+        """
+        Add one frame
+        :param depth_image: 2D uint16 depth image (after decimation)
+        :param timestamp: capture time in seconds, defaults to now
+        """
+        if self.frames and depth_image.shape != self.frames[0].shape:
+            self.flush()
+        self.frames.append(np.array(depth_image, dtype=np.uint16))
+        self.timestamps.append(time.monotonic() if timestamp is None else timestamp)
+        self.count += 1
+        if len(self.frames) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        height, width = self.frames[0].shape
+        data = np.asarray(self.timestamps, dtype="<f8").tobytes() + np.stack(self.frames).astype("<u2").tobytes()
+        compressed = zlib.compress(data, 6)
+        self.file.write(CHUNK_HEADER.pack(len(compressed), len(self.frames), height, width))
+        self.file.write(compressed)
+        self.frames = []
+        self.timestamps = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_recording(path):
+    """
+    Load a whole recording into memory
+    :param path: recording file
+    :return: (depth scale, list of (timestamp, depth image))
+    """
+    with open(path, "rb") as f:
+        magic, version, depth_scale = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a depth recording (magic {magic}, version {version})")
+        frames = []
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                break
+            size, count, height, width = CHUNK_HEADER.unpack(header)
+            data = zlib.decompress(f.read(size))
+            timestamps = np.frombuffer(data, dtype="<f8", count=count)
+            images = np.frombuffer(data, dtype="<u2", offset=count * 8).reshape(count, height, width)
+            frames.extend(zip(timestamps.tolist(), images))
+    return depth_scale, frames
+
+
+class RecordedDepthFrame:
+    """
+    Stand-in for rs.depth_frame
+    """
+
+    def __init__(self, image, timestamp):
+        self.image = image
+        self.timestamp = timestamp
+
+    def get_data(self):
+        return self.image
+
+    def get_timestamp(self):
+        """
+        :return: capture time in milliseconds, like the RealSense API
+        """
+        return self.timestamp * 1000
+
+    def __bool__(self):
+        return True
+
+
+class RecordedFrameset:
+    """
+    Stand-in for rs.composite_frame. Recordings only hold depth, so there is no color frame.
+    """
+
+    def __init__(self, depth_frame):
+        self.depth_frame = depth_frame
+
+    def get_depth_frame(self):
+        return self.depth_frame
+
+    def get_color_frame(self):
+        return None
+
+    def size(self):
+        return 1
+
+
+class PassthroughFilter:
+    """
+    Stand-in for rs.decimation_filter. Recorded frames are already decimated.
+    """
+
+    def set_option(self, option, value):
+        pass
+
+    def process(self, frame):
+        return frame
+
+
+class RecordedDecimationFilter:
+    """
+    Stand-in for rs.decimation_filter that can decimate recorded frames further.
+
+    Recorded frames are already decimated by recorded_magnitude. A larger magnitude set through
+    set_option(FILTER_MAGNITUDE, ...) subsamples them to the size the camera would deliver at that magnitude, so
+    tracking costs change on playback as they would live. Smaller magnitudes can't add detail back and play the frames
+    as recorded.
+    """
+
+    def __init__(self, recorded_magnitude=6):
+        """
+        :param recorded_magnitude: decimation magnitude the recording was made with
+        """
+        self.recorded_magnitude = recorded_magnitude
+        self.magnitude = recorded_magnitude
+
+    def set_option(self, option, value):
+        if option == FILTER_MAGNITUDE:
+            self.magnitude = value
+
+    def process(self, frame):
+        if self.magnitude <= self.recorded_magnitude:
+            return frame
+        image = frame.get_data()
+        height, width = image.shape
+        rows = max(height * self.recorded_magnitude // self.magnitude, 1)
+        columns = max(width * self.recorded_magnitude // self.magnitude, 1)
+        # Nearest pixel rather than the camera's block median, close enough for tracking
+        row_index = np.arange(rows) * height // rows
+        column_index = np.arange(columns) * width // columns
+        return RecordedDepthFrame(image[row_index[:, None], column_index], frame.timestamp)
+
+
+class DepthPlayback:
+    """
+    Plays a recording back through the rs.pipeline interface.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        """
+        :param path: recording file
+        :param speed: playback rate relative to the recorded timing. 0 plays as fast as frames are requested.
+        :param loop: start again from the beginning at the end of the recording instead of raising
+        """
+        self.depth_scale, self.frames = read_recording(path)
+        self.speed = speed
+        self.loop = loop
+        self.index = 0
+        self.start_time = None
+
+    def start(self, config=None):
+        self.index = 0
+        self.start_time = None
+        return self
+
+    def stop(self):
+        pass
+
+    def get_depth_scale(self):
+        return self.depth_scale
+
+    def wait_for_frames(self, timeout_ms=5000):
+        """
+        Return the next frame, sleeping until it is due when playing at real (or scaled) speed
+        :return: RecordedFrameset
+        """
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                # Same failure the RealSense pipeline reports when the camera goes quiet
+                raise RuntimeError("Frame didn't arrive within {}".format(timeout_ms))
+            self.index = 0
+            self.start_time = None
+        timestamp, image = self.frames[self.index]
+        first_timestamp = self.frames[0][0]
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        if self.speed:
+            due = self.start_time + (timestamp - first_timestamp) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.index += 1
+        return RecordedFrameset(RecordedDepthFrame(image, timestamp))
+
+
+def record_camera(path, seconds, decimation_magnitude=6):
+    """
+    Record the live RealSense camera
+    :param path: output file
+    :param seconds: how long to record
+    :param decimation_magnitude: same decimation the game uses
+    """
+    import pyrealsense2 as rs
+
+    decimation_filter = rs.decimation_filter()
+    decimation_filter.set_option(rs.option.filter_magnitude, decimation_magnitude)
+    pipeline = rs.pipeline()
+    rs_config = rs.config()
+    rs_config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
+    profile = pipeline.start(rs_config)
+    depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+    try:
+        with DepthRecorder(path, depth_scale=depth_scale) as recorder:
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                depth = pipeline.wait_for_frames().get_depth_frame()
+                if not depth: continue
+                depth_image = np.asanyarray(decimation_filter.process(depth).get_data())
+                recorder.record(depth_image, depth.get_timestamp() / 1000)
+        print(f"Recorded {recorder.count} frames to {path}")
+    finally:
+        pipeline.stop()
+
+
+def benchmark(path, clipping_distance_in_meters=1.6):
+    """
+    Run player tracking over a recording as fast as possible and report the per-frame cost
+    :param path: recording file
+    """
+    from exhibit.camera import blob
+    from exhibit.camera.tracking_filter import PlayerTrackingFilter
+
+    playback = DepthPlayback(path, speed=0)
+    clipping_distance = clipping_distance_in_meters / playback.get_depth_scale()
+    positions = []
+    timestamps = []
+    start = time.perf_counter()
+    for i in range(len(playback.frames)):
+        depth = playback.wait_for_frames().get_depth_frame()
+        depth_image = np.asanyarray(depth.get_data())
+        positions.append(blob.find_player(blob.foreground_mask(depth_image, clipping_distance)))
+        timestamps.append(depth.get_timestamp() / 1000)
+    elapsed = time.perf_counter() - start
+    found = [p for p in positions if p is not None]
+    print(f"{len(positions)} frames, {elapsed / max(len(positions), 1) * 1000:.3f} ms/frame, player in {len(found)}")
+
+    # Frame to frame jitter of the paddle target, raw and through the tracking filter
+    width = playback.frames[0][1].shape[1]
+    raw = [(p / width * 1.4) - 0.2 if p is not None else 0.5 for p in positions]
+    tracking = PlayerTrackingFilter()
+    filtered = [tracking.update(x, t) for x, t in zip(raw, timestamps)]
+    if len(raw) > 2:
+        print(f"jitter raw {np.std(np.diff(raw, n=2)):.4f}, filtered {np.std(np.diff(filtered, n=2)):.4f}, "
+              f"{tracking.rejected} outliers rejected")
+
+
+if __name__ == "__main__":
+    # python -m exhibit.camera.recording record <file> <seconds>
+    # python -m exhibit.camera.recording bench <file>
+    if len(sys.argv) >= 3 and sys.argv[1] == "record":
+        record_camera(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 30)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "bench":
+        benchmark(sys.argv[2])
+    else:
+        print("usage: python -m exhibit.camera.recording record <file> [seconds] | bench <file>")
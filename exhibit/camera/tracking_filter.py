@@ -0,0 +1,80 @@
+class PlayerTrackingFilter:
+    """
+    Alpha-beta (constant velocity) filter for the tracked player position.
+
+    The raw position jumps around by a few columns from frame to frame and is already one camera frame plus
+    processing old when the game reads it. This smooths the measurements, estimates the player's velocity, and
+    predicts forward to the time the game actually uses the position, so the paddle both jitters less and lags less.
+
+    Tuning: alpha and beta trade noise for latency. Higher values follow new measurements faster but pass on more
+    noise; lower values are smoother but slower to catch up. max_lead caps how far ahead the position is predicted
+    so a stalled camera doesn't send the paddle flying off along the last velocity.
+    """
+
+    def __init__(self, alpha=0.5, beta=0.1, outlier_threshold=0.25, max_outliers=2, max_lead=0.1, bounds=(-0.2, 1.2)):
+        """
+        :param alpha: position gain (0-1)
+        :param beta: velocity gain (0-1)
+        :param outlier_threshold: measurements further than this from the prediction are treated as glitches
+        :param max_outliers: after this many glitches in a row, accept the measurement as a real jump
+        :param max_lead: maximum seconds to predict past the latest measurement
+        :param bounds: (min, max) position range
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.outlier_threshold = outlier_threshold
+        self.max_outliers = max_outliers
+        self.max_lead = max_lead
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.v = 0.0
+        self.t = None
+        self.outliers = 0
+        self.rejected = 0
+
+    def update(self, measurement, timestamp):
+        """
+        Fold in a new position measurement
+        :param measurement: measured position
+        :param timestamp: time the measurement was taken (seconds, any monotonic clock shared with predict)
+        :return: filtered position at the measurement time
+        """
+        if self.x is None or self.t is None or timestamp <= self.t:
+            if self.x is None:
+                self.x = measurement
+                self.t = timestamp
+            return self.x
+
+        dt = timestamp - self.t
+        predicted = self.x + self.v * dt
+        residual = measurement - predicted
+        if abs(residual) > self.outlier_threshold and self.outliers < self.max_outliers:
+            # Probably a single bad frame (e.g. the blob briefly splitting). Coast on the prediction.
+            self.outliers += 1
+            self.rejected += 1
+            self.x = predicted
+            self.t = timestamp
+            return self.x
+        if abs(residual) > self.outlier_threshold:
+            # The jump persisted, so it is real (new player, player reappearing). Start tracking from there.
+            self.x = measurement
+            self.v = 0.0
+        else:
+            self.x = predicted + self.alpha * residual
+            self.v += self.beta * residual / dt
+        self.outliers = 0
+        self.t = timestamp
+        return self.x
+
+    def predict(self, timestamp):
+        """
+        :param timestamp: time to predict for, on the same clock as update
+        :return: predicted position, or None before the first measurement
+        """
+        if self.x is None:
+            return None
+        lead = min(max(timestamp - self.t, 0), self.max_lead)
+        return min(max(self.x + self.v * lead, self.bounds[0]), self.bounds[1])
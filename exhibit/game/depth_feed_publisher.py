@@ -0,0 +1,114 @@
+import base64
+import json
+import time
+
+import cv2
+
+
+class DepthFeedPublisher:
+    """
+    Publishes the depth camera preview for the browser visualizer.
+
+    The game loop runs at GAME_FPS but the camera only produces a new preview image at 30 Hz, so sending the feed
+    every game frame repeats the same multi-KB JPEG. This publisher only encodes and sends an image when the camera
+    produced a new one, caps the send rate, and steps down a resolution/quality ladder whenever the feed exceeds its
+    byte budget. It can also stop the feed entirely while no visualizer is connected.
+    """
+
+    def __init__(self, config, emit):
+        """
+        :param config: Config instance holding the DEPTH_FEED_* settings
+        :param emit: function taking the encoded payload (raw JPEG bytes, or a JSON string in legacy mode)
+        """
+        self.config = config
+        self.emit = emit
+        self.rung = min(self.config.DEPTH_FEED_START_RUNG, len(self.config.DEPTH_FEED_LADDER) - 1)
+        self.last_image_id = None
+        self.last_publish_time = None
+        self.last_visualizer_time = None
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.published = 0
+        self.bytes_sent = 0
+
+    def visualizer_seen(self, online=True):
+        """
+        Record a visualizer status message
+        :param online: False if the visualizer announced that it disconnected
+        """
+        self.last_visualizer_time = time.monotonic() if online else None
+
+    def active(self):
+        """
+        Whether the game should bother producing preview images at all
+        :return: Boolean
+        """
+        if not self.config.DEPTH_FEED_REQUIRE_VISUALIZER:
+            return True
+        if self.last_visualizer_time is None:
+            return False
+        return time.monotonic() - self.last_visualizer_time < self.config.DEPTH_FEED_VISUALIZER_TIMEOUT
+
+    def due(self):
+        """
+        Whether the rate limit would let an image out right now, so callers can skip rendering one that wouldn't be sent
+        :return: Boolean
+        """
+        return self.last_publish_time is None or time.monotonic() - self.last_publish_time >= 1 / self.config.DEPTH_FEED_MAX_FPS
+
+    def offer(self, image_id, image):
+        """
+        Publish the image if it is new and the rate limit allows. Cheap to call every game frame.
+        :param image_id: counter that changes whenever the camera produces a new preview image
+        :param image: BGR uint8 preview image
+        :return: True if the image was published
+        """
+        if image is None or image_id == self.last_image_id or not self.active():
+            return False
+        if not self.due():
+            # Leave the id unconsumed so the newest image goes out as soon as the interval has passed
+            return False
+        now = time.monotonic()
+
+        payload = self.encode(image)
+        self.last_image_id = image_id
+        self.last_publish_time = now
+        self.emit(payload)
+        self.published += 1
+        self.bytes_sent += len(payload)
+        self.adapt(len(payload), now)
+        return True
+
+    def encode(self, image):
+        """
+        Encode an image at the current ladder rung
+        :param image: BGR uint8 preview image
+        :return: raw JPEG bytes, or a {"feed": base64} JSON string if DEPTH_FEED_BINARY is disabled
+        """
+        scale, quality = self.config.DEPTH_FEED_LADDER[self.rung]
+        if scale != 1:
+            h, w = image.shape[:2]
+            image = cv2.resize(image, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+        jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        if self.config.DEPTH_FEED_BINARY:
+            return jpeg
+        return json.dumps({"feed": base64.b64encode(jpeg).decode()})
+
+    def adapt(self, size, now):
+        """
+        Move along the ladder once a second based on the measured byte rate
+        :param size: bytes just sent
+        :param now: monotonic timestamp of the send
+        """
+        self.window_bytes += size
+        elapsed = now - self.window_start
+        if elapsed < 1:
+            return
+        rate = self.window_bytes / elapsed
+        budget = self.config.DEPTH_FEED_MAX_BYTES_PER_SEC
+        if rate > budget and self.rung < len(self.config.DEPTH_FEED_LADDER) - 1:
+            self.rung += 1
+        elif rate < budget / 2 and self.rung > 0:
+            self.rung -= 1
+        self.window_start = now
+        self.window_bytes = 0
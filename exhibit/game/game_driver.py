@@ -13,11 +13,18 @@ import threading
 import time
 from queue import Queue
 from exhibit.shared.utils import Timer
+from exhibit.camera import blob
+from exhibit.game.remote_camera import RemoteCamera
+from exhibit.camera.preview import DepthPreviewWorker
+from exhibit.camera.background import BackgroundModel
+from exhibit.shared.clock import make_clock
+from exhibit.shared.latency import SaturationMonitor
 
 """
 This file is the driver for the game component.
 
 It polls the agents for actions and advances frames and game state at a steady rate.
+With GAME_WARP above 1 that rate is kept on a virtual clock running N times faster than real time (see soak.py).
 """
 class GameDriver:
     def run(self, level):
@@ -29,6 +36,22 @@ class GameDriver:
         # if one of our players is Bot
         if type(self.bottom_agent) == BotPlayer: self.bottom_agent.attach_env(env)
         if type(self.top_agent) == BotPlayer: self.top_agent.attach_env(env)
+
+        # Frame ids restart with every new environment, so anything still scheduled belongs to the last level
+        self.subscriber.reset_action_buffers()
+        self.subscriber.reset_latency()
+        latency = self.subscriber.latency
+        clock = self.clock
+        saturation = self.saturation
+        saturation.reset()
+        ai_player = type(self.top_agent) == AIPlayer
+        # Real seconds between AI requests: a component slower than this can't keep up
+        request_interval = clock.real_seconds(self.config.AI_FRAME_INTERVAL / currentFPS)
+        last_reply_frame = None
+        use_jitter_buffer = self.config.AI_JITTER_BUFFER and type(self.top_agent) == AIPlayer
+        # In AI vs AI games (AI_PADDLES with both paddles) the bottom paddle is scheduled the same way
+        bottom_jitter_buffer = self.config.AI_JITTER_BUFFER and type(self.bottom_agent) == AIPlayer
+        if type(self.bottom_agent) == CameraPlayer: self.bottom_agent.start()
         
         # Housekeeping
         score_l = 0
@@ -36,20 +59,25 @@ class GameDriver:
 
         # Emit state over MQTT and keep a running timer to track the interval
         self.subscriber.emit_state(env.get_packet_info(), request_action=True)
-        last_frame_time = time.time()
+        run_start = clock.time()
+        run_start_real = time.perf_counter()
 
         # Track skipped frame statistics
         frame_skips = []
 
         i = 0
         done = False
-        last_frame_time = time.time()
+        last_frame_time = clock.time()
         while not done:
             action_l, depth_l, prob_l = self.bottom_agent.act()
             for i in range(self.config.AI_FRAME_INTERVAL):
+                frame_start = latency.now()
                 rendered_frame = env.frames
                 #Timer.start("act")
-                action_r, depth_r, prob_r = self.top_agent.act()
+                if use_jitter_buffer:
+                    action_r, depth_r, prob_r = self.top_agent.act_scheduled(env.frames)
+                else:
+                    action_r, depth_r, prob_r = self.top_agent.act()
                 acted_frame = self.top_agent.get_frame()
                 if self.config.MOVE_TIMESTAMPS:
                     print(f'{time.time_ns() // 1_000_000} F{env.frames} MOVE W/PRED {self.top_agent.get_frame()}')
@@ -61,40 +89,65 @@ class GameDriver:
                             frame_skips.append(0)  # Frame diffs of 0-5 frames are always intentional
                         else:
                             frame_skips.append(frames_behind - self.config.AI_FRAME_INTERVAL)
+                if ai_player and acted_frame is not None and acted_frame != last_reply_frame:
+                    # A new reply: did the AI and the network each finish within one request interval?
+                    last_reply_frame = acted_frame
+                    ai_time = self.subscriber.paddle1_ai_time
+                    round_trip = self.top_agent.get_action_buffer().last_round_trip()
+                    if ai_time is not None:
+                        saturation.observe("ai", ai_time > request_interval, rendered_frame, clock.time() - run_start)
+                        if round_trip is not None:
+                            saturation.observe("mqtt", round_trip - ai_time > request_interval, rendered_frame,
+                                               clock.time() - run_start)
 
                 if type(self.bottom_agent) == HumanPlayer or type(self.bottom_agent) == CameraPlayer:
                     action_l, depth_l, prob_l = self.bottom_agent.act()
+                elif bottom_jitter_buffer:
+                    action_l, depth_l, prob_l = self.bottom_agent.act_scheduled(env.frames)
 
                 #Timer.stop("act")
 
-                next_frame_time = last_frame_time + (1 / currentFPS)
+                next_frame_time = last_frame_time + (1 / currentFPS)  # in game time
 
                 #Timer.start("step")
+                step_start = latency.now()
                 state, reward, done = env.step(self.config.ACTIONS[action_l], self.config.ACTIONS[action_r], frames=1, depth=depth_l)
+                latency.record_since("step", step_start)
                 #Timer.stop("step")
                 reward_l, reward_r = reward
                 if reward_r < 0: score_l -= reward_r
                 if reward_r > 0: score_r += reward_r
                 #Timer.start("emit")
                 if i == self.config.AI_FRAME_INTERVAL - 1:
+                    if ai_player:
+                        # Replies more than a request behind the expected delay mean the AI path has a backlog
+                        replies_behind = last_reply_frame is None and env.frames > 2 * self.config.AI_FRAME_INTERVAL \
+                            or last_reply_frame is not None and env.frames - last_reply_frame > \
+                            (self.config.AI_FRAME_DELAY + 2) * self.config.AI_FRAME_INTERVAL
+                        saturation.observe("ai_backlog", replies_behind, env.frames, clock.time() - run_start)
                     self.subscriber.emit_state(env.get_packet_info(), request_action=True)
                 else:
                     self.subscriber.emit_state(env.get_packet_info(), request_action=False)
-                self.subscriber.emit_depth_feed(env.depth_feed)
                 #Timer.stop("emit")
-                to_sleep = next_frame_time - time.time()
+                latency.record_since("frame_work", frame_start)
+                to_sleep = next_frame_time - clock.time()
+                saturation.observe("game", to_sleep < 0, env.frames, clock.time() - run_start)
                 if to_sleep < 0:
                     pass
                     #print(f"Warning: render tick is lagging behind by {-int(to_sleep * 1000)} ms.")
                 else:
-                    time.sleep(to_sleep)
+                    clock.sleep(to_sleep)
 
-                last_frame_time = time.time()
+                last_frame_time = clock.time()
 
-            last_frame_time = time.time()
+            last_frame_time = clock.time()
 
             i += 1
 
+        if type(self.bottom_agent) == CameraPlayer:
+            self.bottom_agent.stop()
+            print(self.bottom_agent.summary())
+
         print('Score: %f - %f.' % (score_l, score_r))
         if self.config.BEHIND_FRAMES:
             print(frame_skips)
@@ -103,6 +156,29 @@ class GameDriver:
                     f"{np.max(frame_skips)} max, {np.unique(frame_skips, return_counts=True)}")
             except Exception as excep:
                 print(excep)
+        if use_jitter_buffer:
+            print(self.top_agent.get_action_buffer().summary())
+        if bottom_jitter_buffer:
+            print(self.bottom_agent.get_action_buffer().summary())
+        print(self.subscriber.latency_snapshot().report())
+
+        game_seconds = clock.time() - run_start
+        real_seconds = time.perf_counter() - run_start_real
+        stats = {
+            "level": level,
+            "frames": env.frames,
+            "game_seconds": game_seconds,
+            "real_seconds": real_seconds,
+            "fps": env.frames / max(real_seconds, 1e-9),
+            "speed": env.frames / currentFPS / max(real_seconds, 1e-9),  # achieved warp factor
+            "score": (score_l, score_r),
+            "first_saturated": saturation.first_saturated(),
+            "saturation": saturation.summary(),
+        }
+        print(f"Run: {stats['frames']} frames in {real_seconds:.1f}s ({game_seconds:.1f}s game time), "
+              f"{stats['fps']:.0f} fps, {stats['speed']:.2f}x real time (target {clock.speed}x)")
+        print(saturation.report())
+        return stats
 
     def __init__(self, config, subscriber, bottom_agent, top_agent, pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance):
         self.subscriber = subscriber
@@ -115,10 +191,16 @@ class GameDriver:
         self.clipping_distance = clipping_distance
         self.config = config
         self.subscriber = subscriber
+        self.clock = make_clock(config.GAME_WARP)
+        self.saturation = SaturationMonitor(window=config.SATURATION_WINDOW)
+        # Depth previews are rendered and sent off the game and tracking threads
+        self.depth_preview = DepthPreviewWorker(subscriber.depth_feed)
+        self.depth_preview.start()
+        Pong.depth_preview = self.depth_preview
 
 
 # checks if theres a big enough player sized blob
-def check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance):
+def check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance, background=None):
         #try to get the frame 50 times
         for i in range(50): 
             frames = pipeline.wait_for_frames()
@@ -131,35 +213,22 @@ def check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percen
             depth_image = np.asanyarray(depth_filtered.get_data())
             
             # cropping the image based on a width and height percentage
-            w,h = depth_image.shape
-            ws, we = int(w/2 - (w * crop_percentage_w)/2), int(w/2 + (w * crop_percentage_w)/2)
-            hs, he = int(h/2 - (h * crop_percentage_h)/2), int(h/2 + (h * crop_percentage_h)/2)
-            #print("dimension: {}, {}, width: {},{} height: {},{}".format(w,h,ws,we,hs,he))
-            depth_cropped = depth_image[ws:we, hs:he]
-            #depth_cropped = depth_image
-
-            cutoffImage = np.where((depth_cropped < clipping_distance) & (depth_cropped > 0.1), True, False)
-
-            #print(f'cutoffImage shape is {cutoffImage.shape}, depth_cropped shape is {depth_cropped.shape}');
-            avg_x = 0
-            avg_x_array = np.array([])
-            countB = 0
-            for a in range(np.size(cutoffImage,0)):
-                for b in range(np.size(cutoffImage,1)):
-                    if cutoffImage[a,b] :
-                        avg_x += b
-                        #print(b)
-                        avg_x_array = np.append(avg_x_array,b)
-                        countB = countB+1
-            # if we got no pixels in depth, return false
-            if countB <= 40: 
-                return False
+            depth_cropped = blob.crop(depth_image, crop_percentage_w, crop_percentage_h)
+            if background is not None:
+                cutoffImage = background.foreground_mask(depth_cropped, clipping_distance)
+            else:
+                cutoffImage = blob.foreground_mask(depth_cropped, clipping_distance)
+            present = np.count_nonzero(cutoffImage) > blob.MIN_PLAYER_PIXELS
+            if background is not None:
+                # the idle checks are the only frames this path sees without a player, so learn the scene from them
+                background.observe(depth_cropped, present)
 
-            return True # successfully found a player, return true
+            # if we got no pixels in depth, return false
+            return present # true if we successfully found a player
         return False # failed to get camera image, return false
 
 # checks if there is a player and returns their position from 0 to 1 so that we can tell if theyre walking through or still to play
-def check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance):
+def check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance, background=None):
     #try to get the frame 50 times
     for i in range(20):
         try:
@@ -178,68 +247,63 @@ def check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_
         depth_image = np.asanyarray(depth_filtered.get_data())
 
         # cropping the image based on a width and height percentage
-        w,h = depth_image.shape
-        ws, we = int(w/2 - (w * crop_percentage_w)/2), int(w/2 + (w * crop_percentage_w)/2)
-        hs, he = int(h/2 - (h * crop_percentage_h)/2), int(h/2 + (h * crop_percentage_h)/2)
-        #print("dimension: {}, {}, width: {},{} height: {},{}".format(w,h,ws,we,hs,he))
-        depth_cropped = depth_image[ws:we, hs:he]
-        #depth_cropped = depth_image
-
-        cutoffImage = np.where((depth_cropped < clipping_distance) & (depth_cropped > 0.1), True, False)
-
-        #print(f'cutoffImage shape is {cutoffImage.shape}, depth_cropped shape is {depth_cropped.shape}');
-        avg_x = 0
-        avg_x_array = np.array([])
-        countB = 0
-        for a in range(np.size(cutoffImage,0)):
-            for b in range(np.size(cutoffImage,1)):
-                if cutoffImage[a,b] :
-                    avg_x += b
-                    #print(b)
-                    avg_x_array = np.append(avg_x_array,b)
-                    countB = countB+1
+        depth_cropped = blob.crop(depth_image, crop_percentage_w, crop_percentage_h)
+        if background is not None:
+            cutoffImage = background.foreground_mask(depth_cropped, clipping_distance)
+        else:
+            cutoffImage = blob.foreground_mask(depth_cropped, clipping_distance)
+
+        # median column of the biggest island of foreground pixels
+        m = blob.find_player(cutoffImage)
         # if we got no pixels in depth, return false
-        if countB <= 40:
+        if m is None:
             return -5.0
 
-        avg_x_array.sort()
-        islands = []
-        i_min = 0
-        i_max = 0
-        p = avg_x_array[0]
-        for index in range(np.size(avg_x_array,0)) :
-            n = avg_x_array[index]
-            if n > p+1 and not i_min == i_max : # if the island is done
-                islands.append(avg_x_array[i_min:i_max])
-                i_min = index
-            i_max = index
-            p = n
-        if not i_min == i_max: islands.append(avg_x_array[i_min:i_max])
-
-
-        #print(islands)
-        bigIsland = np.array([])
-        for array in islands:
-            if np.size(array,0) > np.size(bigIsland,0): bigIsland = array
-
-        #print(np.median(bigIsland))
-        m = (np.median(bigIsland))
-
         return (m/(np.size(cutoffImage,1)) * 1) # -0.2 # return value
     return -5.0 # failed to get camera image, return bas value
 
 
+# samples the player position 30 times to tell if they're walking through or still to play
+def sample_still_player(player_position):
+    arrayVals = np.array([]) # empty numpy array to store values to check if person is still
+    has_bad_values = False
+
+    # take 40 measurements of the player to see if they actually are trying to
+    for counter in range(0,30):
+        c_value = player_position()
+        if c_value == -0.5:
+            # c_value is our dummy value for not seeing a human blob
+            # continue loop back at waiting for interaction
+            has_bad_values = True
+        arrayVals = np.append(arrayVals, c_value)
+
+    # if standard deviation of values from check_for_still_player was too variable (person walking by) or there was no person:
+    return not (np.std(arrayVals) > 0.06 or has_bad_values)
+
+
 def main(in_q, config=Config.instance()):
     print("from gameDriver, about to init GameSubscriber")
-    subscriber = GameSubscriber()
+    subscriber = GameSubscriber(config=config)
     print(f'The current MAX_SCORE is set to {config.MAX_SCORE}')
 
     agent = AIPlayer(subscriber, top=True)
     #agent = HumanPlayer('o', 'l')
 
-    if config.USE_DEPTH_CAMERA:
+    if config.USE_DEPTH_CAMERA and config.CAMERA_SERVICE:
+        print("Configured to use the depth camera service")
+        opponent = CameraPlayer(config, subscriber=subscriber)
+        # The camera driver process owns the camera, the game only reads camera/position
+        camera = RemoteCamera(subscriber)
+        player_present = camera.check_for_player
+        player_still = camera.check_for_still_player
+        pipeline = None
+        decimation_filter = None
+        crop_percentage_w = None
+        crop_percentage_h = None
+        clipping_distance = None
+    elif config.USE_DEPTH_CAMERA:
         print("Configured to use depth Camera")
-        opponent = CameraPlayer()
+        opponent = CameraPlayer(config)
         decimation_filter = rs.decimation_filter()
         decimation_filter.set_option(rs.option.filter_magnitude, 6)
 
@@ -253,7 +317,7 @@ def main(in_q, config=Config.instance()):
 
         rs_config = rs.config()
         rs_config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-        rs_config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
+        # No color stream: it was only used to align the preview, which is drawn from depth alone
 
         profile = pipeline.start(rs_config)
 
@@ -268,6 +332,11 @@ def main(in_q, config=Config.instance()):
         clipping_distance_in_meters = 1.6 #2 meter
         clipping_distance = clipping_distance_in_meters / depth_scale
         print(f'the Clipping Distance is : {clipping_distance}')
+        # learned from the idle player checks, so the scene should be empty when the exhibit starts
+        background = BackgroundModel(config.BACKGROUND_TOLERANCE / depth_scale) if config.BACKGROUND_MODEL else None
+        Pong.background = background
+        player_present = lambda: check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance, background)
+        player_still = lambda: sample_still_player(lambda: check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance, background))
     else:
         print("Configured to NOT use depth Camera")
         opponent = HumanPlayer('a', 'd')
@@ -296,7 +365,7 @@ def main(in_q, config=Config.instance()):
             dataQ = in_q.get() # remember that .get() removes the item from the queue
             if dataQ == "endThreads":
                 print('thread quitting')
-                subscriber.client.disconnect()
+                subscriber.transport.disconnect()
                 print(f'in_q is {dataQ} and in_q.empty() is {in_q.empty()}')
                 while not in_q.empty: # clear out the q
                     dataQ = in_q.get()
@@ -313,24 +382,12 @@ def main(in_q, config=Config.instance()):
             if config.USE_DEPTH_CAMERA:
                 print("          Waiting for user interaction to begin game . . . ")
                 # checking if theres a large enough human blob to track
-                while not check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance):
+                while not player_present():
                     time.sleep(0.01) # will just loop and stay at level zero until it sees someone
                 print("          Human detected, checking if still . . . ")
 
-                arrayVals = np.array([]) # empty numpy array to store values to check if person is still
-                has_bad_values = False
-
-                # take 40 measurements of the player to see if they actually are trying to
-                for counter in range(0,30):
-                    c_value = check_for_still_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance)
-                    if c_value == -0.5:
-                        # c_value is our dummy value for not seeing a human blob
-                        # continue loop back at waiting for interaction
-                        has_bad_values = True
-                    arrayVals = np.append(arrayVals, c_value)
-
-                # if standard deviation of values from check_for_still_player was too variable (person walking by) or there was no person:
-                if np.std(arrayVals) > 0.06 or has_bad_values:
+                # if the player was too variable (person walking by) or there was no person:
+                if not player_still():
                     # either there wasn't a person blob large enough, or the player wasn't still. Don't start game
                     print("          No still player.        ")
                     continue
@@ -348,7 +405,7 @@ def main(in_q, config=Config.instance()):
                 print("          Waiting for user interaction to advance level . . . ")
                 counter = 0
                 while True:
-                    if check_for_player(pipeline, decimation_filter, crop_percentage_w, crop_percentage_h, clipping_distance):
+                    if player_present():
                         # there is still a large enough player blob present, move on to next level
                         level = level + 1
                         print(f'    !      Human detected, beginning level {level}. ')
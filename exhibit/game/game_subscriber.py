@@ -1,63 +1,153 @@
 import json
-import paho.mqtt.client as mqtt
 import numpy as np
 import time
 from exhibit.shared.utils import Config
+from exhibit.game.jitter_buffer import ActionJitterBuffer
+from exhibit.game.depth_feed_publisher import DepthFeedPublisher
+from exhibit.shared.latency import LatencyRecorder
+from exhibit.shared.topics import game_topic, split_game_topic
+from exhibit.shared.transport import make_transport
+from exhibit.camera.capture import LatestValue
 
 class GameSubscriber:
     def emit_state(self, state, request_action=False):
+        emit_start = LatencyRecorder.now()
         (puck_x, puck_y), bottom_x, top_x, score_left, score_right, frame = state
+        if self.state_log is not None:
+            self.state_log.write(json.dumps(state) + "\n")
 
-        self.client.publish("puck/position", payload=json.dumps({"x": puck_x, "y": puck_y}))
-        self.client.publish("paddle1/position", payload=json.dumps({"position": bottom_x}))
-        self.client.publish("paddle2/position", payload=json.dumps({"position": top_x}))
-        self.client.publish("player1/score", payload=json.dumps({"score": score_left}))
-        self.client.publish("player2/score", payload=json.dumps({"score": score_right}))
+        publish = self.transport.publish
+        publish(self.topic("puck/position"), {"x": puck_x, "y": puck_y})
+        publish(self.topic("paddle1/position"), {"position": bottom_x})
+        publish(self.topic("paddle2/position"), {"position": top_x})
+        publish(self.topic("player1/score"), {"score": score_left})
+        publish(self.topic("player2/score"), {"score": score_right})
 
         if request_action:
-            self.client.publish("game/frame", payload=json.dumps({"frame": frame}))
+            # Only AI paddles get replies, a request on another paddle's buffer would never be answered
+            if "paddle1" in self.ai_paddles:
+                self.paddle1_buffer.mark_requested(frame)
+            if "paddle2" in self.ai_paddles:
+                self.paddle2_buffer.mark_requested(frame)
+            packet = {"frame": frame}
+            round_trip = self.paddle1_buffer.last_round_trip()
+            if round_trip is not None:
+                packet["rtt"] = round_trip  # Lets the AI estimate how far ahead to predict
+            if self.config.GAME_ID is not None:
+                packet["paddles"] = self.config.AI_PADDLES
+            publish(self.topic("game/frame"), packet)
             if Config.instance().NETWORK_TIMESTAMPS:
                 print(f'{time.time_ns() // 1_000_000} F{frame} SEND GM->AI')
+        self.latency.record_since("emit", emit_start)
 
-    # get depth camera feed into browser
-    def emit_depth_feed(self, feed):
-        self.client.publish("depth/feed", payload=json.dumps({"feed": feed}))
-        #print(f'emitting depth feed: {feed}')
+    def latency_snapshot(self):
+        """
+        :return: LatencyRecorder combining the game's stages with both jitter buffers' timings
+        """
+        return self.latency.merged(self.paddle1_buffer.latency, self.paddle2_buffer.latency)
+
+    def reset_latency(self):
+        self.latency.reset()
+        self.paddle1_buffer.latency.reset()
+        self.paddle2_buffer.latency.reset()
+
+    # get depth camera feed into browser. The payload is already encoded by DepthFeedPublisher
+    def emit_depth_feed(self, payload):
+        self.transport.publish_binary("depth/feed", payload)
 
     def emit_level(self, level):
-        self.client.publish("game/level", payload=json.dumps({"level": level}), qos=2)
-
-    def on_connect(self, client, userdata, flags, rc):
-        print("Connected with result code " + str(rc))
-        client.subscribe("paddle1/action")
-        client.subscribe("paddle2/action")
-        client.subscribe("paddle1/frame")
-        client.subscribe("paddle2/frame")
-
-    def on_message(self, client, userdata, msg):
-        topic = msg.topic
-        payload = json.loads(msg.payload)
+        self.transport.publish(self.topic("game/level"), {"level": level}, qos=2)
+
+    def reset_action_buffers(self):
+        """
+        Clear scheduled actions. Must be called whenever a new game restarts the frame counter.
+        """
+        self.paddle1_buffer.reset()
+        self.paddle2_buffer.reset()
+
+    def topic(self, name):
+        """
+        :param name: game <-> AI topic, e.g. "paddle1/action"
+        :return: the topic in this game's namespace when GAME_ID is set
+        """
+        return game_topic(self.config.GAME_ID, name)
+
+    def on_connect(self):
+        transport = self.transport
+        transport.subscribe(self.topic("paddle1/action"))
+        transport.subscribe(self.topic("paddle2/action"))
+        transport.subscribe(self.topic("paddle1/frame"))
+        transport.subscribe(self.topic("paddle2/frame"))
+        transport.subscribe("visualizer/status")
+        transport.subscribe("diagnostics/latency")
+        if self.config.CAMERA_SERVICE:
+            transport.subscribe("camera/position")
+            transport.subscribe("camera/presence")
+
+    def on_message(self, topic, payload):
+        _, topic = split_game_topic(topic)
         if topic == "paddle1/action":
             self.paddle1_action = int(payload["action"])
+            self.paddle1_ai_time = payload.get("ai_time")
+            if "frame" in payload:
+                # Always measure the round trip, only schedule the action when the jitter buffer is on
+                self.paddle1_buffer.push(payload["frame"], self.paddle1_action, ai_time=payload.get("ai_time"),
+                                          schedule=self.config.AI_JITTER_BUFFER)
         if topic == "paddle1/frame":
             self.paddle1_frame = payload["frame"]
             if Config.instance().NETWORK_TIMESTAMPS:
                 print(f'{time.time_ns() // 1_000_000} F{self.paddle1_frame} RECV AI->GM')
         if topic == "paddle2/action":
             self.paddle2_action = int(payload["action"])
+            self.paddle2_ai_time = payload.get("ai_time")
+            if "frame" in payload:
+                # Always measure the round trip, only schedule the action when the jitter buffer is on
+                self.paddle2_buffer.push(payload["frame"], self.paddle2_action, ai_time=payload.get("ai_time"),
+                                          schedule=self.config.AI_JITTER_BUFFER)
         if topic == "paddle2/frame":
             self.paddle2_frame = payload["frame"]
+        if topic == "camera/position":
+            self.camera_position.put(payload)
+        if topic == "camera/presence":
+            self.camera_presence = payload
+        if topic == "visualizer/status":
+            self.depth_feed.visualizer_seen(online=payload["online"])
+        if topic == "diagnostics/latency":
+            # On demand dump, e.g. `mosquitto_pub -t diagnostics/latency -m {}`
+            latency = self.latency_snapshot()
+            print(latency.report())
+            self.transport.publish("diagnostics/latency/game", latency.summary())
 
-    def __init__(self):
+    def __init__(self, config=None):
         print("init GameSubscriber")
-        self.client = mqtt.Client(client_id="game_module")
-        self.client.connect_async("localhost", port=1883, keepalive=60)
-        self.client.on_connect = lambda client, userdata, flags, rc : self.on_connect(client, userdata, flags, rc)
-        self.client.on_message = lambda client, userdata, msg : self.on_message(client, userdata, msg)
-        self.client.loop_start()
+        if config is None:
+            config = Config.instance()
+        self.config = config
+        # AI_FRAME_DELAY counts inferences, so convert it to game frames for scheduling
+        delay_frames = self.config.AI_FRAME_DELAY * self.config.AI_FRAME_INTERVAL
+        self.latency = LatencyRecorder("game", enabled=self.config.LATENCY_HISTOGRAMS)  # Written by the game thread
+        # Buffers record from the network thread and the game thread under their own locks, so each gets a recorder
+        self.paddle1_buffer = ActionJitterBuffer(delay_frames, latency=LatencyRecorder(
+            "paddle1", enabled=self.config.LATENCY_HISTOGRAMS))
+        self.paddle2_buffer = ActionJitterBuffer(delay_frames, latency=LatencyRecorder(
+            "paddle2", enabled=self.config.LATENCY_HISTOGRAMS))
+        self.ai_paddles = set()  # Paddles played by the networked AI, registered by AIPlayer
+        self.depth_feed = DepthFeedPublisher(self.config, emit=self.emit_depth_feed)
+        self.camera_position = LatestValue()  # Latest camera/position message from the camera service
+        self.camera_presence = None  # Latest camera/presence state from the camera service
+        # Every emitted state is also appended here, for replay by the load generator
+        self.state_log = open(self.config.GAME_STATE_RECORD_FILE, "a") if self.config.GAME_STATE_RECORD_FILE else None
+        # Stations sharing a broker need distinct client ids, or the broker drops one when the other connects
+        client_id = "game_module" if self.config.GAME_ID is None else f"game_module_{self.config.GAME_ID}"
+        self.transport = make_transport(self.config, client_id)
+        self.transport.on_connect = self.on_connect
+        self.transport.on_message = self.on_message
+        self.transport.loop_start()
         self.paddle1_action = 2  # ID for "NONE"
         self.paddle1_prob = np.array([0, 1])
         self.paddle1_frame = None
+        self.paddle1_ai_time = None  # Seconds the AI reported spending on its latest reply
         self.paddle2_action = 2  # ID for "NONE"
         self.paddle2_prob = np.array([0, 1])
         self.paddle2_frame = None
+        self.paddle2_ai_time = None
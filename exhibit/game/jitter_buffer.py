@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ActionJitterBuffer:
+    """
+    Schedules networked AI actions onto a fixed target frame.
+
+    Without buffering, the game applies whatever action most recently arrived over MQTT, so the effective AI delay
+    drifts with network and inference jitter. The simulator that trained the models instead applies each action a
+    fixed number of frames after the observation it was inferred from (see AI_FRAME_DELAY and action_buffer in
+    simulator.py). This buffer reproduces that model on the live game: an action inferred from request frame f is
+    held until frame f + delay_frames and applied exactly then if it arrived in time. Late arrivals are applied as
+    soon as they show up and are counted so that latency variance can be measured.
+
+    push() is called from the MQTT network thread, everything else from the game loop.
+    """
+
+    def __init__(self, delay_frames, default_action=2, latency=None, history=1000):
+        """
+        :param delay_frames: Frames between an observation being requested and its action being applied
+        :param default_action: Action id held before the first action is applied (2 is "NONE")
+        :param latency: optional LatencyRecorder for round trip, network and apply timings. Only written under this
+            buffer's lock, from two threads, so it must not be shared with anything else
+        :param history: Most recent round trips and late arrivals kept for the summary
+        """
+        self.delay_frames = delay_frames
+        self.history = history
+        self.default_action = default_action
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all scheduling state and statistics. Should be called whenever the game frame counter restarts.
+        """
+        with self.lock:
+            self.requested = {}  # request frame -> monotonic send time
+            self.pending = {}  # target frame -> (action, request time, arrival time)
+            self.current_action = self.default_action
+            self.applied_target = -1
+            self.last_polled_frame = -1
+            self.on_time = 0
+            self.late = 0
+            self.superseded = 0
+            self.stale = 0
+            self.late_frames = deque(maxlen=self.history)
+            self.round_trips = deque(maxlen=self.history)
+
+    def mark_requested(self, frame):
+        """
+        Record that the game asked the AI for an action on this frame
+        :param frame: game frame id sent on game/frame
+        """
+        with self.lock:
+            self.requested[frame] = time.perf_counter()
+            self.forget_requests(frame)
+
+    def forget_requests(self, frame):
+        """
+        Forget requests the AI will never answer so the table can't grow across a long level. Call with the lock held.
+        :param frame: current game frame id
+        """
+        horizon = frame - 10 * max(self.delay_frames, 1)
+        for requested_frame in [f for f in self.requested if f < horizon]:
+            del self.requested[requested_frame]
+
+    def push(self, request_frame, action, ai_time=None, schedule=True):
+        """
+        Schedule an action received from the AI
+        :param request_frame: frame id of the observation the action was inferred from
+        :param action: action id
+        :param ai_time: seconds the AI reports spending between receiving the frame and replying, if known
+        :param schedule: False to only measure the round trip, when the game applies actions as they arrive
+        """
+        with self.lock:
+            arrived = time.perf_counter()
+            sent = self.requested.pop(request_frame, None)
+            if sent is None:
+                # Never requested in this game (e.g. a reply for a frame id from the previous level)
+                self.stale += 1
+                return
+            round_trip = arrived - sent
+            self.round_trips.append(round_trip)
+            if self.latency is not None:
+                self.latency.record("round_trip", round_trip)
+                if ai_time is not None:
+                    # Clocks can't be compared across machines, so the network share is whatever the AI didn't spend
+                    self.latency.record("network", round_trip - ai_time)
+            if not schedule:
+                return
+
+            target = request_frame + self.delay_frames
+            if target > self.last_polled_frame:
+                self.pending[target] = (action, sent, arrived)
+                return
+
+            # The target frame has already been played without this action. Apply it on the next frame instead.
+            self.late += 1
+            self.late_frames.append(self.last_polled_frame - target + 1)
+            if self.latency is not None:
+                self.latency.record("emit_to_apply", arrived - sent)
+            if target > self.applied_target:
+                self.applied_target = target
+                self.current_action = action
+            else:
+                self.superseded += 1
+
+    def poll(self, frame):
+        """
+        Fetch the action to apply on this frame
+        :param frame: current game frame id
+        :return: action id
+        """
+        with self.lock:
+            self.last_polled_frame = frame
+            due = [target for target in self.pending if target <= frame]
+            if due:
+                latest = max(due)
+                for target in due:
+                    action, sent, arrived = self.pending.pop(target)
+                    if target == latest and target > self.applied_target:
+                        self.applied_target = target
+                        self.current_action = action
+                        self.on_time += 1
+                        if self.latency is not None:
+                            applied = time.perf_counter()
+                            self.latency.record("apply_wait", applied - arrived)
+                            self.latency.record("emit_to_apply", applied - sent)
+                    else:
+                        self.superseded += 1
+            self.forget_requests(frame)
+            return self.current_action
+
+    def last_round_trip(self):
+        """
+        :return: Most recent request to reply time in seconds, or None if nothing has been received yet
+        """
+        with self.lock:
+            if not self.round_trips:
+                return None
+            return self.round_trips[-1]
+
+    def summary(self):
+        """
+        Build a human readable report of buffer statistics since the last reset
+        :return: summary string
+        """
+        with self.lock:
+            received = self.on_time + self.late
+            text = f"Jitter buffer ({self.delay_frames} frame delay): {received} actions received, " \
+                   f"{self.on_time} on time, {self.late} late, {self.superseded} superseded, {self.stale} stale"
+            if self.late_frames:
+                text += f"\n  Late by: {np.mean(self.late_frames):.2f} mean, {np.max(self.late_frames)} max frames"
+            if self.round_trips:
+                rtt = np.array(self.round_trips) * 1000
+                text += f"\n  Round trip: {np.mean(rtt):.1f} mean, {np.std(rtt):.1f} stdev, " \
+                        f"{np.percentile(rtt, 99):.1f} p99, {np.max(rtt):.1f} max ms"
+            return text
@@ -0,0 +1,321 @@
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from exhibit.shared.config import Config
+from exhibit.shared.latency import LatencyHistogram
+from exhibit.shared.topics import game_topic
+
+"""
+MQTT load generator emulating many concurrent games.
+
+Each SimulatedGame is its own MQTT client that publishes the same traffic as GameSubscriber.emit_state (positions and
+scores every frame, a game/frame request every AI_FRAME_INTERVAL frames) at a configurable frame rate, and times the
+AI's action replies. States come from a recording (GAME_STATE_RECORD_FILE) or a synthetic rally.
+
+Every game numbers its frames from its own block of ids (index * FRAME_ID_STRIDE), so replies can be attributed even
+when all games share the single-game topics the AI driver listens on. With `namespaced` each game publishes under its
+own games/load<i>/ namespace instead, for the multi-tenant AI server (exhibit/ai/ai_server.py). A request that gets
+no reply within REPLY_TIMEOUT seconds counts as lost.
+
+sweep() runs the load for a growing number of games K and reports throughput, loss and reply latency for each K.
+Start an AI driver or server and a broker (Mosquitto, or the bundled one with `broker` below) first, then run
+`python -m exhibit.game.load_generator <max games> [seconds per step] [fps] [states.jsonl|-] [broker] [namespaced]`
+"""
+
+FRAME_ID_STRIDE = 1_000_000
+MAX_GAMES = 2 ** 32 // FRAME_ID_STRIDE  # Frame ids must fit the uint32 frame field of binary activation packets
+REPLY_TIMEOUT = 2.0  # Seconds before an unanswered request counts as lost
+
+
+def synthetic_states(count, config):
+    """
+    A rally with the ball bouncing off the walls and both paddles following it
+    :param count: number of frames
+    :return: list of ((puck_x, puck_y), bottom_x, top_x, score_left, score_right) tuples
+    """
+    t = np.arange(count)
+    speed = config.BALL_SPEED
+    # Triangle waves: position bouncing between 0 and the screen size
+    x = np.abs((t * speed * 0.7) % (2 * config.WIDTH) - config.WIDTH)
+    y = np.abs((t * speed) % (2 * config.HEIGHT) - config.HEIGHT)
+    bottom = np.clip(x + 5 * np.sin(t / 15), 0, config.WIDTH)
+    top = np.clip(x - 5 * np.sin(t / 11), 0, config.WIDTH)
+    return [((float(x[i]), float(y[i])), float(bottom[i]), float(top[i]), 0, 0) for i in range(count)]
+
+
+def load_states(path):
+    """
+    :param path: JSON lines file written by GameSubscriber with GAME_STATE_RECORD_FILE set
+    :return: list of state tuples, like synthetic_states
+    """
+    states = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                (puck_x, puck_y), bottom_x, top_x, score_left, score_right = json.loads(line)[:5]
+                states.append(((puck_x, puck_y), bottom_x, top_x, score_left, score_right))
+    return states
+
+
+class ReplyTracker:
+    """
+    Matches one game's requests to the AI's replies. Used from the publishing thread and the MQTT network thread.
+    """
+
+    def __init__(self, timeout=REPLY_TIMEOUT):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.outstanding = {}  # frame id -> request time
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.replies = 0
+        self.lost = 0
+        self.unexpected = 0
+
+    def requested(self, frame, now=None):
+        with self.lock:
+            self.outstanding[frame] = now if now is not None else time.perf_counter()
+            self.requests += 1
+
+    def replied(self, frame, now=None):
+        """
+        :return: reply latency in seconds, or None if the frame wasn't outstanding (already answered, or expired)
+        """
+        now = now if now is not None else time.perf_counter()
+        with self.lock:
+            sent = self.outstanding.pop(frame, None)
+            if sent is None:
+                self.unexpected += 1
+                return None
+            self.replies += 1
+            self.latency.record(now - sent)
+            return now - sent
+
+    def expire(self, now=None, everything=False):
+        """
+        Count requests that waited longer than the timeout as lost
+        :param everything: count every outstanding request, at the end of a run
+        """
+        now = now if now is not None else time.perf_counter()
+        with self.lock:
+            expired = [frame for frame, sent in self.outstanding.items() if everything or now - sent > self.timeout]
+            for frame in expired:
+                del self.outstanding[frame]
+            self.lost += len(expired)
+
+    def summary(self):
+        with self.lock:
+            summary = {"requests": self.requests, "replies": self.replies, "lost": self.lost,
+                       "unexpected": self.unexpected}
+            summary.update(self.latency.summary())
+            return summary
+
+
+class SimulatedGame:
+    """
+    One emulated game client.
+    """
+
+    def __init__(self, index, states, fps=None, config=None, host="localhost", port=1883, namespaced=False):
+        """
+        :param index: game number, picks the client id and the frame id block
+        :param states: state tuples to replay, looped
+        :param fps: frames per second to publish, GAME_FPS by default
+        :param namespaced: publish under games/load<index>/ for the multi-tenant AI server
+        """
+        self.config = config if config is not None else Config.instance()
+        self.index = index
+        self.states = states
+        self.fps = fps if fps is not None else self.config.GAME_FPS
+        self.game_id = f"load{index}" if namespaced else None
+        self.tracker = ReplyTracker()
+        self.published = 0
+        self.behind = 0  # frames the publisher couldn't send on schedule
+        self.running = False
+        self.thread = None
+        self.connected = threading.Event()
+        self.client = mqtt.Client(client_id=f"load_game_{index}")
+        self.client.on_connect = lambda client, userdata, flags, rc: self.on_connect(client)
+        self.client.on_message = lambda client, userdata, msg: self.on_message(msg)
+        self.client.connect_async(host, port=port, keepalive=60)
+        self.client.loop_start()
+
+    def on_connect(self, client):
+        client.subscribe(game_topic(self.game_id, "paddle1/action"))
+        self.connected.set()
+
+    def on_message(self, msg):
+        frame = json.loads(msg.payload).get("frame")
+        # Replies to the other games' requests arrive here too when they share the topics
+        if frame is not None and frame // FRAME_ID_STRIDE == self.index:
+            self.tracker.replied(frame)
+
+    def publish(self, topic, message):
+        self.client.publish(game_topic(self.game_id, topic), payload=json.dumps(message))
+
+    def emit(self, state, frame, request_action):
+        (puck_x, puck_y), bottom_x, top_x, score_left, score_right = state
+        publish = self.publish
+        publish("puck/position", {"x": puck_x, "y": puck_y})
+        publish("paddle1/position", {"position": bottom_x})
+        publish("paddle2/position", {"position": top_x})
+        publish("player1/score", {"score": score_left})
+        publish("player2/score", {"score": score_right})
+        self.published += 5
+        if request_action:
+            self.tracker.requested(frame)
+            request = {"frame": frame}
+            if self.game_id is not None:
+                request["paddles"] = ["paddle1"]
+            publish("game/frame", request)
+            self.published += 1
+
+    def loop(self):
+        period = 1 / self.fps
+        next_time = time.perf_counter()
+        n = 0
+        while self.running:
+            frame = self.index * FRAME_ID_STRIDE + n % FRAME_ID_STRIDE
+            self.emit(self.states[n % len(self.states)], frame, n % self.config.AI_FRAME_INTERVAL == 0)
+            n += 1
+            if n % self.fps < 1:
+                self.tracker.expire()
+            next_time += period
+            to_sleep = next_time - time.perf_counter()
+            if to_sleep > 0:
+                time.sleep(to_sleep)
+            else:
+                self.behind += 1
+                next_time = time.perf_counter()  # Don't try to catch up with a burst
+
+    def start(self, offset=0):
+        """
+        :param offset: seconds to wait before the first frame, to stagger games
+        """
+        self.connected.wait(5)
+        self.running = True
+        self.thread = threading.Thread(target=lambda: (time.sleep(offset), self.loop()), name=f"load-game-{self.index}",
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def close(self):
+        """
+        Wait for late replies, then count whatever is still unanswered as lost
+        """
+        time.sleep(min(self.tracker.timeout, 1))
+        self.tracker.expire(everything=True)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def run_load(games, seconds, states, fps=None, config=None, host="localhost", port=1883, namespaced=False):
+    """
+    Run `games` simulated games for `seconds`
+    :return: dict with the totals and per-game summaries
+    """
+    if games > MAX_GAMES:
+        raise ValueError(f"{games} games would overflow the frame ids, at most {MAX_GAMES} can be emulated")
+    config = config if config is not None else Config.instance()
+    fps = fps if fps is not None else config.GAME_FPS
+    clients = [SimulatedGame(i, states, fps=fps, config=config, host=host, port=port, namespaced=namespaced)
+               for i in range(games)]
+    start = time.perf_counter()
+    for i, client in enumerate(clients):
+        client.start(offset=i / games / fps)  # Spread the games over one frame
+    time.sleep(seconds)
+    for client in clients:
+        client.stop()
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+
+    per_game = [client.tracker.summary() for client in clients]
+    latency = LatencyHistogram()
+    for client in clients:
+        latency.merge(client.tracker.latency)
+    requests = sum(game["requests"] for game in per_game)
+    replies = sum(game["replies"] for game in per_game)
+    result = {
+        "games": games,
+        "seconds": elapsed,
+        "messages_per_sec": sum(client.published for client in clients) / elapsed,
+        "requests_per_sec": requests / elapsed,
+        "replies_per_sec": replies / elapsed,
+        "loss": 1 - replies / max(requests, 1),
+        "publisher_behind": sum(client.behind for client in clients),
+        "latency": latency.summary(),
+        "per_game": per_game,
+    }
+    return result
+
+
+def format_result(result):
+    latency = result["latency"]
+    if latency["count"]:
+        timing = f"p50 {latency['p50_ms']:7.1f}  p99 {latency['p99_ms']:7.1f}  max {latency['max_ms']:7.1f} ms"
+    else:
+        timing = "no replies"
+    worst = max((game["lost"] / max(game["requests"], 1) for game in result["per_game"]), default=0)
+    return f"K={result['games']:<4} {result['messages_per_sec']:8.0f} msg/s  {result['requests_per_sec']:7.1f} req/s  " \
+           f"{result['replies_per_sec']:7.1f} replies/s  loss {result['loss'] * 100:5.1f}% (worst game " \
+           f"{worst * 100:5.1f}%)  {timing}"
+
+
+def sweep(max_games, seconds=10, fps=None, states=None, config=None, host="localhost", port=1883,
+          namespaced=False):
+    """
+    Run the load for K = 1, 2, 4, ... max_games games and print one line per step
+    :return: list of run_load results
+    """
+    if max_games > MAX_GAMES:
+        raise ValueError(f"{max_games} games would overflow the frame ids, at most {MAX_GAMES} can be emulated")
+    config = config if config is not None else Config.instance()
+    states = states if states is not None else synthetic_states(3000, config)
+    counts = []
+    k = 1
+    while k < max_games:
+        counts.append(k)
+        k *= 2
+    counts.append(max_games)
+    results = []
+    for games in counts:
+        result = run_load(games, seconds, states, fps=fps, config=config, host=host, port=port,
+                          namespaced=namespaced)
+        print(format_result(result))
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m exhibit.game.load_generator <max games> [seconds per step] [fps] [states.jsonl|-] "
+              "[broker] [namespaced]")
+        sys.exit(1)
+    if int(sys.argv[1]) > MAX_GAMES:
+        print(f"At most {MAX_GAMES} games can be emulated, their frame ids have to fit in 32 bits")
+        sys.exit(1)
+    config = Config.instance()
+    states = load_states(sys.argv[4]) if len(sys.argv) > 4 and sys.argv[4] != "-" else None
+    broker = None
+    options = sys.argv[5:]
+    if "broker" in options:
+        # Serve the AI driver and the games from an in-process broker instead of Mosquitto
+        from exhibit.shared.mqtt_broker import LocalBroker
+        broker = LocalBroker(port=1883).start()
+    try:
+        sweep(int(sys.argv[1]), seconds=float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+              fps=float(sys.argv[3]) if len(sys.argv) > 3 else None, states=states, config=config,
+              namespaced="namespaced" in options)
+    finally:
+        if broker is not None:
+            broker.stop()
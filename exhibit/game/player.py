@@ -1,6 +1,9 @@
 from random import randint
 from exhibit.game.pong import Pong
 from exhibit.shared.config import Config
+from exhibit.camera.capture import CaptureThread
+from exhibit.camera.tracking_filter import PlayerTrackingFilter
+import time
 
 """
 NOTE: the classes defined in this file are intended to implement a common interface:
@@ -46,14 +49,91 @@ class HumanPlayer:
         return Pong.read_key(self.up, self.down)
 
 class CameraPlayer:
+    """
+    Player controlled via the depth camera.
+
+    The camera is read on a background thread (see CaptureThread), or by the separate camera service when
+    CAMERA_SERVICE is enabled, and act() returns the latest player position without waiting, so the game tick runs
+    at GAME_FPS instead of the camera's 30 fps.
+    """
+
+    def __init__(self, config=None, subscriber=None):
+        """
+        :param subscriber: GameSubscriber receiving camera/position, required when CAMERA_SERVICE is enabled
+        """
+        self.config = config if config is not None else Config.instance()
+        self.capture = None
+        self.source = None  # LatestValue holding the newest position
+        if self.config.CAMERA_SERVICE:
+            self.source = subscriber.camera_position
+        elif self.config.CAMERA_CAPTURE_THREAD:
+            self.capture = CaptureThread(Pong.get_human_x, name="depth-capture")
+            self.source = self.capture.slot
+        self.last_x = 0.5  # middle value until the camera reports a player
+        self.filter = None
+        if self.config.PLAYER_FILTER:
+            self.filter = PlayerTrackingFilter(alpha=self.config.PLAYER_FILTER_ALPHA, beta=self.config.PLAYER_FILTER_BETA,
+                                               outlier_threshold=self.config.PLAYER_FILTER_OUTLIER,
+                                               max_lead=self.config.PLAYER_FILTER_MAX_LEAD)
+        self.last_sequence = None
+        self.stale = False
+        self.stale_reads = 0
+        self.repeated_reads = 0
+
+    def start(self):
+        """
+        Start reading the camera in the background. Called when a level starts.
+        """
+        self.stale_reads = 0
+        self.repeated_reads = 0
+        if self.filter is not None:
+            self.filter.reset()
+        if self.capture is not None:
+            self.capture.start()
+
+    def stop(self):
+        """
+        Stop the background reads so the camera is free for the between-level player checks
+        """
+        if self.capture is not None:
+            self.capture.stop()
 
     def act(self, state=None):
         """
         Player controlled via the depth camera
         """
         #print("CameraPlayer acting")
-        # TODO get camera move over MQTT
-        return self.move(), Pong.get_human_x(), 1 # Pong.get_depth(), 1 #
+        if self.source is None:
+            x = Pong.get_human_x()
+            if self.filter is not None:
+                now = time.monotonic()
+                self.filter.update(x, now)
+                x = self.filter.predict(now)
+            return self.move(), x, 1 # Pong.get_depth(), 1 #
+
+        sample = self.source.get()
+        if sample is not None:
+            # camera/position messages carry the position under "x", the capture thread stores it directly
+            self.last_x = sample.value["x"] if type(sample.value) == dict else sample.value
+            if sample.sequence == self.last_sequence:
+                self.repeated_reads += 1  # normal: the game runs faster than the camera
+            elif self.filter is not None:
+                self.filter.update(self.last_x, sample.timestamp)
+            self.last_sequence = sample.sequence
+        # Hold the last known position if the camera has stopped delivering, but note it
+        age = self.source.age()
+        self.stale = age is None or age > self.config.CAMERA_STALE_SECONDS
+        if self.stale:
+            self.stale_reads += 1
+        if self.filter is not None and self.filter.x is not None:
+            # Smoothed, and predicted forward from the camera frame to now
+            return self.move(), self.filter.predict(time.monotonic()), 1
+        return self.move(), self.last_x, 1
+
+    def summary(self):
+        return {"stale_reads": self.stale_reads, "repeated_reads": self.repeated_reads,
+                "capture_errors": self.capture.errors if self.capture is not None else 0,
+                "rejected_outliers": self.filter.rejected if self.filter is not None else 0}
 
     def move(self):
         return 3 # the code for moving based on depth value, which is different than fixed speed movement
@@ -67,6 +147,33 @@ class RandomPlayer:
         return Pong.random_action()
 
 
+class ScriptedPlayer:
+    """
+    Plays a fixed sequence of actions, looping at the end. For repeatable soak tests.
+    """
+
+    def __init__(self, actions):
+        """
+        :param actions: sequence of action ids (0 left, 1 right, 2 none)
+        """
+        if len(actions) == 0:
+            raise ValueError("ScriptedPlayer needs at least one action")
+        self.actions = list(actions)
+        self.index = 0
+
+    def act(self, state=None):
+        """
+        :param state: Unused, preserves interface
+        :return: (action id, depth, confidence)
+        """
+        return self.move(), None, 1
+
+    def move(self):
+        action = self.actions[self.index]
+        self.index = (self.index + 1) % len(self.actions)
+        return action
+
+
 class BotPlayer:
     """
     Opponent to train against. Hard-coded to calculate action
@@ -141,6 +248,8 @@ class AIPlayer:
         if not self.top and not self.bottom:
             raise ValueError("AI paddle must be specified as left or right with the cooresponding keyword argument")
         self.subscriber = subscriber
+        # Requests are only tracked for AI paddles, see GameSubscriber.emit_state
+        subscriber.ai_paddles.add("paddle1" if self.top else "paddle2")
 
     def act(self):
         """
@@ -153,6 +262,24 @@ class AIPlayer:
         if self.bottom:
             return self.subscriber.paddle2_action, None, self.subscriber.paddle2_prob
 
+    def act_scheduled(self, frame):
+        """
+        Return the action the subscriber's jitter buffer scheduled for this frame,
+        rather than whichever action arrived most recently.
+        :param frame: current game frame id
+        :return: (action id, confidence)
+        """
+        if self.top:
+            return self.subscriber.paddle1_buffer.poll(frame), None, self.subscriber.paddle1_prob
+        if self.bottom:
+            return self.subscriber.paddle2_buffer.poll(frame), None, self.subscriber.paddle2_prob
+
+    def get_action_buffer(self):
+        if self.top:
+            return self.subscriber.paddle1_buffer
+        if self.bottom:
+            return self.subscriber.paddle2_buffer
+
     def get_frame(self):
         if self.top:
             return self.subscriber.paddle1_frame
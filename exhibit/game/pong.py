@@ -1,6 +1,5 @@
 import numpy as np
 import cv2
-import base64
 import math
 import keyboard
 from random import choice, randint, random
@@ -8,9 +7,7 @@ import time
 from exhibit.shared.config import Config
 
 from exhibit.shared.utils import Timer
-
-if Config.instance().USE_DEPTH_CAMERA:
-    import pyrealsense2 as rs
+from exhibit.camera import blob
 
 if Config.instance().ENABLE_AUDIO:
     import pygame.mixer
@@ -26,11 +23,12 @@ class Pong:
     in order to allow for complete flexibility.
     """
     sounds = None
-    if Config.instance().USE_DEPTH_CAMERA:
-        align_to = rs.stream.color
-        align = rs.align(align_to)
 
-    depth_feed = ""
+    # DepthPreviewWorker for the visualizer's depth feed, or None to skip previews
+    depth_preview = None
+
+    # BackgroundModel used to segment the player, or None for the plain clipping distance
+    background = None
 
     @staticmethod
     def read_key(up, down):
@@ -105,102 +103,25 @@ class Pong:
             
             #Timer.start("crop_frame")
             # cropping the image based on a width and height percentage
-            w,h = depth_image.shape
-            ws, we = int(w/2 - (w * Pong.crop_percentage_w)/2), int(w/2 + (w * Pong.crop_percentage_w)/2)
-            hs, he = int(h/2 - (h * Pong.crop_percentage_h)/2), int(h/2 + (h * Pong.crop_percentage_h)/2)
-            #print("dimension: {}, {}, width: {},{} height: {},{}".format(w,h,ws,we,hs,he))
-            depth_cropped = depth_image[ws:we, hs:he]
-            #depth_cropped = depth_image
-
-            cutoffImage = np.where((depth_cropped < Pong.clipping_distance) & (depth_cropped > 0.1), True, False)
+            depth_cropped = blob.crop(depth_image, Pong.crop_percentage_w, Pong.crop_percentage_h)
+            if Pong.background is not None:
+                cutoffImage = Pong.background.foreground_mask(depth_cropped, Pong.clipping_distance)
+            else:
+                cutoffImage = blob.foreground_mask(depth_cropped, Pong.clipping_distance)
             #Timer.stop("crop_frame")
 
             #Timer.start("get_islands")
-            #print(f'cutoffImage shape is {cutoffImage.shape}, depth_cropped shape is {depth_cropped.shape}');
-            avg_x = 0
-            avg_x_array = np.array([])
-            countB = 0
-            for a in range(np.size(cutoffImage,0)):
-                for b in range(np.size(cutoffImage,1)):
-                    if cutoffImage[a,b] :
-                        avg_x += b
-                        #print(b)
-                        avg_x_array = np.append(avg_x_array,b)
-                        countB = countB+1
+            # median column of the biggest island of foreground pixels
+            m = blob.find_player(cutoffImage)
             # if we got no pixels in depth, return dumb value
-            if countB <= 40: 
+            if m is None:
                 return 0.5
-            avg_x_array.sort()
-            islands = []
-            i_min = 0
-            i_max = 0
-            p = avg_x_array[0]
-            for index in range(np.size(avg_x_array,0)) :
-                n = avg_x_array[index]
-                if n > p+1 and not i_min == i_max : # if the island is done
-                    islands.append(avg_x_array[i_min:i_max])
-                    i_min = index
-                i_max = index
-                p = n
-            if not i_min == i_max: islands.append(avg_x_array[i_min:i_max])
             #Timer.stop("get_islands")
-            
-            #Timer.start("compare_islands")
-            #print(islands)
-            bigIsland = np.array([])
-            for array in islands:
-                if np.size(array,0) > np.size(bigIsland,0): bigIsland = array
-            
-            #print(np.median(bigIsland))
-            m = (np.median(bigIsland))
-            #Timer.stop("compare_islands")
 
             # DISPLAYING ******************************************************************************
-            #Timer.start("align")
-            print(frames.size())
-            aligned_frames = Pong.align.process(frames)
-            #Timer.stop("align")
-            #Timer.start("extract")
-            # Get aligned frames
-            aligned_depth_frame = aligned_frames.get_depth_frame() # aligned_depth_frame is a 640x480 depth image
-            #color_frame = aligned_frames.get_color_frame()
-
-            depth_image = np.asanyarray(aligned_depth_frame.get_data())
-            #print(color_frame)
-            #color_image = np.asanyarray(color_frame.get_data())
-            #Timer.stop("extract")
-            #Timer.start("stack")
-            grey_color = 153
-            grey_color2 = 40
-            #depth_cropped_3d = np.dstack((depth_image,depth_image,depth_image))
-            #Timer.stop("stack")
-            #Timer.start("colorize")
-            #bg_removed = np.where((depth_cropped_3d < Pong.clipping_distance) & (depth_cropped_3d > 0.1), color_image, grey_color )
-
-            #depth_colormap = cv2.applyColorMap(cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_RAINBOW)
-
-            depth_cropped_3d_actual = np.dstack((depth_cropped,depth_cropped,depth_cropped))
-            depth_cropped_3d_colormap = cv2.applyColorMap(cv2.convertScaleAbs(depth_cropped_3d_actual, alpha=0.03), cv2.COLORMAP_RAINBOW)
-            #Timer.stop("colorize")
-            #Timer.start("drawline")
-            depth_cropped_3d_colormap = np.where((depth_cropped_3d_actual < Pong.clipping_distance) & (depth_cropped_3d_actual > 0.1), depth_cropped_3d_colormap, grey_color2 )
-            
-            # Uncomment these lines to have a window showing the camera feeds
-            # images = np.hstack((bg_removed, depth_colormap))
-            
-            # cv2.namedWindow('Align Example', cv2.WINDOW_NORMAL)
-            # cv2.imshow('Align Example',  images)
-            # cv2.namedWindow('Filtered', cv2.WINDOW_NORMAL)
-            depth_cropped_3d_colormap = cv2.line(depth_cropped_3d_colormap, (int(m),h), (int(m),0), (255,255,255), 1)
-            #Timer.stop("drawline")
-            
-            # cv2.imshow('Filtered',  depth_cropped_3d_colormap)
-            
-            #Timer.start("imgencode")
-            buffer = cv2.imencode('.jpg', depth_cropped_3d_colormap)[1].tostring()
-            Pong.depth_feed = base64.b64encode(buffer).decode()
-            #Timer.stop("imgencode")
-            
+            # Rendering and encoding the preview happen on the DepthPreviewWorker thread, at the preview rate only
+            if Pong.depth_preview is not None:
+                Pong.depth_preview.submit(depth_cropped, Pong.clipping_distance, m)
 
             # *****************************************************************************************
             # we multiply by 1.4 and subtract -0.2 so that the player can reach the edges of the Pong game.
@@ -684,7 +605,8 @@ class Pong:
             self.last_frame_time = time.time()
 
         self.last_screen = screen
-        self.show(self.render(), duration=3)
+        if not self.config.GAME_HEADLESS:
+            self.show(self.render(), duration=3)
 
         self.frames += 1
         return screen, (reward_l, reward_r), done
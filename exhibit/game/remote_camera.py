@@ -0,0 +1,53 @@
+import time
+
+
+class RemoteCamera:
+    """
+    Player checks for the level state machine, answered from the camera service's cached camera/presence state
+    instead of grabbing frames from the camera. The service runs a PresenceDetector over every frame it tracks, so
+    these return immediately.
+
+    camera/presence is retained and only sent on changes, so it can't tell whether the service is still running. A
+    player only counts as present while camera/position samples keep arriving as well.
+    """
+
+    def __init__(self, subscriber, still_timeout=3, max_age=1):
+        """
+        :param subscriber: GameSubscriber holding the latest camera/presence and camera/position messages
+        :param still_timeout: seconds a present player gets to stand still before the start is abandoned
+        :param max_age: seconds without a camera/position sample before the camera service is considered gone
+        """
+        self.subscriber = subscriber
+        self.still_timeout = still_timeout
+        self.max_age = max_age
+
+    def presence(self):
+        """
+        :return: latest camera/presence state, or None if there is none or the camera service stopped tracking
+        """
+        age = self.subscriber.camera_position.age()
+        if age is None or age > self.max_age:
+            return None
+        return self.subscriber.camera_presence
+
+    def check_for_player(self):
+        """
+        :return: True if a player is standing in front of the camera
+        """
+        presence = self.presence()
+        return presence is not None and presence["present"]
+
+    def check_for_still_player(self):
+        """
+        Wait for the present player to stand still
+        :return: True once they are still, False if they leave or keep moving for still_timeout seconds
+        """
+        deadline = time.monotonic() + self.still_timeout
+        while time.monotonic() < deadline:
+            presence = self.presence()
+            if presence is None or not presence["present"]:
+                return False
+            if presence["still"]:
+                return True
+            time.sleep(0.01)
+        return False
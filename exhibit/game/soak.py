@@ -0,0 +1,102 @@
+import sys
+import time
+
+import numpy as np
+
+from exhibit.shared.config import Config
+
+"""
+Time-warped soak test of the full exhibit loop.
+
+Plays games back to back without a camera or a person, on a game clock running GAME_WARP times faster than real
+time. The bottom paddle is a BotPlayer (or a scripted action file), the top paddle is the networked AI, so the broker,
+the AI driver and the subscribers all see traffic at N times the exhibit's normal rate. Each level reports throughput
+and which component saturated first (see SaturationMonitor); the run ends with a summary over all levels.
+
+Start the broker and the AI driver first, then run
+`python -m exhibit.game.soak <warp> [games] [bot|actions.txt] [ai|bot]`
+where actions.txt holds one action id per line (0 left, 1 right, 2 none) and the last argument picks the top paddle:
+the networked AI (default), or a second bot to measure the game loop alone.
+"""
+
+LEVELS = [1, 2, 3]
+
+
+def summarize(runs):
+    """
+    :param runs: stats dicts returned by GameDriver.run
+    :return: human readable summary of the whole soak
+    """
+    frames = sum(run["frames"] for run in runs)
+    real_seconds = sum(run["real_seconds"] for run in runs)
+    game_seconds = sum(run["game_seconds"] for run in runs)
+    lines = [f"Soak: {len(runs)} levels, {frames} frames in {real_seconds:.1f}s real / {game_seconds:.1f}s game time "
+             f"({frames / max(real_seconds, 1e-9):.0f} fps)"]
+    first = [run["first_saturated"] for run in runs if run["first_saturated"] is not None]
+    if first:
+        components, counts = np.unique(first, return_counts=True)
+        ranked = sorted(zip(counts, components), reverse=True)
+        lines.append("  First to saturate: " + ", ".join(f"{component} ({count} levels)" for count, component in ranked))
+    else:
+        lines.append("  No component saturated")
+    totals = {}
+    for run in runs:
+        for component, summary in run["saturation"].items():
+            reports, behind = totals.get(component, (0, 0))
+            totals[component] = (reports + summary["reports"], behind + summary["behind"])
+    for component, (reports, behind) in totals.items():
+        lines.append(f"  {component:<10} {behind}/{reports} behind ({behind / max(reports, 1) * 100:.1f}%)")
+    return "\n".join(lines)
+
+
+def main(warp, games=1, opponent="bot", top="ai"):
+    """
+    :param warp: game clock speed relative to real time
+    :param games: number of full games (levels 1-3) to play
+    :param opponent: "bot" or a file of scripted bottom paddle actions
+    :param top: "ai" for the networked AI, "bot" to leave it out of the loop
+    :return: list of per-level stats
+    """
+    # Imported here so the summary helpers don't need the camera and game dependencies
+    from exhibit.game.game_driver import GameDriver
+    from exhibit.game.game_subscriber import GameSubscriber
+    from exhibit.game.player import AIPlayer, BotPlayer, ScriptedPlayer
+
+    config = Config.instance()
+    config.GAME_WARP = warp
+    config.GAME_HEADLESS = True
+    config.USE_DEPTH_CAMERA = False
+    config.CAMERA_SERVICE = False
+
+    subscriber = GameSubscriber(config=config)
+    if opponent == "bot":
+        bottom_agent = BotPlayer(bottom=True)
+    else:
+        bottom_agent = ScriptedPlayer(np.loadtxt(opponent, dtype=int, ndmin=1))
+    top_agent = AIPlayer(subscriber, top=True) if top == "ai" else BotPlayer(top=True)
+    driver = GameDriver(config, subscriber, bottom_agent, top_agent, None, None, None, None, None)
+    time.sleep(1)  # Let the subscriber connect before the first level message
+
+    runs = []
+    try:
+        for game in range(games):
+            for level in LEVELS:
+                subscriber.emit_level(level)
+                runs.append(driver.run(level))
+    except KeyboardInterrupt:
+        print("Soak interrupted")
+    finally:
+        driver.depth_preview.stop()
+        subscriber.transport.disconnect()
+    print(summarize(runs))
+    return runs
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m exhibit.game.soak <warp> [games] [bot|actions.txt] [ai|bot]")
+        sys.exit(1)
+    main(float(sys.argv[1]),
+         games=int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+         opponent=sys.argv[3] if len(sys.argv) > 3 else "bot",
+         top=sys.argv[4] if len(sys.argv) > 4 else "ai")
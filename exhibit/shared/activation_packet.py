@@ -0,0 +1,155 @@
+import struct
+
+import numpy as np
+
+"""
+Compact binary format for the ai/activation visualizer feed.
+
+The JSON packet ([input, hidden, output] as float lists) is ~40 KB per inference, almost all of it zeros from the
+7680 pixel diff input. This format sends only what the visualizer needs:
+
+    header (little endian, 20 bytes)
+        magic       2 bytes   b"PA"
+        version     uint8
+        level       uint8
+        frame       uint32    game frame the inference was made on
+        input size  uint16    length of the dense input vector
+        nonzero     uint16    number of input entries that follow
+        hidden      uint16    number of hidden activations
+        outputs     uint16    number of output activations
+        scale       float32   hidden activation value that maps to 255
+    input       uint16[nonzero]  flat pixel index, high bit set when the pixel value is negative
+    hidden      uint8[hidden]    activation / scale * 255
+    outputs     uint8[outputs]   probability * 255
+
+The input is a difference of binary frames, so each pixel is exactly -1, 0 or 1 and the sparse encoding is lossless.
+visualizer/js/packets.js implements the matching decoder.
+
+Packets can also be recorded to a file (see ActivationStreamWriter), each one preceded by its uint32 byte length, so
+an offline visualizer can replay a session without running the model again.
+"""
+
+MAGIC = b"PA"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIHHHHf")
+SIGN_BIT = 0x8000
+STREAM_LENGTH = struct.Struct("<I")
+
+
+def encode_activation_packet(state, hidden, output, frame=0, level=0):
+    """
+    Pack one inference into the binary visualizer format
+    :param state: flattened input state with values in {-1, 0, 1}
+    :param hidden: hidden layer activations (non-negative, relu)
+    :param output: output probabilities
+    :param frame: game frame id the state came from
+    :param level: current game level
+    :return: bytes payload
+    """
+    state = np.asarray(state).ravel()
+    if state.size >= SIGN_BIT:
+        raise ValueError(f"Input of size {state.size} can't be indexed by the binary packet format")
+    nonzero = np.flatnonzero(state)
+    indices = nonzero.astype(np.uint16)
+    indices[state[nonzero] < 0] |= SIGN_BIT
+
+    hidden = np.asarray(hidden, dtype=np.float32).ravel()
+    scale = float(hidden.max()) if hidden.size else 0.0
+    if scale > 0:
+        hidden_q = np.clip(np.rint(hidden * (255 / scale)), 0, 255).astype(np.uint8)
+    else:
+        hidden_q = np.zeros(hidden.size, dtype=np.uint8)
+
+    output = np.asarray(output, dtype=np.float32).ravel()
+    output_q = np.clip(np.rint(output * 255), 0, 255).astype(np.uint8)
+
+    header = HEADER.pack(MAGIC, VERSION, level, frame, state.size, indices.size, hidden_q.size, output_q.size, scale)
+    return b"".join((header, indices.astype("<u2").tobytes(), hidden_q.tobytes(), output_q.tobytes()))
+
+
+def is_activation_packet(payload):
+    """
+    :param payload: raw MQTT payload
+    :return: True if the payload is in the binary format rather than JSON
+    """
+    return len(payload) >= HEADER.size and payload[:2] == MAGIC
+
+
+def decode_activation_packet(payload):
+    """
+    Unpack a binary visualizer packet
+    :param payload: bytes produced by encode_activation_packet
+    :return: dict with frame, level, and dense state/hidden/output float arrays
+    """
+    magic, version, level, frame, size, nonzero, hidden_size, output_size, scale = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported activation packet (magic {magic}, version {version})")
+    offset = HEADER.size
+    indices = np.frombuffer(payload, dtype="<u2", count=nonzero, offset=offset)
+    offset += nonzero * 2
+    hidden_q = np.frombuffer(payload, dtype=np.uint8, count=hidden_size, offset=offset)
+    offset += hidden_size
+    output_q = np.frombuffer(payload, dtype=np.uint8, count=output_size, offset=offset)
+
+    state = np.zeros(size, dtype=np.float32)
+    negative = (indices & SIGN_BIT) != 0
+    state[indices & ~np.uint16(SIGN_BIT)] = np.where(negative, -1, 1)
+
+    return {
+        "frame": frame,
+        "level": level,
+        "state": state,
+        "hidden": hidden_q.astype(np.float32) * (scale / 255),
+        "output": output_q.astype(np.float32) / 255,
+    }
+
+
+class ActivationStreamWriter:
+    """
+    Appends binary activation packets to a file for later replay
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        self.packets = 0
+
+    @staticmethod
+    def from_config(config):
+        """
+        :return: writer for ACTIVATION_RECORD_FILE, or None when recording is off. Every activation packet the AI
+            publishes is also written here, for replay in the offline visualizer.
+        """
+        return ActivationStreamWriter(config.ACTIVATION_RECORD_FILE) if config.ACTIVATION_RECORD_FILE else None
+
+    def write(self, payload):
+        """
+        :param payload: bytes produced by encode_activation_packet
+        """
+        self.file.write(STREAM_LENGTH.pack(len(payload)))
+        self.file.write(payload)
+        self.packets += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_activation_stream(path):
+    """
+    Decode a file written by ActivationStreamWriter
+    :param path: recording path
+    :return: generator of decode_activation_packet dicts, in recorded order
+    """
+    with open(path, "rb") as f:
+        while True:
+            length = f.read(STREAM_LENGTH.size)
+            if len(length) < STREAM_LENGTH.size:
+                return
+            payload = f.read(STREAM_LENGTH.unpack(length)[0])
+            yield decode_activation_packet(payload)
@@ -0,0 +1,73 @@
+import time
+
+"""
+Clocks for the game loop.
+
+The game normally paces itself on the wall clock at GAME_FPS. For soak tests it can run on a WarpClock instead, where
+game time passes GAME_WARP times faster than real time: the loop keeps its frame schedule in game seconds, but every
+sleep is shortened by the warp factor, so an hour of play takes minutes and the rest of the stack (broker, AI,
+subscribers) sees traffic at N times its normal rate.
+"""
+
+
+class WallClock:
+    """
+    Real time, for normal play.
+    """
+    speed = 1
+
+    def time(self):
+        """
+        :return: monotonic time in seconds
+        """
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def real_seconds(self, seconds):
+        """
+        :param seconds: duration in this clock's time
+        :return: the same duration in real seconds
+        """
+        return seconds
+
+
+class WarpClock:
+    """
+    Virtual game time running `speed` times faster than real time.
+    """
+
+    def __init__(self, speed):
+        """
+        :param speed: game seconds per real second, must be positive
+        """
+        if speed <= 0:
+            raise ValueError(f"Clock speed must be positive, got {speed}")
+        self.speed = speed
+        self.origin = time.perf_counter()
+
+    def time(self):
+        """
+        :return: game seconds since the clock was created
+        """
+        return (time.perf_counter() - self.origin) * self.speed
+
+    def sleep(self, seconds):
+        """
+        :param seconds: game seconds to wait
+        """
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def real_seconds(self, seconds):
+        return seconds / self.speed
+
+
+def make_clock(speed=1):
+    """
+    :param speed: warp factor, 1 for real time
+    :return: WallClock or WarpClock
+    """
+    return WallClock() if speed == 1 else WarpClock(speed)
@@ -16,12 +16,26 @@ class Config:
 
     def __init__(self):
         self.USE_DEPTH_CAMERA = True
+        self.CAMERA_CAPTURE_THREAD = True  # Read the depth camera on a background thread instead of inside the game tick
+        self.CAMERA_STALE_SECONDS = 0.2  # Camera positions older than this are counted as stale
+        self.CAMERA_SERVICE = False  # Track the player in the separate camera driver process and read camera/position. Start exhibit.camera.camera_driver yourself unless using GUIManager
+        self.CAMERA_PLAYBACK_FILE = None  # Depth recording for the camera driver to play back instead of the live camera
+        self.CAMERA_ADAPTIVE = False  # Let the camera driver trade tracking resolution for speed to stay within budget
+        self.CAMERA_BUDGET_MS = 8  # Target depth tracking cost per camera frame (ms)
+        self.BACKGROUND_MODEL = False  # Segment the player against a learned background instead of the clipping distance alone
+        self.BACKGROUND_TOLERANCE = 0.15  # How much closer than the learned background a pixel has to be to count as foreground (m)
+        self.PLAYER_FILTER = True  # Smooth and predict the tracked player position before it moves the paddle
+        self.PLAYER_FILTER_ALPHA = 0.5  # Position gain. Higher follows the camera faster, lower is smoother
+        self.PLAYER_FILTER_BETA = 0.1  # Velocity gain. Higher reacts to direction changes faster, lower is smoother
+        self.PLAYER_FILTER_OUTLIER = 0.25  # Single-frame jumps bigger than this (fraction of width) are ignored
+        self.PLAYER_FILTER_MAX_LEAD = 0.1  # Never predict more than this many seconds past the latest camera frame
 
         # Debug/diagnostic config options
         # Leave disabled unless you want console spam (may affect performance)
         self.NETWORK_TIMESTAMPS = False  # Note: output is occasionally a little jumbled because it isn't threadsafe
         self.MOVE_TIMESTAMPS = False
         self.BEHIND_FRAMES = True
+        self.LATENCY_HISTOGRAMS = True  # Cheap per-stage latency histograms, reported per level and on diagnostics/latency
 
         self.PADDING = 10  # Distance between screen edge and player paddles (px)
         self.MAX_SCORE = 2  # Points one side must win to finish game
@@ -30,8 +44,31 @@ class Config:
         self.SPEEDUP = 1  # Flat multiplier to game movement speeds
         self.ACTIONS = ["LEFT", "RIGHT", "NONE", "DEPTH"]
         self.GAME_FPS = 60
+        self.GAME_WARP = 1  # Run the game clock this many times faster than real time (soak tests, see exhibit/game/soak.py)
+        self.GAME_HEADLESS = False  # Skip the OpenCV game window, which blocks for a few ms every frame
+        self.SATURATION_WINDOW = 60  # Recent reports per component used to decide whether it has saturated
         self.AI_FRAME_INTERVAL = 5  # AI will publish inference every n frames
         self.AI_FRAME_DELAY = 1  # Game will receive each inference n frames late
+        self.AI_JITTER_BUFFER = True  # Apply each AI action exactly AI_FRAME_DELAY intervals after its request frame
+        self.AI_PREDICT_STATE = False  # AI extrapolates the ball to the frame its action will be applied on
+        self.AI_PREDICT_HISTORY = 4  # Ball positions used by the AI to estimate velocity when predicting
+        self.BINARY_ACTIVATION_PACKETS = True  # Send ai/activation in the compact binary format instead of JSON
+        self.ACTIVATION_RECORD_FILE = None  # Also append every ai/activation packet to this file, for replay in the offline visualizer
+        self.GAME_STATE_RECORD_FILE = None  # Also append every emitted game state to this file, for replay by the load generator
+        self.GAME_ID = None  # Publish the game <-> AI topics under games/<id>/, for a shared AI server (exhibit/ai/ai_server.py)
+        self.AI_PADDLES = ["paddle1"]  # Paddles the shared AI server plays in this game. Add "paddle2" for AI vs AI attract mode, with an AIPlayer(bottom=True) opponent
+        self.LOCAL_TRANSPORT = False  # Pass game <-> AI messages by reference in process instead of JSON over the broker. Needs the game and AI in one process (GUIManager)
+        self.LOCAL_BUS_QUEUE = 64  # Messages waiting per in-process subscriber before the oldest are dropped
+        self.AI_SERVER_GATHER = 0.002  # Seconds the AI server waits after a request for other games' requests to join its batch
+
+        # Depth camera preview feed for the browser visualizer
+        self.DEPTH_FEED_BINARY = True  # Publish raw JPEG bytes instead of base64 JPEG wrapped in JSON
+        self.DEPTH_FEED_MAX_FPS = 15  # Never publish previews faster than this, even if the camera is faster
+        self.DEPTH_FEED_MAX_BYTES_PER_SEC = 150_000  # Step down the ladder when the feed exceeds this
+        self.DEPTH_FEED_LADDER = [(1.0, 80), (0.75, 70), (0.5, 60), (0.5, 40)]  # (resolution scale, JPEG quality)
+        self.DEPTH_FEED_START_RUNG = 0
+        self.DEPTH_FEED_REQUIRE_VISUALIZER = False  # Only produce the feed while a visualizer reports itself online
+        self.DEPTH_FEED_VISUALIZER_TIMEOUT = 5  # Seconds without a visualizer heartbeat before it is considered gone
         self.BALL_MARKER_SIZE = 4  # Pixel height and width of experimental position markers
         self.CUSTOM = 0
         self.HIT_PRACTICE = 2
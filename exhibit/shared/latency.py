@@ -0,0 +1,279 @@
+import time
+from collections import deque
+
+"""
+Low overhead latency instrumentation for the game -> AI -> game loop.
+
+Durations are measured with time.perf_counter (monotonic) inside a single process and folded into HDR-style
+log-linear histograms, so recording is a couple of integer operations and memory stays fixed no matter how long
+the exhibit runs. Monotonic clocks can't be compared across machines, so hops that cross the network are derived
+from a round trip measured on one side minus the time the other side reports it spent on the message.
+"""
+
+
+class LatencyHistogram:
+    """
+    Fixed-size log-linear histogram of durations, in the style of HdrHistogram.
+
+    Values are stored in microseconds. Below 2^precision_bits microseconds every value has its own bucket; above
+    that, each power of two is split into 2^(precision_bits - 1) buckets, giving a worst case relative error of
+    about 1 / 2^(precision_bits - 1) (~6% with the default of 5 bits).
+
+    Each histogram should only be written from one thread. Reads from other threads may see a
+    sample or two in flight, which is fine for diagnostics and avoids any locking on the hot path.
+    """
+
+    def __init__(self, precision_bits=5, max_seconds=60):
+        self.linear = 1 << precision_bits
+        self.half = self.linear // 2
+        self.max_us = int(max_seconds * 1_000_000)
+        self.counts = [0] * (self.bucket_index(self.max_us) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total = 0
+        self.sum_us = 0
+        self.max_seen_us = 0
+
+    def bucket_index(self, us):
+        """
+        :param us: non-negative integer microseconds
+        :return: bucket index
+        """
+        if us < self.linear:
+            return us
+        shift = us.bit_length() - (self.linear.bit_length() - 1)
+        return self.linear + (shift - 1) * self.half + ((us >> shift) - self.half)
+
+    def bucket_value(self, index):
+        """
+        :param index: bucket index
+        :return: midpoint of the bucket's range in microseconds
+        """
+        if index < self.linear:
+            return index
+        shift = (index - self.linear) // self.half + 1
+        low = ((index - self.linear) % self.half + self.half) << shift
+        return low + (1 << shift) / 2
+
+    def record(self, seconds):
+        """
+        Add a duration sample
+        :param seconds: duration in seconds (negative values are clamped to zero)
+        """
+        us = min(max(int(seconds * 1_000_000), 0), self.max_us)
+        self.counts[self.bucket_index(us)] += 1
+        self.total += 1
+        self.sum_us += us
+        if us > self.max_seen_us:
+            self.max_seen_us = us
+
+    def merge(self, other):
+        """
+        Add the samples of another histogram with the same precision and range
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_seen_us = max(self.max_seen_us, other.max_seen_us)
+
+    def percentile(self, p):
+        """
+        :param p: percentile between 0 and 100
+        :return: duration in milliseconds at that percentile, or None if there are no samples
+        """
+        if self.total == 0:
+            return None
+        rank = max(p / 100 * self.total, 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max_seen_us) / 1000
+        return self.max_seen_us / 1000
+
+    def summary(self):
+        """
+        :return: dict of count, mean, p50, p90, p99 and max in milliseconds
+        """
+        if self.total == 0:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_us / self.total / 1000, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_seen_us / 1000, 3),
+        }
+
+
+class LatencyRecorder:
+    """
+    Named collection of per-stage latency histograms for one component (game or AI).
+
+    Like its histograms, a recorder should only be written from one thread (or under one lock). Parts of a component
+    written from other threads get recorders of their own, combined with merged() for reports.
+    """
+
+    def __init__(self, name, enabled=True):
+        """
+        :param name: component name, used as the report heading
+        :param enabled: if False, record() is a no-op so instrumentation can stay in place at zero cost
+        """
+        self.name = name
+        self.enabled = enabled
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    @staticmethod
+    def now():
+        """
+        Monotonic timestamp to pass back into record_since
+        """
+        return time.perf_counter()
+
+    def record(self, stage, seconds):
+        """
+        :param stage: stage name, e.g. "inference"
+        :param seconds: measured duration
+        """
+        if not self.enabled or seconds is None:
+            return
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_since(self, stage, start):
+        """
+        Record the time elapsed since a timestamp taken with now()
+        :param stage: stage name
+        :param start: earlier perf_counter timestamp, or None to skip recording
+        """
+        if start is not None:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        for histogram in list(self.stages.values()):
+            histogram.reset()
+        self.started = time.perf_counter()
+
+    def merged(self, *others):
+        """
+        :param others: recorders written by other threads, e.g. the game's jitter buffers
+        :return: new recorder with this one's name and the samples of this and every other recorder
+        """
+        merged = LatencyRecorder(self.name, enabled=self.enabled)
+        merged.started = self.started
+        for recorder in (self,) + others:
+            # Copy the dict first, the owning thread may add a stage meanwhile
+            for stage, histogram in list(recorder.stages.items()):
+                target = merged.stages.get(stage)
+                if target is None:
+                    target = merged.stages[stage] = LatencyHistogram()
+                target.merge(histogram)
+        return merged
+
+    def summary(self):
+        """
+        :return: dict of stage name -> histogram summary
+        """
+        return {stage: histogram.summary() for stage, histogram in self.stages.items()}
+
+    def report(self):
+        """
+        :return: human readable table of per-stage percentiles
+        """
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Latency ({self.name}, {elapsed:.0f}s):"]
+        for stage, summary in self.summary().items():
+            if summary["count"] == 0:
+                continue
+            lines.append(f"  {stage:<16} n={summary['count']:<6} p50 {summary['p50_ms']:>8.2f}  "
+                         f"p90 {summary['p90_ms']:>8.2f}  p99 {summary['p99_ms']:>8.2f}  max {summary['max_ms']:>8.2f} ms")
+        return "\n".join(lines)
+
+
+class SaturationMonitor:
+    """
+    Finds the first component of the game -> AI -> game loop to fall behind under load.
+
+    Each component reports, once per opportunity (a frame, a request, a reply), whether it kept up. A component is
+    saturated once more than `threshold` of its last `window` reports were behind, so one slow frame doesn't count.
+    """
+
+    def __init__(self, window=60, threshold=0.5):
+        """
+        :param window: number of recent reports per component to judge over
+        :param threshold: fraction of those reports that must be behind
+        """
+        self.window = window
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self.recent = {}  # component -> deque of recent behind flags
+        self.recent_behind = {}  # component -> count of True in recent
+        self.reports = {}
+        self.behind = {}
+        self.saturated_at = {}  # component -> (frame, game seconds) it first saturated at
+        self.order = []  # components in the order they saturated
+
+    def observe(self, component, behind, frame=None, seconds=None):
+        """
+        :param component: name, e.g. "game", "ai" or "mqtt"
+        :param behind: True if the component missed its deadline this time
+        :param frame: game frame of the report, recorded if this saturates the component
+        :param seconds: game time of the report, recorded like frame
+        """
+        recent = self.recent.get(component)
+        if recent is None:
+            recent = self.recent[component] = deque(maxlen=self.window)
+            self.recent_behind[component] = 0
+            self.reports[component] = 0
+            self.behind[component] = 0
+        if len(recent) == self.window and recent[0]:
+            self.recent_behind[component] -= 1
+        behind = bool(behind)
+        recent.append(behind)
+        self.recent_behind[component] += behind
+        self.reports[component] += 1
+        self.behind[component] += behind
+        if component not in self.saturated_at and len(recent) == self.window \
+                and self.recent_behind[component] > self.threshold * self.window:
+            self.saturated_at[component] = (frame, seconds)
+            self.order.append(component)
+
+    def first_saturated(self):
+        """
+        :return: name of the first component to saturate, or None if everything kept up
+        """
+        return self.order[0] if self.order else None
+
+    def summary(self):
+        """
+        :return: dict of component -> reports, behind and the (frame, seconds) it saturated at, or None
+        """
+        return {component: {"reports": self.reports[component], "behind": self.behind[component],
+                            "saturated_at": self.saturated_at.get(component)}
+                for component in self.reports}
+
+    def report(self):
+        """
+        :return: human readable saturation summary
+        """
+        first = self.first_saturated()
+        if first is None:
+            lines = ["Saturation: every component kept up"]
+        else:
+            frame, seconds = self.saturated_at[first]
+            lines = [f"Saturation: {first} saturated first (frame {frame}, {seconds or 0:.1f}s game time)"]
+        for component, summary in self.summary().items():
+            share = summary["behind"] / max(summary["reports"], 1) * 100
+            saturated = " (saturated)" if summary["saturated_at"] is not None else ""
+            lines.append(f"  {component:<8} {summary['behind']}/{summary['reports']} behind ({share:.1f}%){saturated}")
+        return "\n".join(lines)
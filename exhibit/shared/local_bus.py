@@ -0,0 +1,193 @@
+import threading
+from collections import deque
+
+from exhibit.shared.config import Config
+from exhibit.shared.mqtt_broker import topic_matches
+
+"""
+In-process message bus for single-PC deployments.
+
+When GUIManager runs the game and the AI as threads of one process, their per-frame traffic doesn't need to go
+through a broker as JSON. InProcessTransport has the same interface as the MQTT transport (exhibit/shared/transport.py),
+but publish() hands the message object itself to every matching subscriber on the same LocalBus, through a bounded
+queue per subscriber drained by that subscriber's own thread. Messages published with qos > 0 are never dropped and
+don't count against the queue size. Published messages are shared by reference, so they must not be changed after
+publishing.
+
+LOCAL_TOPICS, the game <-> AI traffic, never leave the process. Everything else is also forwarded to the broker
+through a bridge transport, since the browser visualizer and the camera service still talk MQTT, and subscriptions to
+anything else are served from the broker as well.
+"""
+
+LOCAL_TOPICS = {"puck/position", "paddle1/position", "paddle2/position", "game/frame",
+                "paddle1/action", "paddle1/frame", "paddle2/action", "paddle2/frame"}
+
+
+class LocalBus:
+    """
+    Routes messages between the InProcessTransports of one process.
+    This class should generally be used as a singleton, like Config.
+    """
+    sharedInstance = None
+
+    @staticmethod
+    def instance():
+        if LocalBus.sharedInstance is None:
+            LocalBus.sharedInstance = LocalBus(maxsize=Config.instance().LOCAL_BUS_QUEUE)
+        return LocalBus.sharedInstance
+
+    def __init__(self, maxsize=64):
+        """
+        :param maxsize: messages queued per subscriber before the oldest are dropped
+        """
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.transports = []
+        self.bridge = None  # Transport to the broker for everything but LOCAL_TOPICS
+        self.bridged_filters = set()  # Subscriptions served from the broker
+        self.forwarded = set()  # Topics this bus publishes to the broker, ignored when they come back from it
+
+    def attach_bridge(self, bridge):
+        """
+        :param bridge: transport connected to the broker, e.g. an MqttTransport
+        """
+        self.bridge = bridge
+        bridge.on_connect = self.bridge_connected
+        bridge.on_message = self.bridged
+        bridge.loop_start()
+
+    def bridge_connected(self):
+        with self.lock:
+            filters = list(self.bridged_filters)
+        for topic_filter in filters:
+            self.bridge.subscribe(topic_filter)
+
+    def bridged(self, topic, message):
+        if topic not in self.forwarded:
+            self.deliver(topic, message)
+
+    def attach(self, transport):
+        with self.lock:
+            self.transports.append(transport)
+
+    def detach(self, transport):
+        with self.lock:
+            if transport in self.transports:
+                self.transports.remove(transport)
+
+    def subscribe(self, transport, topic_filter):
+        with self.lock:
+            transport.filters.add(topic_filter)
+            new_bridged = topic_filter not in LOCAL_TOPICS and topic_filter not in self.bridged_filters
+            if new_bridged:
+                self.bridged_filters.add(topic_filter)
+        if new_bridged and self.bridge is not None:
+            self.bridge.subscribe(topic_filter)
+
+    def publish(self, topic, message, qos=0, binary=False):
+        """
+        :param message: payload object, or bytes when binary is set
+        """
+        self.deliver(topic, message, qos)
+        if self.bridge is not None and topic not in LOCAL_TOPICS:
+            self.forwarded.add(topic)
+            if binary:
+                self.bridge.publish_binary(topic, message, qos=qos)
+            else:
+                self.bridge.publish(topic, message, qos=qos)
+
+    def deliver(self, topic, message, qos=0):
+        with self.lock:
+            targets = [transport for transport in self.transports
+                       if any(topic_matches(topic_filter, topic) for topic_filter in transport.filters)]
+        for transport in targets:
+            transport.put(topic, message, qos)
+
+
+class InProcessTransport:
+    """
+    Message transport between threads of one process. Same interface as MqttTransport.
+    """
+
+    def __init__(self, client_id, bus=None):
+        """
+        :param client_id: name, for the thread and diagnostics
+        :param bus: LocalBus to join, the shared one by default
+        """
+        self.client_id = client_id
+        self.bus = bus if bus is not None else LocalBus.instance()
+        self.condition = threading.Condition()
+        self.queue = deque()  # (topic, message, qos) in publishing order
+        self.droppable = 0  # qos 0 messages in the queue, the oldest is dropped beyond bus.maxsize
+        self.filters = set()
+        self.on_connect = None  # Called with no arguments once the transport is ready for subscriptions
+        self.on_message = None  # Called with (topic, message object) for every message received
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+
+    def subscribe(self, topic):
+        self.bus.subscribe(self, topic)
+
+    def publish(self, topic, message, qos=0):
+        """
+        :param message: payload object, passed on as is
+        """
+        self.bus.publish(topic, message, qos=qos)
+
+    def publish_binary(self, topic, payload, qos=0):
+        self.bus.publish(topic, payload, qos=qos, binary=True)
+
+    def put(self, topic, message, qos=0):
+        """
+        Queue a message for this transport's thread. Called by the bus from the publisher's thread, never blocks.
+        """
+        with self.condition:
+            if qos == 0:
+                if self.droppable >= self.bus.maxsize:
+                    # The subscriber is behind: the oldest state is the least useful one to keep. Level changes and
+                    # the like (qos > 0) must arrive, so they are skipped.
+                    oldest = next(i for i, queued in enumerate(self.queue) if queued[2] == 0)
+                    del self.queue[oldest]
+                    self.dropped += 1
+                else:
+                    self.droppable += 1
+            self.queue.append((topic, message, qos))
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        :return: the next (topic, message), or None if nothing arrived within timeout
+        """
+        with self.condition:
+            if not self.queue:
+                self.condition.wait(timeout)
+            if not self.queue:
+                return None
+            topic, message, qos = self.queue.popleft()
+            if qos == 0:
+                self.droppable -= 1
+            return topic, message
+
+    def loop_forever(self):
+        self.running = True
+        self.bus.attach(self)
+        try:
+            if self.on_connect is not None:
+                self.on_connect()
+            while self.running:
+                received = self.get(timeout=0.1)
+                if received is not None:
+                    self.on_message(*received)
+        finally:
+            # A subscriber that stopped, or whose handler raised, must not keep collecting messages
+            self.running = False
+            self.bus.detach(self)
+
+    def loop_start(self):
+        self.thread = threading.Thread(target=self.loop_forever, name=f"{self.client_id}-transport", daemon=True)
+        self.thread.start()
+
+    def disconnect(self):
+        self.running = False
+        self.bus.detach(self)
@@ -0,0 +1,314 @@
+import functools
+import socket
+import socketserver
+import struct
+import threading
+
+"""
+Minimal in-process MQTT 3.1.1 broker.
+
+A stand-in for Mosquitto when load testing or running the exhibit on a single machine without installing a broker:
+the game, AI and load generator connect to it with their normal MQTT clients. It supports what the exhibit uses:
+QoS 0-2 publishes (always delivered at QoS 0), + and # wildcards, retained messages, last will messages and keep
+alive pings. There are no websockets, so the browser visualizer still needs Mosquitto.
+
+Run standalone with `python -m exhibit.shared.mqtt_broker [port]`.
+"""
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+PACKET_ID = struct.Struct(">H")
+
+
+def encode_length(length):
+    """
+    :return: MQTT variable length encoding of a remaining length
+    """
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(text):
+    data = text.encode() if type(text) == str else text
+    return PACKET_ID.pack(len(data)) + data
+
+
+def encode_packet(packet_type, body=b"", flags=0):
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+def encode_publish(topic, payload, retain=False):
+    """
+    :return: QoS 0 PUBLISH packet
+    """
+    return encode_packet(PUBLISH, encode_string(topic) + payload, flags=1 if retain else 0)
+
+
+def read_packet(stream):
+    """
+    :param stream: binary file-like object of a connection
+    :return: (packet type, flags, body), or None when the connection closed
+    """
+    header = stream.read(1)
+    if not header:
+        return None
+    length = 0
+    multiplier = 1
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        length += (byte[0] & 0x7F) * multiplier
+        if not byte[0] & 0x80:
+            break
+        multiplier *= 128
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return header[0] >> 4, header[0] & 0x0F, body
+
+
+def read_string(body, offset):
+    """
+    :return: (bytes, offset after the string)
+    """
+    length, = PACKET_ID.unpack_from(body, offset)
+    return body[offset + 2:offset + 2 + length], offset + 2 + length
+
+
+@functools.lru_cache(maxsize=4096)  # Every message is matched against every subscription, topics repeat
+def topic_matches(topic_filter, topic):
+    """
+    :param topic_filter: subscription filter, may contain + and # wildcards
+    :param topic: topic of a published message
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class BrokerSession(socketserver.StreamRequestHandler):
+    """
+    One client connection, served on its own thread.
+    """
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.client_id = None
+        self.subscriptions = {}  # topic filter -> granted QoS
+        self.will = None  # (topic, payload, retain)
+        self.clean_disconnect = False
+
+    def send(self, data):
+        """
+        Write a packet to this client. Called from other sessions' threads when they publish.
+        """
+        try:
+            with self.send_lock:
+                self.wfile.write(data)
+        except OSError:
+            pass  # The connection is going away, its own thread cleans up
+
+    def handle(self):
+        broker = self.server
+        self.request.settimeout(None)
+        packet = read_packet(self.rfile)
+        if packet is None or packet[0] != CONNECT:
+            return
+        self.connect(packet[2])
+        broker.register(self)
+        try:
+            while True:
+                packet = read_packet(self.rfile)
+                if packet is None:
+                    break
+                packet_type, flags, body = packet
+                if packet_type == PUBLISH:
+                    self.publish(flags, body)
+                elif packet_type == PUBREL:
+                    self.send(encode_packet(PUBCOMP, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    self.subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.unsubscribe(body)
+                elif packet_type == PINGREQ:
+                    self.send(encode_packet(PINGRESP))
+                elif packet_type == DISCONNECT:
+                    self.clean_disconnect = True
+                    break
+        except (OSError, ValueError, struct.error):
+            pass
+        finally:
+            broker.unregister(self)
+            if not self.clean_disconnect and self.will is not None:
+                broker.route(*self.will)
+
+    def connect(self, body):
+        protocol, offset = read_string(body, 0)
+        flags = body[offset + 1]
+        offset += 4  # protocol level, flags, keep alive
+        client_id, offset = read_string(body, offset)
+        self.client_id = client_id.decode() or f"anonymous-{id(self)}"
+        if flags & 0x04:
+            will_topic, offset = read_string(body, offset)
+            will_payload, offset = read_string(body, offset)
+            self.will = (will_topic.decode(), will_payload, bool(flags & 0x20))
+        # Username and password, if any, are accepted without checking
+        self.send(encode_packet(CONNACK, b"\x00\x00"))
+
+    def publish(self, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic, offset = read_string(body, 0)
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            self.send(encode_packet(PUBACK if qos == 1 else PUBREC, packet_id))
+        self.server.route(topic.decode(), body[offset:], bool(flags & 0x01))
+
+    def subscribe(self, body):
+        packet_id = body[:2]
+        offset = 2
+        filters = []
+        while offset < len(body):
+            topic_filter, offset = read_string(body, offset)
+            offset += 1  # requested QoS, everything is delivered at QoS 0
+            filters.append(topic_filter.decode())
+        self.server.subscribe(self, filters)
+        self.send(encode_packet(SUBACK, packet_id + b"\x00" * len(filters)))
+        for topic, payload in self.server.retained_for(filters):
+            self.send(encode_publish(topic, payload, retain=True))
+
+    def unsubscribe(self, body):
+        packet_id = body[:2]
+        offset = 2
+        filters = []
+        while offset < len(body):
+            topic_filter, offset = read_string(body, offset)
+            filters.append(topic_filter.decode())
+        self.server.unsubscribe(self, filters)
+        self.send(encode_packet(UNSUBACK, packet_id))
+
+
+class LocalBroker(socketserver.ThreadingTCPServer):
+    """
+    In-process MQTT broker. Use start()/stop(), or as a context manager.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=1883):
+        """
+        :param port: TCP port, 0 picks a free one (see self.port)
+        """
+        super().__init__((host, port), BrokerSession)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.sessions = {}  # client id -> BrokerSession
+        self.retained = {}  # topic -> payload
+        self.thread = None
+        self.routed = 0
+
+    def register(self, session):
+        with self.lock:
+            previous = self.sessions.get(session.client_id)
+            self.sessions[session.client_id] = session
+        if previous is not None:
+            # A client reconnecting with the same id takes over its session
+            previous.clean_disconnect = True
+            try:
+                previous.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def unregister(self, session):
+        with self.lock:
+            if self.sessions.get(session.client_id) is session:
+                del self.sessions[session.client_id]
+
+    def subscribe(self, session, filters):
+        with self.lock:
+            for topic_filter in filters:
+                session.subscriptions[topic_filter] = 0
+
+    def unsubscribe(self, session, filters):
+        with self.lock:
+            for topic_filter in filters:
+                session.subscriptions.pop(topic_filter, None)
+
+    def retained_for(self, filters):
+        with self.lock:
+            return [(topic, payload) for topic, payload in self.retained.items()
+                    if any(topic_matches(f, topic) for f in filters)]
+
+    def route(self, topic, payload, retain=False):
+        """
+        Deliver a message to every matching subscriber
+        """
+        with self.lock:
+            if retain:
+                if payload:
+                    self.retained[topic] = payload
+                else:
+                    self.retained.pop(topic, None)
+            targets = [session for session in self.sessions.values()
+                       if any(topic_matches(f, topic) for f in session.subscriptions)]
+            self.routed += 1
+        packet = encode_publish(topic, payload)
+        for session in targets:
+            session.send(packet)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="mqtt-broker", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            try:
+                session.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import sys
+    broker = LocalBroker(host="0.0.0.0", port=int(sys.argv[1]) if len(sys.argv) > 1 else 1883)
+    print(f"MQTT broker listening on port {broker.port}")
+    broker.serve_forever()
@@ -0,0 +1,33 @@
+"""
+Per-game MQTT topic namespaces.
+
+A single exhibit station uses the bare topics (puck/position, game/frame, paddle1/action, ...). Stations driven by a
+shared AI server (see exhibit/ai/ai_server.py) set GAME_ID and publish the same game <-> AI topics under
+games/<game id>/ instead, so one broker and one AI process can tell the games apart. Camera, depth feed and
+visualizer status topics stay local to each station and are never namespaced.
+"""
+
+NAMESPACE_ROOT = "games"
+
+
+def game_topic(game_id, topic):
+    """
+    :param game_id: game id, or None for a standalone game
+    :param topic: topic within the game, e.g. "paddle1/action"
+    :return: full MQTT topic
+    """
+    if game_id is None:
+        return topic
+    return f"{NAMESPACE_ROOT}/{game_id}/{topic}"
+
+
+def split_game_topic(topic):
+    """
+    :param topic: full MQTT topic
+    :return: (game id, topic within the game). The game id is None for bare topics.
+    """
+    if topic.startswith(NAMESPACE_ROOT + "/"):
+        parts = topic.split("/", 2)
+        if len(parts) == 3 and parts[1]:
+            return parts[1], parts[2]
+    return None, topic
@@ -0,0 +1,78 @@
+import json
+import threading
+
+import paho.mqtt.client as mqtt
+
+from exhibit.shared.local_bus import LocalBus, InProcessTransport
+
+"""
+Message transports used by GameSubscriber and AISubscriber.
+
+MqttTransport (the default) sends JSON through the broker. With LOCAL_TRANSPORT set, the game and the AI exchange
+message objects in process instead (see exhibit/shared/local_bus.py), which only works when both run in the same
+process, as they do when started from GUIManager.
+
+Both transports take subscriptions in on_connect(), and call on_message(topic, message) with the decoded message.
+"""
+
+bridge_lock = threading.Lock()
+
+
+class MqttTransport:
+    """
+    JSON over MQTT
+    """
+
+    def __init__(self, client_id, host="localhost", port=1883):
+        self.on_connect = None  # Called with no arguments on every (re)connection, subscribe here
+        self.on_message = None  # Called with (topic, decoded JSON payload) for every message received
+        self.client = mqtt.Client(client_id=client_id)
+        self.client.on_connect = lambda client, userdata, flags, rc: self.connected(rc)
+        self.client.on_message = lambda client, userdata, msg: self.on_message(msg.topic, json.loads(msg.payload))
+        self.client.connect_async(host, port=port, keepalive=60)
+
+    def connected(self, rc):
+        print("Connected with result code " + str(rc))
+        if self.on_connect is not None:
+            self.on_connect()
+
+    def subscribe(self, topic):
+        self.client.subscribe(topic)
+
+    def publish(self, topic, message, qos=0):
+        """
+        :param topic: MQTT topic
+        :param message: payload object, will be JSON stringified
+        """
+        self.client.publish(topic, payload=json.dumps(message), qos=qos)
+
+    def publish_binary(self, topic, payload, qos=0):
+        """
+        :param topic: MQTT topic
+        :param payload: bytes, or an already encoded string
+        """
+        self.client.publish(topic, payload=payload, qos=qos)
+
+    def loop_forever(self):
+        self.client.loop_forever()
+
+    def loop_start(self):
+        self.client.loop_start()
+
+    def disconnect(self):
+        self.client.disconnect()
+
+
+def make_transport(config, client_id):
+    """
+    :param client_id: MQTT client id
+    :return: InProcessTransport on the shared LocalBus when LOCAL_TRANSPORT is set, MqttTransport otherwise
+    """
+    if not config.LOCAL_TRANSPORT:
+        return MqttTransport(client_id)
+    bus = LocalBus.instance()
+    with bridge_lock:
+        if bus.bridge is None:
+            # One broker connection per process carries what the visualizer and camera service need
+            bus.attach_bridge(MqttTransport("local_bus"))
+    return InProcessTransport(client_id, bus=bus)
@@ -7,6 +7,7 @@ import csv
 import matplotlib.pyplot as plt
 
 from exhibit.shared.config import Config
+from exhibit.shared.video import VideoEncoder
 
 """
 Various utility helper methods to consolidate reusable code
@@ -109,7 +110,15 @@ def get_last_file():
 
 
 def save_video(states, path, fps=30):
-    pass#imageio.mimsave(path, states, fps=fps)
+    """
+    Encode a list of frames (game states, model inputs or rendered frames) to a video file
+    :param states: 2D or BGR frames, see video.to_video_frame
+    :param path: .mp4 or .avi output path
+    :param fps: video frame rate
+    """
+    with VideoEncoder(path, fps=fps) as encoder:
+        for state in states:
+            encoder.write(state)
 
 
 def write(value, file):
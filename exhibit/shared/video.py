@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import queue
+import traceback
+
+import cv2
+import numpy as np
+
+"""
+Video encoding in a background process, so producing frames and compressing them run in parallel.
+"""
+
+# OpenCV codec for each supported container
+FOURCC = {".mp4": "mp4v", ".avi": "MJPG"}
+
+
+def to_video_frame(frame):
+    """
+    Convert a game, model or rendered frame to the 8 bit BGR image the encoder expects
+    :param frame: 2D grayscale or 3 channel image, either 0-1 floats/flags or 0-255 values
+    :return: uint8 array of shape (h, w, 3)
+    """
+    frame = np.asarray(frame)
+    if frame.dtype != np.uint8:
+        # Game states and model inputs hold 0/1 (or -1/0/1 differences), scale them up to visible values
+        scale = 255 if np.max(np.abs(frame), initial=0) <= 1 else 1
+        frame = np.clip(np.abs(frame) * scale, 0, 255).astype(np.uint8)
+    elif frame.max(initial=0) == 1:
+        frame = frame * np.uint8(255)
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+def encode_frames(path, fps, frames, errors=None):
+    """
+    Encoder process body: write every frame received until a None arrives
+    :param path: output video path
+    :param fps: frames per second
+    :param frames: multiprocessing queue of uint8 BGR frames
+    :param errors: multiprocessing queue the traceback of a failure is sent on, if any
+    """
+    try:
+        writer = None
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            if writer is None:
+                fourcc = cv2.VideoWriter_fourcc(*FOURCC.get(os.path.splitext(path)[1].lower(), "mp4v"))
+                writer = cv2.VideoWriter(path, fourcc, fps, (frame.shape[1], frame.shape[0]))
+                if not writer.isOpened():
+                    raise IOError(f"could not open {path} for writing")
+            writer.write(frame)
+        if writer is not None:
+            writer.release()
+    except Exception:
+        if errors is not None:
+            errors.put(traceback.format_exc())
+        raise
+
+
+class VideoEncoder:
+    """
+    Streams frames to a cv2.VideoWriter running in its own process.
+
+    write() only hands the frame over. The queue is bounded, so a renderer that outpaces the encoder waits instead of
+    buffering a whole video in memory. If the encoder process dies, write() and close() raise its failure instead of
+    waiting for it forever.
+    """
+
+    def __init__(self, path, fps=30, max_pending=64):
+        """
+        :param path: output video path, .mp4 or .avi
+        :param fps: frames per second of the video
+        :param max_pending: frames that may wait for the encoder before write() blocks
+        """
+        self.path = path
+        self.frames = multiprocessing.Queue(max_pending)
+        self.errors = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=encode_frames, args=(path, fps, self.frames, self.errors),
+                                               daemon=True)
+        self.process.start()
+        self.count = 0
+
+    def write(self, frame):
+        """
+        :param frame: image accepted by to_video_frame. Copied, so the caller may reuse its buffer.
+        """
+        self.send(to_video_frame(frame))
+        self.count += 1
+
+    def send(self, item, poll_seconds=0.5):
+        """
+        Queue an item for the encoder, checking that it is still running while waiting for room
+        :param item: frame, or None to finish
+        """
+        while True:
+            if not self.process.is_alive():
+                raise self.failure()
+            try:
+                self.frames.put(item, timeout=poll_seconds)
+                return
+            except queue.Full:
+                pass
+
+    def failure(self):
+        """
+        :return: RuntimeError describing why the encoder process stopped
+        """
+        # Frames nobody will read anymore must not keep this process from exiting
+        self.frames.cancel_join_thread()
+        try:
+            reason = self.errors.get(timeout=1)
+        except queue.Empty:
+            reason = f"exit code {self.process.exitcode}"
+        return RuntimeError(f"video encoder for {self.path} failed: {reason}")
+
+    def close(self):
+        """
+        Finish encoding and wait for the video file to be complete
+        """
+        self.send(None)
+        self.process.join()
+        if self.process.exitcode != 0:
+            raise self.failure()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
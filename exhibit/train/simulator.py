@@ -63,6 +63,10 @@ def simulate_game(config, env_type=Config.instance().CUSTOM, left=None, right=No
         x_flip = diff_state_rev.ravel()
         if left is not None: action_l, _, prob_l = left.act(x_flip)
         if right is not None: action_r, _, prob_r = right.act(x)
+        if visualizer is not None and right is not None:
+            # The agent keeps the hidden activations from this inference, so the visualizer doesn't run the model again
+            visualizer.render_frame(diff_state, current_state, prob_r,
+                                    hidden_activations=getattr(right, "last_hidden_activation", None))
         states.append(x)
 
         state, reward, done = None, None, None
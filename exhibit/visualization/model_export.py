@@ -0,0 +1,166 @@
+import json
+import struct
+
+import numpy as np
+
+"""
+Packed model files for the browser visualizer.
+
+The visualizer used to load each level's model as a JS file of nested JSON lists (the 7680x200 first layer alone is
+tens of megabytes of text) and then search the whole matrix for its most significant weights on every level change.
+A model pack holds everything the visualizer draws, already computed:
+
+    header      magic b"PVM", version uint8, manifest length uint32 (little endian)
+    manifest    UTF-8 JSON: source model, edge fractions and, for every section, its offset, dtype and shape
+    sections    8 byte aligned arrays:
+        hidden_weights, hidden_biases, output_weights, output_biases    float16 model weights
+        hidden_edge_inputs/outputs/widths   the significant first layer weights as an edge list, in the row-major
+                                            order the old argwhere drew them, with line widths from render_rescale
+        output_edge_inputs/outputs/widths   the same for the output layer
+        hidden_weight_maps                  uint8 [neuron][pixel] weight image of each hidden neuron
+
+The first layer is stored in the visualizer's rotated pixel order, as scripts/get_json_model.py wrote it.
+visualizer/js/model_pack.js implements the matching decoder.
+"""
+
+MAGIC = b"PVM"
+VERSION = 1
+HEADER = struct.Struct("<3sBI")
+ALIGNMENT = 8
+
+# Fraction of each layer's weights the visualizer draws (matches the old is_significant calls in visualizer.js)
+HIDDEN_EDGE_FRACTION = 0.02
+OUTPUT_EDGE_FRACTION = 0.3
+
+
+def browser_weights(weights, state_shape):
+    """
+    Rotate the first layer into the visualizer's pixel order
+    :param weights: [hidden weights, hidden biases, output weights, output biases] as from Keras get_weights()
+    :param state_shape: (height, width) of the model input
+    :return: list of float32 arrays
+    """
+    hidden = np.asarray(weights[0], dtype=np.float32)
+    rotated = np.rot90(hidden.reshape(*state_shape, -1), axes=(0, 1), k=1).reshape(hidden.shape)
+    return [rotated] + [np.asarray(w, dtype=np.float32) for w in weights[1:4]]
+
+
+def render_rescale(data, magnitude=2):
+    scale = max(np.max(data), -1 * np.min(data))
+    return magnitude * data / scale
+
+
+def significant_edges(w, fraction):
+    """
+    The largest weights, like is_significant in render_utils.js
+    :param w: 2D weight matrix
+    :param fraction: share of all weights to keep
+    :return: (inputs, outputs) index arrays in row-major order
+    """
+    count = int(np.floor(w.size * fraction))
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    top = np.sort(np.argpartition(w.ravel(), -count)[-count:])
+    return np.unravel_index(top, w.shape)
+
+
+def weight_maps(hidden_weights):
+    """
+    Weight image of every hidden neuron, scaled like render_weight_image: weight * 127 / max + 127
+    :param hidden_weights: (inputs, neurons) weights
+    :return: (neurons, inputs) uint8 array
+    """
+    maps = hidden_weights.T.astype(np.float32)
+    peak = maps.max(axis=1, keepdims=True)
+    peak[peak <= 0] = 1
+    return np.clip(np.rint(maps * (127 / peak) + 127), 0, 255).astype(np.uint8)
+
+
+def build_model_pack(weights, state_shape, source=""):
+    """
+    :param weights: [hidden weights, hidden biases, output weights, output biases] as from Keras get_weights()
+    :param state_shape: (height, width) of the model input
+    :param source: model file the weights came from, recorded in the manifest
+    :return: bytes of the model pack
+    """
+    hidden_weights, hidden_biases, output_weights, output_biases = browser_weights(weights, state_shape)
+    hidden_inputs, hidden_outputs = significant_edges(hidden_weights, HIDDEN_EDGE_FRACTION)
+    output_inputs, output_outputs = significant_edges(output_weights, OUTPUT_EDGE_FRACTION)
+    if hidden_weights.shape[0] > 0xFFFF:
+        raise ValueError(f"{hidden_weights.shape[0]} inputs can't be indexed by the model pack format")
+    sections = [
+        ("hidden_weights", hidden_weights.astype(np.float16)),
+        ("hidden_biases", hidden_biases.astype(np.float16)),
+        ("output_weights", output_weights.astype(np.float16)),
+        ("output_biases", output_biases.astype(np.float16)),
+        ("hidden_edge_inputs", hidden_inputs.astype(np.uint16)),
+        ("hidden_edge_outputs", hidden_outputs.astype(np.uint16)),
+        ("hidden_edge_widths", render_rescale(hidden_weights)[hidden_inputs, hidden_outputs].astype(np.float16)),
+        ("output_edge_inputs", output_inputs.astype(np.uint16)),
+        ("output_edge_outputs", output_outputs.astype(np.uint16)),
+        ("output_edge_widths", render_rescale(output_weights)[output_inputs, output_outputs].astype(np.float16)),
+        ("hidden_weight_maps", weight_maps(hidden_weights)),
+    ]
+
+    # Section offsets depend on where the data starts, which depends on the manifest's length: grow until it fits
+    data_start = HEADER.size
+    while True:
+        layout = {}
+        position = data_start
+        for name, array in sections:
+            layout[name] = {"offset": position, "dtype": array.dtype.name, "shape": list(array.shape)}
+            position += array.nbytes
+            position += -position % ALIGNMENT
+        manifest = {
+            "source": source,
+            "state_shape": list(state_shape),
+            "hidden_edge_fraction": HIDDEN_EDGE_FRACTION,
+            "output_edge_fraction": OUTPUT_EDGE_FRACTION,
+            "sections": layout,
+        }
+        manifest_bytes = json.dumps(manifest).encode()
+        needed = HEADER.size + len(manifest_bytes)
+        needed += -needed % ALIGNMENT
+        if needed <= data_start:
+            break
+        data_start = needed
+    manifest_bytes += b" " * (data_start - HEADER.size - len(manifest_bytes))
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(manifest_bytes)), manifest_bytes]
+    written = data_start
+    for name, array in sections:
+        data = np.ascontiguousarray(array).astype(array.dtype.newbyteorder("<")).tobytes()
+        parts.append(data)
+        written += len(data)
+        padding = -written % ALIGNMENT
+        parts.append(b"\0" * padding)
+        written += padding
+    return b"".join(parts)
+
+
+def read_model_pack(payload):
+    """
+    :param payload: bytes produced by build_model_pack
+    :return: (manifest dict, dict of section name to array)
+    """
+    magic, version, manifest_length = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported model pack (magic {magic}, version {version})")
+    manifest = json.loads(payload[HEADER.size:HEADER.size + manifest_length])
+    sections = {}
+    for name, entry in manifest["sections"].items():
+        dtype = np.dtype(entry["dtype"]).newbyteorder("<")
+        count = int(np.prod(entry["shape"]))
+        sections[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+    return manifest, sections
+
+
+def export_model_pack(weights, path, state_shape, source=""):
+    """
+    Write a model pack file
+    :return: size of the file in bytes
+    """
+    payload = build_model_pack(weights, state_shape, source=source)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return len(payload)
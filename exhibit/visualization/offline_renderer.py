@@ -0,0 +1,218 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from exhibit.shared.config import Config
+from exhibit.shared.activation_packet import read_activation_stream
+from exhibit.shared.video import VideoEncoder
+from exhibit.visualization.render_utils import SignificantEdges, layer_positions, render_rescale, get_intensity, is_firing, \
+    WEIGHT_COLOR_ACTIVE, NEURON_COLOR, NEURON_COLOR_ACTIVE
+
+"""
+Headless renderer for network activity videos.
+
+Draws the same scene as RealtimeVisualizer (game frame, firing significant weights, neuron states and output
+confidences) straight into NumPy frame buffers, without a display and as fast as the frames can be produced. Every
+line and neuron is rasterized to a list of pixel indices once, so a frame is a buffer copy plus a few fancy-indexed
+assignments. Frames are encoded by a VideoEncoder in a background process.
+
+Run with `python -m exhibit.visualization.offline_renderer <model.h5> <activations.bin> <video.mp4> [fps] [scale]`
+on a stream recorded with ACTIVATION_RECORD_FILE.
+"""
+
+# Same layout as RealtimeVisualizer at 1080p, multiplied by the renderer's scale
+CANVAS_SIZE = (1920, 1080)
+MIN_PADDING = 3
+IMAGE_X = 400
+HIDDEN_LAYER_X = 1000
+OUTPUT_LAYER_X = 1600
+IMAGE_UPSCALE = 5
+OUTPUT_LABELS = ["UP", "DOWN"]
+BACKGROUND = (255, 255, 255)
+TEXT_COLOR = (0, 0, 0)
+
+
+def hex_to_bgr(color):
+    """
+    :param color: "#RRGGBB"
+    :return: (b, g, r) tuple
+    """
+    return int(color[5:7], 16), int(color[3:5], 16), int(color[1:3], 16)
+
+
+def line_pixels(start, end, width, height):
+    """
+    Rasterize a one pixel line
+    :return: flat pixel indices of the line, clipped to the frame
+    """
+    steps = int(max(abs(end[0] - start[0]), abs(end[1] - start[1]))) + 1
+    xs = np.rint(np.linspace(start[0], end[0], steps)).astype(np.int64)
+    ys = np.rint(np.linspace(start[1], end[1], steps)).astype(np.int64)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    return ys[inside] * width + xs[inside]
+
+
+def disk_pixels(center, radius, width, height):
+    """
+    :return: flat pixel indices of a filled circle, clipped to the frame
+    """
+    radius = max(abs(radius), 1)
+    x0, x1 = max(int(center[0] - radius), 0), min(int(center[0] + radius) + 1, width)
+    y0, y1 = max(int(center[1] - radius), 0), min(int(center[1] + radius) + 1, height)
+    ys, xs = np.mgrid[y0:y1, x0:x1]
+    inside = (xs - center[0]) ** 2 + (ys - center[1]) ** 2 <= radius ** 2
+    return (ys[inside] * width + xs[inside]).astype(np.int64)
+
+
+def pixel_table(pixel_lists):
+    """
+    Concatenate per-item pixel lists into (pixels, owner) arrays, owner holding the item each pixel belongs to
+    """
+    if not pixel_lists:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    owners = np.repeat(np.arange(len(pixel_lists)), [len(p) for p in pixel_lists])
+    return np.concatenate(pixel_lists), owners
+
+
+class NetworkRasterizer:
+    """
+    Renders network activity frames for one set of model weights.
+    """
+
+    def __init__(self, weights, state_shape, scale=1.0):
+        """
+        :param weights: model weights, [hidden weights, hidden biases, output weights, output biases]
+        :param state_shape: (height, width) of the model input frame
+        :param scale: output size relative to 1920x1080
+        """
+        hidden_weights, hidden_biases, output_weights, output_biases = weights[:4]
+        self.scale = scale
+        self.width, self.height = int(CANVAS_SIZE[0] * scale), int(CANVAS_SIZE[1] * scale)
+        self.state_shape = state_shape
+
+        # Game frame placement, centred on IMAGE_X like the Tk canvas image
+        pixel_step = IMAGE_UPSCALE * scale
+        self.image_size = (int(state_shape[1] * pixel_step), int(state_shape[0] * pixel_step))
+        self.image_x = int(IMAGE_X * scale - self.image_size[0] / 2)
+        self.image_y = int(self.height / 2 - self.image_size[1] / 2)
+        ys, xs = np.indices(state_shape)
+        pixel_pos = np.column_stack((xs.ravel(), ys.ravel())) * pixel_step + (self.image_x, self.image_y) + (pixel_step / 2)
+
+        neuron_size = (self.height - (len(hidden_biases) * MIN_PADDING)) / len(hidden_biases)
+        hidden_pos = layer_positions(len(hidden_biases), 0, self.height, HIDDEN_LAYER_X * scale, neuron_size)
+        self.out_pos = layer_positions(len(output_biases), 0, self.height, OUTPUT_LAYER_X * scale, neuron_size)
+
+        # Only significant weights are ever drawn; each frame shows the ones whose input fires
+        self.hw_significance = SignificantEdges(hidden_weights, 0.2)
+        self.ow_significance = SignificantEdges(output_weights, 1)
+        self.hw_pixels, self.hw_owner = self.rasterize_edges(self.hw_significance.edges, pixel_pos, hidden_pos, hidden_weights)
+        self.ow_pixels, self.ow_owner = self.rasterize_edges(self.ow_significance.edges, hidden_pos, self.out_pos, output_weights)
+
+        # Neuron sizes follow the biases, like render_layer
+        hidden_sizes = render_rescale(hidden_biases, magnitude=1) * 10 + 1
+        output_sizes = render_rescale(output_biases, magnitude=1) * 10 + 1
+        self.hidden_pixels, self.hidden_owner = pixel_table([
+            disk_pixels(p, (neuron_size / 2) * s, self.width, self.height) for p, s in zip(hidden_pos, hidden_sizes)])
+        self.out_pixels, self.out_owner = pixel_table([
+            disk_pixels(p, (neuron_size / 2) * s, self.width, self.height) for p, s in zip(self.out_pos, output_sizes)])
+
+        # Everything that never changes is drawn once into the background
+        self.background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.background[:] = BACKGROUND
+        self.font_scale = 1.2 * scale
+        for (x, y), label in zip(self.out_pos, OUTPUT_LABELS):
+            cv2.putText(self.background, label, (int(x + 25 * scale), int(y)), cv2.FONT_HERSHEY_SIMPLEX,
+                        self.font_scale, TEXT_COLOR, 2, cv2.LINE_AA)
+        self.frame = np.empty_like(self.background)
+        self.weight_color = np.array(hex_to_bgr(WEIGHT_COLOR_ACTIVE), dtype=np.uint8)
+        self.neuron_colors = np.array([hex_to_bgr(NEURON_COLOR), hex_to_bgr(NEURON_COLOR_ACTIVE)], dtype=np.uint8)
+
+    def rasterize_edges(self, edges, l1_positions, l2_positions, w):
+        """
+        :return: (pixels, owner) for the lines of the given edges. Lines thicker than 1.5 in the Tk renderer get a
+            second row of pixels.
+        """
+        widths = np.abs(render_rescale(w)[edges[:, 0], edges[:, 1]]) if len(edges) else []
+        lines = []
+        for (l1, l2), width in zip(edges, widths):
+            pixels = line_pixels(l1_positions[l1], l2_positions[l2], self.width, self.height)
+            if width >= 1.5:
+                below = pixels + self.width
+                pixels = np.concatenate((pixels, below[below < self.width * self.height]))
+            lines.append(pixels)
+        return pixel_table(lines)
+
+    def render(self, state_frame, render_frame, prob, hidden_activations):
+        """
+        Draw one inference
+        :param state_frame: 2D model input (frame difference)
+        :param render_frame: 2D game frame to display, 0-1 or 0-255
+        :param prob: output probabilities
+        :param hidden_activations: hidden layer output of the same inference
+        :return: BGR uint8 frame. The buffer is reused by the next render call.
+        """
+        frame = self.frame
+        np.copyto(frame, self.background)
+        flat = frame.reshape(-1, 3)
+
+        # Game frame
+        render_frame = np.asarray(render_frame, dtype=np.float32)
+        if render_frame.max(initial=0) <= 1:
+            render_frame = render_frame * 255
+        image = cv2.resize(np.clip(render_frame, 0, 255).astype(np.uint8), self.image_size, interpolation=cv2.INTER_NEAREST)
+        frame[self.image_y:self.image_y + self.image_size[1], self.image_x:self.image_x + self.image_size[0]] = image[..., np.newaxis]
+
+        # Firing weights, then neurons on top of them
+        image_activations = is_firing(np.asarray(state_frame).ravel())
+        flat[self.hw_pixels[self.hw_significance.active(image_activations)[self.hw_owner]]] = self.weight_color
+        hl_activations = is_firing(np.asarray(hidden_activations).ravel())
+        flat[self.ow_pixels[self.ow_significance.active(hl_activations)[self.ow_owner]]] = self.weight_color
+        flat[self.hidden_pixels] = self.neuron_colors[hl_activations.astype(np.int64)][self.hidden_owner]
+        output_colors = np.array([hex_to_bgr(get_intensity(p)) for p in prob], dtype=np.uint8)
+        flat[self.out_pixels] = output_colors[self.out_owner]
+
+        # Confidence labels
+        for (x, y), p in zip(self.out_pos, prob):
+            cv2.putText(frame, f"{p * 100:.2f}%", (int(x + 25 * self.scale), int(y + 60 * self.scale)),
+                        cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, TEXT_COLOR, 2, cv2.LINE_AA)
+        return frame
+
+
+def render_activation_video(weights, packets, path, fps=30, scale=1.0, state_shape=None):
+    """
+    Render a network activity video
+    :param weights: model weights, see NetworkRasterizer
+    :param packets: iterable of dicts with "state", "hidden" and "output" (decode_activation_packet format), and
+        optionally "render", the game frame to show (the changed input pixels are shown otherwise)
+    :param path: output video path
+    :param fps: video frame rate
+    :param scale: output size relative to 1920x1080
+    :param state_shape: model input shape, CUSTOM_STATE_SHAPE by default
+    :return: number of frames written
+    """
+    state_shape = state_shape if state_shape is not None else Config.instance().CUSTOM_STATE_SHAPE
+    rasterizer = NetworkRasterizer(weights, state_shape, scale=scale)
+    start = time.perf_counter()
+    with VideoEncoder(path, fps=fps) as encoder:
+        for packet in packets:
+            state_frame = np.asarray(packet["state"]).reshape(state_shape)
+            render_frame = packet["render"] if "render" in packet else np.abs(state_frame)
+            encoder.write(rasterizer.render(state_frame, render_frame, packet["output"], packet["hidden"]))
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {encoder.count} frames to {path} in {elapsed:.1f}s ({encoder.count / max(elapsed, 1e-9):.0f} fps)")
+    return encoder.count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("usage: python -m exhibit.visualization.offline_renderer <model.h5> <activations.bin> <video.mp4> [fps] [scale]")
+        sys.exit(1)
+    from exhibit.ai.model import PGAgent
+    config = Config.instance()
+    agent = PGAgent(config.CUSTOM_STATE_SIZE, config.CUSTOM_ACTION_SIZE, verbose=False)
+    agent.load(sys.argv[1])
+    render_activation_video(agent.infer_model.get_weights(), read_activation_stream(sys.argv[2]), sys.argv[3],
+                            fps=float(sys.argv[4]) if len(sys.argv) > 4 else 30,
+                            scale=float(sys.argv[5]) if len(sys.argv) > 5 else 1.0)
@@ -1,9 +1,12 @@
 import tkinter as tk
-from exhibit.visualization.render_utils import render_weights, render_layer, render_rescale, TITLE_FONT, is_significant, is_firing, is_weight_active
+from exhibit.visualization.render_utils import create_weights, create_layer, layer_positions, render_rescale, get_intensity, TITLE_FONT, \
+    NEURON_COLOR, NEURON_COLOR_ACTIVE, SignificantEdges, is_firing
 import numpy as np
 import cv2
 from PIL import Image, ImageTk
 from keras.models import Model
+from exhibit.shared.config import Config
+from exhibit.shared.activation_packet import read_activation_stream
 
 
 class RealtimeVisualizer:
@@ -33,35 +36,46 @@ class RealtimeVisualizer:
                    height=self.canvas_height)
         self.base_ctx.pack()
         self.model = model
-        self.last_hw_activation = None
-        self.last_ow_activation = None
+        self.up_label = None
+        self.down_label = None
+
+    def game_image(self, frame):
+        """
+        Upscale a game frame for display
+        :param frame: game frame with values between 0 and 1
+        :return: PIL image
+        """
+        render_frame = np.copy(frame)
+        render_frame *= 256
+        render_frame = cv2.resize(render_frame, (render_frame.shape[1] * self.IMAGE_UPSCALE, render_frame.shape[0] * self.IMAGE_UPSCALE))
+        return Image.fromarray(render_frame)
 
     def base_render(self, frame):
         """
-        Called after the first frame is rendered
+        Called after the first frame is rendered. Creates every canvas item the visualization uses; render_frame only
+        updates their properties afterwards. Called again for every game it is reused for, so whatever an earlier call
+        created is removed first.
         """
         base_ctx = self.base_ctx
-        # Render game frame
-        frame *= 256
+        base_ctx.delete(tk.ALL)
+        for label in (self.up_label, self.down_label):
+            if label is not None:
+                label.destroy()
+        # Render game frame. The PhotoImage is kept so it isn't garbage collected, and later frames are pasted into it
         pixel_dims = frame.shape
-        render_frame = cv2.resize(frame, (frame.shape[1] * self.IMAGE_UPSCALE, frame.shape[0] * self.IMAGE_UPSCALE))
-        img = ImageTk.PhotoImage(image=Image.fromarray(render_frame))
+        self.img = ImageTk.PhotoImage(image=self.game_image(frame))
         # Save rendering id of image to later inspect attributes
-        self.img_id = self.base_ctx.create_image(self.IMAGE_X, self.canvas_height / 2, anchor="c", image=img)
+        self.img_id = self.base_ctx.create_image(self.IMAGE_X, self.canvas_height / 2, anchor="c", image=self.img)
 
         # Store image-related rendering measurements
         img_coords = base_ctx.coords(self.img_id)
-        img_size = (img.width(), img.height())
+        img_size = (self.img.width(), self.img.height())
         top_corner = (np.subtract(img_coords, np.divide(img_size, 2)))
         pixel_step = img_size[0] / pixel_dims[1]
 
-        # Calculate positions of individual pixels, for use as a "layer" to connect edges
-        self.pixel_pos = []
-        for y in range(pixel_dims[0]):
-            for x in range(pixel_dims[1]):
-                x_pos = (x * pixel_step) + top_corner[0] + (pixel_step / 2)
-                y_pos = (y * pixel_step) + top_corner[1] + (pixel_step / 2)
-                self.pixel_pos.append((x_pos, y_pos))
+        # Calculate positions of individual pixels, for use as a "layer" to connect edges (row-major, like ravel())
+        ys, xs = np.indices(pixel_dims[:2])
+        self.pixel_pos = np.column_stack((xs.ravel(), ys.ravel())) * pixel_step + top_corner + (pixel_step / 2)
 
         # Get neurons.
         # Structure: list of numpy arrays, [hidden weight, hidden bias, output weight, output bias]
@@ -74,19 +88,29 @@ class RealtimeVisualizer:
         self.output_weights = weights[2]
         self.hidden_weights = weights[0]
 
-        self.significant_hw = is_significant(self.hidden_weights, 0.2)
-        self.significant_ow = is_significant(self.output_weights, 1)
+        # Edge lists of the weights worth drawing
+        self.hw_significance = SignificantEdges(self.hidden_weights, 0.2)
+        self.ow_significance = SignificantEdges(self.output_weights, 1)
 
         # Determine appropriate base size for a neuron based on minimum allowable padding for a specific layer
         self.neuron_size = (self.canvas_height - (len(self.hidden_biases) * self.MIN_PADDING)) / len(self.hidden_biases)
 
-        # Create model for collecting hidden layer activations
-        self.hl_model = Model(inputs=self.model.inputs, outputs=self.model.layers[0].output)
-        # Render neuron nodes, saving calculated positions for weight rendering
-        self.hidden_pos = render_layer(self.base_ctx, render_rescale(self.hidden_biases, magnitude=1), 0,
-                                       self.canvas_height, self.HIDDEN_LAYER_X, self.neuron_size)
-        self.out_pos = render_layer(self.base_ctx, render_rescale(self.output_biases, magnitude=1), 0,
-                               self.canvas_height, self.OUTPUT_LAYER_X, self.neuron_size, labels=self.OUTPUT_LABELS)
+        # Model for collecting hidden layer activations, only built if a frame arrives without them
+        self.hl_model = None
+
+        # Neuron positions, needed by the weight lines, which have to be created first to be drawn under the neurons
+        self.hidden_pos = layer_positions(len(self.hidden_biases), 0, self.canvas_height, self.HIDDEN_LAYER_X, self.neuron_size)
+        self.out_pos = layer_positions(len(self.output_biases), 0, self.canvas_height, self.OUTPUT_LAYER_X, self.neuron_size)
+
+        # Only significant weights are ever drawn, so those are the only lines that exist. Each frame shows or hides
+        # them by whether their input is firing.
+        self.hw_lines = create_weights(self.base_ctx, self.pixel_pos, self.hidden_pos, render_rescale(self.hidden_weights), self.hw_significance.edges)
+        self.ow_lines = create_weights(self.base_ctx, self.hidden_pos, self.out_pos, render_rescale(self.output_weights), self.ow_significance.edges)
+
+        # Render neuron nodes
+        self.hidden_nodes = create_layer(self.base_ctx, render_rescale(self.hidden_biases, magnitude=1), self.hidden_pos, self.neuron_size)
+        self.out_nodes = create_layer(self.base_ctx, render_rescale(self.output_biases, magnitude=1), self.out_pos,
+                                      self.neuron_size, labels=self.OUTPUT_LABELS)
 
 
         # Create dynamic labels for inference confidence
@@ -106,46 +130,62 @@ class RealtimeVisualizer:
         self.up_label.place(x=up_pos[0] + 25, y=up_pos[1] + 25)
 
 
-    def render_frame(self, state_frame, render_frame, prob):
-        render_frame = np.copy(render_frame)
-
+    def render_frame(self, state_frame, render_frame, prob, hidden_activations=None):
+        """
+        Update the scene for one inference
+        :param state_frame: 2D model input (frame difference)
+        :param render_frame: game frame to display
+        :param prob: output probabilities
+        :param hidden_activations: hidden layer output of the same inference. Pass it whenever the caller has it
+            (PGAgent.last_hidden_activation, or a recorded activation packet); only without it does the visualizer run
+            its own forward pass.
+        """
         # Update rendered probabilities
         percent_prob = prob * 100
         self.up_prob.set(f'{"{0:.2f}".format(percent_prob[0])}%')
         self.down_prob.set(f'{"{0:.2f}".format(percent_prob[1])}%')
 
-        # Render game frame
-        render_frame *= 256
-        render_frame = cv2.resize(render_frame, (render_frame.shape[1] * self.IMAGE_UPSCALE, render_frame.shape[0] * self.IMAGE_UPSCALE))
-        img = ImageTk.PhotoImage(image=Image.fromarray(render_frame))
-        #self.base_ctx.itemconfig(self.img_id, image=img)
-        self.base_ctx.create_image(self.IMAGE_X, self.canvas_height / 2, anchor="c", image=img)
-        X = state_frame.reshape([1, state_frame.shape[0] * state_frame.shape[1]])
+        # Render game frame into the existing image
+        self.img.paste(self.game_image(render_frame))
 
-        # Render image weights
+        # Show the significant image weights whose pixel is firing
         image_activations = is_firing(state_frame.ravel())
-        hw_activations = is_weight_active(self.hidden_weights, image_activations)
-        hw_needs_update = None
-        if self.last_hw_activation is not None:
-            hw_needs_update = hw_activations != self.last_hw_activation
-        self.last_hw_activation = hw_activations
-        render_weights(self.base_ctx, self.pixel_pos, self.hidden_pos, render_rescale(self.hidden_weights),
-                       significant=self.significant_hw, activations=hw_activations)
-
-        # Re-compute hidden activations for rendering
-        hl_activations = is_firing(self.hl_model.predict(X, batch_size=1).squeeze())
-        ow_activations = is_weight_active(self.output_weights, hl_activations)
-        # Render hidden weights
-        ow_needs_update = None
-        if self.last_ow_activation is not None: ow_needs_update = ow_activations != self.last_ow_activation
-        render_weights(self.base_ctx, self.hidden_pos, self.out_pos, render_rescale(self.output_weights),
-                       significant=self.significant_ow, activations=ow_activations)
-
-        render_layer(self.base_ctx, render_rescale(self.hidden_biases, magnitude=1), 0,
-                                       self.canvas_height, self.HIDDEN_LAYER_X, self.neuron_size, activations=hl_activations)
-        render_layer(self.base_ctx, render_rescale(self.output_biases, magnitude=1), 0,
-                     self.canvas_height, self.OUTPUT_LAYER_X, self.neuron_size,
-                     labels=self.OUTPUT_LABELS, activation_intensities=prob)
+        self.hw_lines.update("state", np.where(self.hw_significance.active(image_activations), tk.NORMAL, tk.HIDDEN))
+
+        if hidden_activations is None:
+            # Re-compute hidden activations for rendering
+            if self.hl_model is None:
+                self.hl_model = Model(inputs=self.model.inputs, outputs=self.model.layers[0].output)
+            X = state_frame.reshape([1, state_frame.shape[0] * state_frame.shape[1]])
+            hidden_activations = self.hl_model(X, training=False).numpy()
+        hl_activations = is_firing(np.asarray(hidden_activations).squeeze())
+        # Show the hidden weights whose neuron is firing
+        self.ow_lines.update("state", np.where(self.ow_significance.active(hl_activations), tk.NORMAL, tk.HIDDEN))
+
+        self.hidden_nodes.update("fill", np.where(hl_activations, NEURON_COLOR_ACTIVE, NEURON_COLOR))
+        self.out_nodes.update("fill", [get_intensity(p) for p in prob])
         # Open window
         self.base_ctx.update()
-        self.base_ctx.delete(tk.ALL)
+
+    def render_agent(self, agent, render_frame):
+        """
+        Render the inference the agent just made, reusing the activations it computed
+        :param agent: PGAgent that has just acted
+        :param render_frame: game frame to display
+        """
+        state_frame = agent.last_state.reshape(Config.instance().CUSTOM_STATE_SHAPE)
+        self.render_frame(state_frame, render_frame, agent.last_output, hidden_activations=agent.last_hidden_activation)
+
+    def replay(self, path):
+        """
+        Render a recorded activation stream (see ActivationStreamWriter) without running the model
+        :param path: recording written by the AI driver
+        """
+        shape = Config.instance().CUSTOM_STATE_SHAPE
+        for packet in read_activation_stream(path):
+            state_frame = packet["state"].reshape(shape)
+            # The stream holds the model input only, so show which pixels changed in place of the game frame
+            render_frame = np.abs(state_frame)
+            if not hasattr(self, "img"):
+                self.base_render(render_frame)
+            self.render_frame(state_frame, render_frame, packet["output"], hidden_activations=packet["hidden"])
@@ -75,44 +75,135 @@ def is_firing(values, threshold=0.2):
 
 # Given weights and preceding layer firing booleans, returns array of booleans indicating weight activity
 def is_weight_active(w, l1):
-    w_active = np.zeros_like(w)
-    for l1_index in range(len(l1)):
-        if l1[l1_index]: w_active[l1_index] = 1
-    return w_active.astype(np.bool)
+    # A weight is active when its input neuron fires: broadcast the firing column across every output
+    return np.broadcast_to(np.asarray(l1, dtype=bool)[:, np.newaxis], w.shape).copy()
 
 
 # Return bool array of "significant" weights given weight strength
 def is_significant(w, threshold=0.2):
     # Find indices of top threshold% weight values
     render_cap = int(len(w) * threshold)
+    significant_w = np.zeros(w.size, dtype=bool)
+    if render_cap > 0:
+        # Flat indices of the render_cap largest weights, set in one assignment
+        significant_w[np.argpartition(w.ravel(), -render_cap)[-render_cap:]] = True
+    return significant_w.reshape(w.shape)
 
-    # Unravels the weights, create a new array of the top n indices, and transforms the indices into 2d weight indices
-    # Then stacks up the array, squeezes out the extra dim, and cuts off everything after the max render cap
-    significant = np.dstack(np.unravel_index(np.argpartition(w.ravel(), -render_cap)[-render_cap:], w.shape)).squeeze()[:render_cap]
 
-    significant_w = np.zeros_like(w)
-    for l1, l2 in significant:
-        significant_w[l1, l2] = 1
-    return significant_w.astype(np.bool)
+class SignificantEdges:
+    """
+    The significant weights of one layer as an edge list.
+
+    Selecting the significant weights partitions the whole weight matrix, but the weights only change when a new
+    model is loaded, so this is built once per model. Per frame, picking the edges whose input neuron fires is then
+    one index into the edge list.
+    """
+
+    def __init__(self, w, threshold=0.2):
+        """
+        :param w: weight matrix, inputs along axis 0
+        :param threshold: passed to is_significant
+        """
+        self.threshold = threshold
+        self.mask = is_significant(w, threshold)
+        self.edges = np.argwhere(self.mask)
+
+    def active(self, l1):
+        """
+        :param l1: firing booleans of the input layer
+        :return: bool per edge, True where the edge's input neuron fires
+        """
+        return np.asarray(l1, dtype=bool)[self.edges[:, 0]]
+
+    def active_edges(self, l1):
+        """
+        :param l1: firing booleans of the input layer
+        :return: (n, 2) array of [l1 index, l2 index] for the significant edges whose input fires
+        """
+        return self.edges[self.active(l1)]
 
 
 def render_weights(canvas, l1_positions, l2_positions, w, significant=None, needs_update=None, activations=None):
     # Set up filtering
     should_render = np.ones(w.shape, dtype=bool)
-    if needs_update is not None: should_render = np.logical_and(should_render, needs_update)
-    if significant is not None: should_render = np.logical_and(should_render, significant)
-    if activations is not None: should_render = np.logical_and(should_render, activations)
-    should_render = np.argwhere(should_render)
-
-    for l1, l2 in should_render:
-        l2_pos = l2_positions[l2]
-        l1_pos = l1_positions[l1]
-        weight = w[l1][l2]
-        fill = WEIGHT_COLOR
-        weight = abs(weight)
-        np.set_printoptions(threshold=np.inf)
-        # Render activation if l1 activation values are supplied
-        if activations is not None:
-            active = activations[l1, l2]
-            if active: fill = WEIGHT_COLOR_ACTIVE
-        canvas.create_line(*l1_pos, *l2_pos, width=weight, fill=fill)
+    if needs_update is not None: should_render &= needs_update
+    if significant is not None: should_render &= significant
+    if activations is not None: should_render &= activations
+    edges = np.argwhere(should_render)
+    l1, l2 = edges[:, 0], edges[:, 1]
+
+    widths = np.abs(w[l1, l2])
+    # Render activation if l1 activation values are supplied
+    fills = np.where(activations[l1, l2], WEIGHT_COLOR_ACTIVE, WEIGHT_COLOR) if activations is not None else np.full(len(edges), WEIGHT_COLOR)
+    for i in range(len(edges)):
+        canvas.create_line(*l1_positions[l1[i]], *l2_positions[l2[i]], width=widths[i], fill=fills[i])
+
+class ItemTable:
+    """
+    A retained set of canvas items with the option values they were last configured with.
+
+    Items are created once and update() only sends itemconfig calls for the items whose value actually changed, so
+    the cost of a frame follows how much of the network changed rather than how big it is.
+    """
+
+    def __init__(self, canvas, ids, **options):
+        """
+        :param canvas: Tkinter canvas the items live on
+        :param ids: canvas item ids, one per row of the table
+        :param options: initial value of each option the table tracks, one entry per item
+        """
+        self.canvas = canvas
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.values = {name: np.array(value) for name, value in options.items()}
+
+    def update(self, option, values):
+        """
+        Reconfigure the items whose option value changed
+        :param option: canvas item option, e.g. "fill" or "state"
+        :param values: new value for every item
+        :return: number of items reconfigured
+        """
+        values = np.asarray(values)
+        changed = np.flatnonzero(values != self.values[option])
+        for i in changed:
+            self.canvas.itemconfig(int(self.ids[i]), {option: values[i].item()})
+        self.values[option] = values
+        return len(changed)
+
+
+def layer_positions(count, top_y, bottom_y, x, neuron_size):
+    """
+    Centres of a layer's neurons, spaced evenly like render_layer draws them
+    :return: list of (x, y) coordinates
+    """
+    padding = ((bottom_y - top_y) - (count * neuron_size)) / (count + 1)
+    return [(x, top_y + (i * neuron_size) + ((i+1) * padding) + (neuron_size / 2)) for i in range(count)]
+
+
+def create_layer(canvas, neurons, positions, neuron_size, labels=None):
+    """
+    Create the ovals (and labels) for one layer
+    :param neurons: rescaled biases, used for the neuron sizes like in render_layer
+    :param positions: neuron centres from layer_positions
+    :return: ItemTable of the ovals tracking "fill"
+    """
+    neurons = neurons * 10 + 1
+    ids = []
+    for i, (x, y) in enumerate(positions):
+        ids.append(create_circle(x, y, (neuron_size / 2) * neurons[i], canvas))
+        if labels:
+            canvas.create_text(x+25, y, text=labels[i], font=TITLE_FONT, anchor=tk.W)
+    return ItemTable(canvas, ids, fill=np.full(len(ids), NEURON_COLOR))
+
+
+def create_weights(canvas, l1_positions, l2_positions, w, edges):
+    """
+    Create a hidden line for each listed weight, for weights that are shown and hidden as activations change
+    :param edges: (n, 2) array of [l1 index, l2 index] pairs to create lines for
+    :return: ItemTable of the lines tracking "state"
+    """
+    ids = []
+    for l1, l2 in edges:
+        ids.append(canvas.create_line(*l1_positions[l1], *l2_positions[l2], width=abs(w[l1][l2]),
+                                      fill=WEIGHT_COLOR_ACTIVE, state=tk.HIDDEN))
+    return ItemTable(canvas, ids, state=np.full(len(ids), tk.HIDDEN))
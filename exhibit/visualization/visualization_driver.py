@@ -1,29 +1,173 @@
+import email.utils
+import gzip
 import http.server
-import socketserver
+import os
+import shutil
+import threading
+
+"""
+Static file server for the browser visualizer.
+
+Requests are handled on their own threads, so the page's scripts, the model modules and the opponent model download
+in parallel. Large text and model files are served from gzip variants stored next to them (name.gz, the layout nginx's
+gzip_static uses), created when the server starts or on first request and refreshed whenever the original changes.
+Every response carries an ETag and Last-Modified so reloads revalidate with a 304 instead of downloading again, and
+the vendored libraries, which only change with a checkout, are cached by the browser outright.
+"""
+
+PORT = 8000
+DIRECTORY = "visualizer"
+#DIRECTORY = "exhibit\visualization"
+
+# Types worth compressing (.bin model packs and .glb are mostly uncompressed numbers)
+COMPRESSIBLE = {".js", ".json", ".html", ".css", ".glb", ".bin", ".wasm", ".svg", ".map"}
+MIN_COMPRESS_SIZE = 1024  # Smaller files aren't worth a Content-Encoding
+# Compressed as soon as the server starts, so even the first visitor after a restart gets them compressed
+PRECOMPRESS = ["models/easy.bin", "models/medium.bin", "models/hard.bin", "AIOpponent.glb"]
+VENDOR_PREFIX = "/vendor/"
+VENDOR_CACHE = "public, max-age=31536000, immutable"  # Third party libraries, only change with a checkout
+DEFAULT_CACHE = "no-cache"  # Everything else may be regenerated, so always revalidate (cheap with ETags)
+
+compress_lock = threading.Lock()
+
+
+def is_compressible(path, size):
+    return size >= MIN_COMPRESS_SIZE and os.path.splitext(path)[1].lower() in COMPRESSIBLE
+
+
+def compressed_variant(path, stat=None):
+    """
+    Get the gzip variant of a file, creating or refreshing it if needed
+    :param path: file to compress
+    :param stat: os.stat of the file, if already known
+    :return: path of the .gz file, or None if it can't be written (e.g. read-only directory)
+    """
+    stat = stat if stat is not None else os.stat(path)
+    variant = path + ".gz"
+    try:
+        if os.stat(variant).st_mtime >= stat.st_mtime:
+            return variant
+    except OSError:
+        pass
+    with compress_lock:
+        # Another request may have compressed it while this one waited
+        try:
+            if os.stat(variant).st_mtime >= stat.st_mtime:
+                return variant
+        except OSError:
+            pass
+        temporary = f"{variant}.{threading.get_ident()}.tmp"
+        try:
+            with open(path, "rb") as source, gzip.GzipFile(temporary, "wb", compresslevel=9, mtime=0) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            os.replace(temporary, variant)
+        except OSError as ex:
+            print(f"couldn't compress {path}: {ex}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return None
+    return variant
+
+
+def precompress(directory, paths=PRECOMPRESS):
+    """
+    Create the gzip variants of the big files ahead of the first request
+    """
+    for relative in paths:
+        path = os.path.join(directory, relative)
+        if os.path.isfile(path):
+            compressed_variant(path)
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    extensions_map = {
+        '': 'application/octet-stream',
+        '.manifest': 'text/cache-manifest',
+        '.html': 'text/html',
+        '.css':	'text/css',
+        '.js':'text/javascript',
+        '.wasm': 'application/wasm',
+        '.json': 'application/json',
+        '.xml': 'application/xml',
+        '.glb': 'model/gltf-binary',
+    }
+
+    def __init__(self, *args, directory=DIRECTORY, **kwargs):
+        super().__init__(*args, directory=directory, **kwargs)
+
+    def accepts_gzip(self):
+        encodings = self.headers.get("Accept-Encoding", "")
+        return any(e.split(";")[0].strip() == "gzip" for e in encodings.split(","))
+
+    def cache_control(self):
+        return VENDOR_CACHE if self.path.startswith(VENDOR_PREFIX) else DEFAULT_CACHE
+
+    def not_modified(self, etag, mtime):
+        """
+        :return: True if the browser's cached copy is still current
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+                return int(mtime) <= since.timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+        return False
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path) or path.endswith(".gz"):
+            # Directories, index pages and 404s are handled as before
+            return super().send_head()
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+        served = path
+        if self.accepts_gzip() and is_compressible(path, stat.st_size):
+            variant = compressed_variant(path, stat)
+            if variant is not None:
+                served = variant
+                etag = etag[:-1] + '-gzip"'
+
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.cache_control())
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
+
+        try:
+            f = open(served, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        self.send_response(200)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+        if served != path:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", self.cache_control())
+        self.end_headers()
+        return f
+
+
+class VisualizerServer(http.server.ThreadingHTTPServer):
+    # Restarting the exhibit shouldn't have to wait for the old socket to time out
+    allow_reuse_address = True
+    daemon_threads = True
+
+
 def main(in_q):
-    
-    print('placeholder')
-    PORT = 8000
-    DIRECTORY = "visualizer"
-    #DIRECTORY = "exhibit\visualization"
-
-
-    class Handler(http.server.SimpleHTTPRequestHandler):
-        extensions_map = {
-            '': 'application/octet-stream',
-            '.manifest': 'text/cache-manifest',
-            '.html': 'text/html',
-            '.css':	'text/css',
-            '.js':'text/javascript',
-            '.wasm': 'application/wasm',
-            '.json': 'application/json',
-            '.xml': 'application/xml',
-        }
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, directory=DIRECTORY, **kwargs)
-
-
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    threading.Thread(target=precompress, args=(DIRECTORY,), name="precompress", daemon=True).start()
+    with VisualizerServer(("", PORT), Handler) as httpd:
         print("serving at port", PORT)
         httpd.serve_forever()
 
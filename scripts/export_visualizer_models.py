@@ -0,0 +1,27 @@
+# Writes the packed per-level models the browser visualizer loads (see exhibit/visualization/model_export.py).
+# Replaces the JSON export of get_json_model.py: the packs are several times smaller and carry the significant edge
+# lists and weight images precomputed, so the visualizer switches levels without searching the weights.
+# Run from the repository root: python scripts/export_visualizer_models.py [easy.h5 medium.h5 hard.h5]
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exhibit.shared.config import Config
+from exhibit.ai.model import PGAgent
+from exhibit.visualization.model_export import export_model_pack
+
+# One model per level, the same files the AI driver plays with
+MODELS = ["./validation/sym_large_nomp_10000.h5", "./validation/sym_large_nomp_10000.h5", "./validation/sym_large_nomp_10000.h5"]
+OUTPUTS = ['visualizer/models/easy.bin', 'visualizer/models/medium.bin', 'visualizer/models/hard.bin']
+
+if __name__ == "__main__":
+    config = Config.instance()
+    models = sys.argv[1:4] if len(sys.argv) >= 4 else MODELS
+    os.makedirs(os.path.dirname(OUTPUTS[0]), exist_ok=True)
+    for model, output in zip(models, OUTPUTS):
+        agent = PGAgent(config.CUSTOM_STATE_SIZE, config.CUSTOM_ACTION_SIZE, verbose=False)
+        agent.load(model)
+        size = export_model_pack(agent.infer_model.get_weights(), output, config.CUSTOM_STATE_SHAPE, source=model)
+        print(f"{model} -> {output} ({size / 1e6:.1f} MB)")
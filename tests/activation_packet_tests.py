@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from exhibit.shared.activation_packet import encode_activation_packet, decode_activation_packet, is_activation_packet, \
+    ActivationStreamWriter, read_activation_stream
+
+"""
+These tests assert that the binary visualizer packet round trips the activations the visualizer draws,
+and that it stays much smaller than the JSON packet it replaces.
+"""
+
+
+def make_activations():
+    rng = np.random.default_rng(0)
+    state = np.zeros(7680)
+    pixels = rng.choice(7680, 150, replace=False)
+    state[pixels] = rng.choice([-1, 1], 150)
+    hidden = np.maximum(rng.normal(size=200), 0).astype(np.float32)
+    output = np.array([0.25, 0.5, 0.25], dtype=np.float32)
+    return state, hidden, output
+
+
+def test_round_trip():
+    state, hidden, output = make_activations()
+    packet = decode_activation_packet(encode_activation_packet(state, hidden, output, frame=4321, level=2))
+    assert packet["frame"] == 4321
+    assert packet["level"] == 2
+    assert np.array_equal(packet["state"], state)
+    assert np.max(np.abs(packet["hidden"] - hidden)) <= hidden.max() / 255
+    assert np.max(np.abs(packet["output"] - output)) <= 1 / 255
+
+
+def test_smaller_than_json():
+    state, hidden, output = make_activations()
+    payload = encode_activation_packet(state, hidden, output)
+    assert is_activation_packet(payload)
+    assert len(payload) * 10 < len(json.dumps([state.tolist(), hidden.tolist(), output.tolist()]))
+
+
+def test_inactive_hidden_layer():
+    state, hidden, output = make_activations()
+    packet = decode_activation_packet(encode_activation_packet(state, np.zeros(200), output))
+    assert not np.any(packet["hidden"])
+
+
+def test_recorded_stream_replays_in_order():
+    state, hidden, output = make_activations()
+    path = os.path.join(tempfile.mkdtemp(), "activations.bin")
+    with ActivationStreamWriter(path) as writer:
+        for frame in range(3):
+            writer.write(encode_activation_packet(state, hidden, output, frame=frame))
+    packets = list(read_activation_stream(path))
+    assert [p["frame"] for p in packets] == [0, 1, 2]
+    assert np.array_equal(packets[2]["state"], state)
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_smaller_than_json()
+    test_inactive_hidden_layer()
+    test_recorded_stream_replays_in_order()
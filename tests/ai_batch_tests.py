@@ -0,0 +1,44 @@
+import numpy as np
+
+from exhibit.ai.batch import InferenceRequest, run_batch
+from exhibit.shared.topics import game_topic, split_game_topic
+
+"""
+These tests check the per-game topic namespaces and the cross-game batching used by the shared AI server.
+"""
+
+
+class FakeAgent:
+    def __init__(self):
+        self.batches = []
+
+    def act_batch(self, states):
+        self.batches.append(len(states))
+        # Action is the first state value, so every reply can be traced back to its request
+        return states[:, 0].astype(int), states * 2, np.tile([0.2, 0.3, 0.5], (len(states), 1))
+
+
+def test_game_topics():
+    assert game_topic(None, "paddle1/action") == "paddle1/action"
+    assert game_topic("3", "paddle1/action") == "games/3/paddle1/action"
+    assert split_game_topic("games/3/game/frame") == ("3", "game/frame")
+    assert split_game_topic("game/frame") == (None, "game/frame")
+    assert split_game_topic("games/3") == (None, "games/3")
+
+
+def test_one_forward_pass_per_model():
+    shared, hard = FakeAgent(), FakeAgent()
+    agents = {1: shared, 2: shared, 3: hard}
+    requests = [InferenceRequest(game, paddle, 10, None, np.full(4, i, dtype=np.float32), level)
+                for i, (game, paddle, level) in enumerate([("a", "paddle1", 1), ("b", "paddle1", 3),
+                                                           ("c", "paddle1", 2), ("c", "paddle2", 2)])]
+    results = run_batch(requests, lambda level: agents.get(level, agents[1]))
+    assert shared.batches == [3] and hard.batches == [1]
+    assert [result[0] for result in results] == requests
+    assert [result[1] for result in results] == [0, 1, 2, 3]
+    assert np.all(results[3][2] == 6)
+
+
+if __name__ == "__main__":
+    test_game_topics()
+    test_one_forward_pass_per_model()
@@ -0,0 +1,41 @@
+from exhibit.ai.ai_driver import AIDriver
+
+"""
+These tests run the AI driver's inference loop one pass at a time, without a model or a broker.
+"""
+
+
+class FrameState:
+    def __init__(self, frame):
+        self.frame = frame
+
+
+def make_driver(frame, last_acted_frame):
+    # Skip __init__, which loads the models and connects to the broker
+    driver = AIDriver.__new__(AIDriver)
+    driver.state = FrameState(frame)
+    driver.last_acted_frame = last_acted_frame
+    driver.published = 0
+
+    def publish_inference():
+        driver.published += 1
+    driver.publish_inference = publish_inference
+    return driver
+
+
+def test_loop_pass_infers_on_new_frame():
+    driver = make_driver(frame=10, last_acted_frame=5)
+    assert driver.inference_step()
+    assert driver.published == 1
+    assert driver.last_acted_frame == 10
+
+
+def test_loop_pass_waits_for_next_request():
+    driver = make_driver(frame=10, last_acted_frame=10)
+    assert not driver.inference_step()
+    assert driver.published == 0
+
+
+if __name__ == "__main__":
+    test_loop_pass_infers_on_new_frame()
+    test_loop_pass_waits_for_next_request()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import numpy as np
+
+from exhibit.ai.ai_server import AIServer
+from exhibit.shared.config import Config
+
+"""
+These tests feed namespaced game messages to the shared AI server through a recording transport, and check that
+requests are batched and every reply goes back to the game and paddle it belongs to.
+"""
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.published = []
+        self.on_connect = None
+        self.on_message = None
+
+    def publish(self, topic, message, qos=0):
+        self.published.append((topic, message))
+
+    def publish_binary(self, topic, payload, qos=0):
+        self.published.append((topic, payload))
+
+    def topics(self):
+        return [topic for topic, message in self.published]
+
+
+class FakeAgent:
+    def __init__(self):
+        self.batches = []
+
+    def act_batch(self, states):
+        self.batches.append(len(states))
+        count = len(states)
+        return np.ones(count, dtype=int), np.ones((count, 4)), np.tile([0.2, 0.6, 0.2], (count, 1))
+
+
+def make_server(gather=0):
+    config = Config()
+    config.AI_PREDICT_STATE = False
+    config.AI_SERVER_GATHER = gather
+    agent = FakeAgent()
+    transport = RecordingTransport()
+    server = AIServer(config=config, agents={1: agent, 2: agent}, transport=transport)
+    return server, agent, transport
+
+
+def send_state(server, game_id, frame, level=1, paddles=None):
+    send = lambda topic, payload: server.on_message(f"games/{game_id}/{topic}", payload)
+    send("game/level", {"level": level})
+    send("puck/position", {"x": 90, "y": 80})
+    send("paddle1/position", {"position": 50})
+    send("paddle2/position", {"position": 120})
+    request = {"frame": frame}
+    if paddles is not None:
+        request["paddles"] = paddles
+    send("game/frame", request)
+
+
+def test_replies_go_to_each_games_namespace():
+    server, agent, transport = make_server()
+    server.on_message("puck/position", {"x": 1, "y": 1})  # Bare topics belong to no game
+    send_state(server, "a", 10)
+    send_state(server, "b", 25, level=2, paddles=["paddle1", "paddle2"])
+    assert sorted(server.tenants) == ["a", "b"]
+
+    assert server.tick() == 3
+    assert agent.batches == [3]  # Both levels share the model, so one forward pass
+    assert server.tick() == 0  # Nothing new was requested
+    replies = {topic: message for topic, message in transport.published if topic.endswith("/action")}
+    assert replies["games/a/paddle1/action"]["frame"] == 10
+    assert replies["games/b/paddle1/action"]["frame"] == 25
+    assert replies["games/b/paddle2/action"]["frame"] == 25
+    assert "games/a/paddle2/action" not in replies
+    assert {"games/a/paddle1/frame", "games/b/paddle2/frame", "games/a/ai/activation",
+            "games/b/ai/activation", "games/b/ai/activation/paddle2"} <= set(transport.topics())
+
+
+def test_requests_within_gather_window_share_a_batch():
+    server, agent, transport = make_server(gather=0.2)
+    thread = threading.Thread(target=server.inference_loop, daemon=True)
+    thread.start()
+    send_state(server, "a", 5)
+    send_state(server, "b", 5)
+    deadline = time.perf_counter() + 2
+    while server.inferences < 2 and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    server.running = False
+    thread.join()
+    assert server.ticks == 1 and agent.batches == [2]
+
+
+if __name__ == "__main__":
+    test_replies_go_to_each_games_namespace()
+    test_requests_within_gather_window_share_a_batch()
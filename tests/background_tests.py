@@ -0,0 +1,82 @@
+import numpy as np
+
+from exhibit.camera import blob
+from exhibit.camera.background import BackgroundModel
+
+"""
+These tests check that the background model ignores static scenery nearer than the clipping distance.
+"""
+
+CLIPPING = 1600
+
+
+def scene(rng, player_column=None):
+    # a wall at 2.5m, with a table at 1.2m on the left that the clipping distance alone lets through
+    depth = rng.normal(2500, 10, (80, 100)).astype(np.uint16)
+    depth[40:, 5:25] = rng.normal(1200, 10, (40, 20))
+    depth[:5, 60:] = 0  # no reading
+    if player_column is not None:
+        depth[10:, player_column - 5:player_column + 5] = 900
+    return depth
+
+
+def learned(rng):
+    model = BackgroundModel(tolerance=150, learn_frames=10)
+    for i in range(10):
+        model.observe(scene(rng), False)
+    assert model.ready()
+    return model
+
+
+def test_static_scenery_is_not_a_player():
+    rng = np.random.default_rng(0)
+    model = learned(rng)
+    depth = scene(rng)
+    assert np.count_nonzero(blob.foreground_mask(depth, CLIPPING)) > blob.MIN_PLAYER_PIXELS
+    assert np.count_nonzero(model.foreground_mask(depth, CLIPPING)) == 0
+
+
+def test_player_is_found_in_front_of_scenery():
+    rng = np.random.default_rng(1)
+    model = learned(rng)
+    depth = scene(rng, player_column=15)
+    mask = model.foreground_mask(depth, CLIPPING)
+    assert np.count_nonzero(mask) == 70 * 10
+    assert blob.find_player(mask) in range(10, 20)
+    # a column window of the frame gives the same pixels
+    window = model.foreground_mask(depth[:, 0:50:2], CLIPPING, columns=slice(0, 50, 2))
+    assert np.array_equal(window, mask[:, 0:50:2])
+
+
+def test_updates_pause_while_player_present():
+    rng = np.random.default_rng(2)
+    model = learned(rng)
+    before = model.background.copy()
+    for i in range(100):
+        model.observe(scene(rng, player_column=50), True)
+    assert np.array_equal(model.background, before)
+    for i in range(100):
+        model.observe(scene(rng, player_column=50), False)
+    # with nobody playing, a new object slowly becomes part of the background
+    assert model.background[40, 50] < before[40, 50] - 500
+
+
+def test_size_change_while_learning_restarts():
+    rng = np.random.default_rng(3)
+    model = BackgroundModel(tolerance=150, learn_frames=10)
+    for i in range(6):
+        model.observe(scene(rng)[::2, ::2], False)
+    # the decimation changed before the background was learned
+    for i in range(9):
+        model.observe(scene(rng), False)
+    assert not model.ready()
+    model.observe(scene(rng), False)
+    assert model.ready()
+    assert model.background.shape == (80, 100)
+
+
+if __name__ == "__main__":
+    test_static_scenery_is_not_a_player()
+    test_player_is_found_in_front_of_scenery()
+    test_updates_pause_while_player_present()
+    test_size_change_while_learning_restarts()
@@ -0,0 +1,67 @@
+import numpy as np
+
+from exhibit.camera import blob
+
+"""
+These tests check that the vectorized blob detection finds exactly the same player position
+as the original per-pixel island search.
+"""
+
+
+def reference_player_x(cutoffImage):
+    # The original loop from Pong.get_human_x
+    avg_x_array = np.array([])
+    countB = 0
+    for a in range(np.size(cutoffImage, 0)):
+        for b in range(np.size(cutoffImage, 1)):
+            if cutoffImage[a, b]:
+                avg_x_array = np.append(avg_x_array, b)
+                countB = countB + 1
+    if countB <= 40:
+        return None
+    avg_x_array.sort()
+    islands = []
+    i_min = 0
+    i_max = 0
+    p = avg_x_array[0]
+    for index in range(np.size(avg_x_array, 0)):
+        n = avg_x_array[index]
+        if n > p + 1 and not i_min == i_max:
+            islands.append(avg_x_array[i_min:i_max])
+            i_min = index
+        i_max = index
+        p = n
+    if not i_min == i_max: islands.append(avg_x_array[i_min:i_max])
+    bigIsland = np.array([])
+    for array in islands:
+        if np.size(array, 0) > np.size(bigIsland, 0): bigIsland = array
+    return np.median(bigIsland)
+
+
+def test_matches_reference_on_noisy_masks():
+    rng = np.random.default_rng(0)
+    for trial in range(300):
+        h, w = rng.integers(1, 12), rng.integers(2, 107)
+        mask = rng.random((h, w)) < rng.choice([0.02, 0.1, 0.5])
+        # A player sized blob on top of speckle noise
+        centre, radius = rng.integers(0, w), rng.integers(1, 30)
+        mask[:, max(0, centre - radius):centre + radius] |= rng.random(1) < 0.7
+        assert blob.find_player(mask) == reference_player_x(mask)
+
+
+def test_single_pixel_runs_merge_like_the_original():
+    # Column runs of one pixel at the start of an island join the next run
+    mask = np.zeros((50, 20), dtype=bool)
+    mask[0, [0, 2, 4]] = True
+    mask[:, 10:12] = True
+    assert blob.find_player(mask) == reference_player_x(mask)
+
+
+def test_empty_mask_has_no_player():
+    assert blob.find_player(np.zeros((10, 10), dtype=bool)) is None
+
+
+if __name__ == "__main__":
+    test_matches_reference_on_noisy_masks()
+    test_single_pixel_runs_merge_like_the_original()
+    test_empty_mask_has_no_player()
@@ -0,0 +1,54 @@
+import time
+
+from exhibit.camera.budget import ProcessingBudget
+
+"""
+These tests check that the processing budget steps its settings down under load and back up with headroom.
+"""
+
+
+def frame(budget, cost_ms, position=0.5):
+    # Pretend the frame's tracking work started cost_ms ago
+    budget.started = time.perf_counter() - cost_ms / 1000
+    return budget.end(position)
+
+
+def test_steps_down_when_over_budget():
+    budget = ProcessingBudget(8, patience=5)
+    changes = [frame(budget, 20) for i in range(5)]
+    assert changes == [False, False, False, False, True]
+    assert budget.level == 1 and budget.stride == 2
+
+
+def test_single_slow_frame_does_not_change_level():
+    budget = ProcessingBudget(8, patience=5)
+    for i in range(20):
+        frame(budget, 30 if i == 10 else 2)
+    assert budget.level == 0
+
+
+def test_steps_back_up_with_headroom():
+    budget = ProcessingBudget(8, patience=5)
+    budget.set_level(3)
+    for i in range(40):
+        frame(budget, 1)
+    assert budget.level == 0
+
+
+def test_region_follows_player():
+    budget = ProcessingBudget(8)
+    budget.set_level(2)  # 60% of the columns, stride 2
+    budget.last_position = 0.5
+    assert budget.region(100) == (20, 80, 2)
+    budget.last_position = 0.95
+    assert budget.region(100) == (40, 100, 2)
+    # Nobody tracked last frame: search the whole width
+    budget.last_position = None
+    assert budget.region(100) == (0, 100, 2)
+
+
+if __name__ == "__main__":
+    test_steps_down_when_over_budget()
+    test_single_slow_frame_does_not_change_level()
+    test_steps_back_up_with_headroom()
+    test_region_follows_player()
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from exhibit.camera.capture import CaptureThread, LatestValue
+
+"""
+These tests check that the camera capture thread keeps only the latest value and never blocks readers.
+"""
+
+
+def test_latest_value_keeps_newest_sample():
+    slot = LatestValue()
+    assert slot.get() is None and slot.age() is None
+    slot.put(0.25)
+    slot.put(0.75)
+    assert slot.get().value == 0.75
+    assert slot.get().sequence == 2
+
+
+def test_capture_thread_reads_without_blocking():
+    values = iter(range(1000000))
+
+    def slow_capture():
+        time.sleep(0.01)
+        return next(values)
+
+    capture = CaptureThread(slow_capture)
+    capture.start()
+    start = time.perf_counter()
+    capture.latest()
+    assert time.perf_counter() - start < 0.005
+    time.sleep(0.1)
+    capture.stop()
+    sample = capture.latest()
+    assert sample.value > 0 and sample.sequence == sample.value + 1
+    assert not capture.thread
+
+
+def test_stop_reports_a_blocked_capture():
+    release = threading.Event()
+
+    def blocked_capture():
+        release.wait(2)
+        return 1
+
+    capture = CaptureThread(blocked_capture)
+    capture.start()
+    time.sleep(0.01)
+    assert not capture.stop(timeout=0.05)
+    assert capture.thread.is_alive()  # Still referenced, the camera isn't free
+    release.set()
+    assert capture.stop()
+    assert capture.thread is None
+
+
+if __name__ == "__main__":
+    test_latest_value_keeps_newest_sample()
+    test_capture_thread_reads_without_blocking()
+    test_stop_reports_a_blocked_capture()
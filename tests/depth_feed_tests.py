@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+
+from exhibit.game.depth_feed_publisher import DepthFeedPublisher
+from exhibit.shared.config import Config
+
+"""
+These tests check that the depth preview feed is only sent when new, within its rate and byte budget,
+and only while someone is watching.
+"""
+
+
+def make_publisher(**settings):
+    config = Config()
+    for name, value in settings.items():
+        setattr(config, name, value)
+    sent = []
+    return DepthFeedPublisher(config, emit=sent.append), sent
+
+
+def test_rate_limit():
+    publisher, sent = make_publisher(DEPTH_FEED_MAX_FPS=10)
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert publisher.due()
+    assert publisher.offer(1, image)
+    assert not publisher.due()
+    assert not publisher.offer(2, image)
+    publisher.last_publish_time -= 0.1  # One frame interval later
+    assert publisher.due()
+    assert publisher.offer(2, image)
+    assert len(sent) == 2
+
+
+def test_unchanged_image_is_skipped():
+    publisher, sent = make_publisher()
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert publisher.offer(1, image)
+    publisher.last_publish_time = None
+    assert not publisher.offer(1, image)
+    assert not publisher.offer(2, None)
+    assert len(sent) == 1 and sent[0][:2] == b"\xff\xd8"
+
+
+def test_ladder_steps_down_and_back_up():
+    publisher, sent = make_publisher(DEPTH_FEED_MAX_BYTES_PER_SEC=1000,
+                                     DEPTH_FEED_LADDER=[(1.0, 80), (0.5, 60), (0.5, 40)])
+    start = publisher.window_start
+    publisher.adapt(5000, start + 1)  # 5000 B/s, over budget
+    assert publisher.rung == 1
+    publisher.adapt(5000, start + 2)
+    assert publisher.rung == 2
+    publisher.adapt(5000, start + 3)
+    assert publisher.rung == 2  # Already at the bottom
+    publisher.adapt(800, start + 4)  # Within budget, but not far enough under it to step up
+    assert publisher.rung == 2
+    publisher.adapt(100, start + 5)
+    assert publisher.rung == 1
+    publisher.adapt(100, start + 5.5)  # Rates are only judged once a second
+    assert publisher.rung == 1
+
+
+def test_requires_visualizer():
+    publisher, sent = make_publisher(DEPTH_FEED_REQUIRE_VISUALIZER=True, DEPTH_FEED_VISUALIZER_TIMEOUT=5)
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert not publisher.active()
+    assert not publisher.offer(1, image)
+    publisher.visualizer_seen()
+    assert publisher.active()
+    publisher.last_visualizer_time = time.monotonic() - 6  # Heartbeats stopped
+    assert not publisher.active()
+    publisher.visualizer_seen()
+    publisher.visualizer_seen(online=False)
+    assert not publisher.active()
+    publisher, sent = make_publisher(DEPTH_FEED_REQUIRE_VISUALIZER=False)
+    assert publisher.active()
+
+
+if __name__ == "__main__":
+    test_rate_limit()
+    test_unchanged_image_is_skipped()
+    test_ladder_steps_down_and_back_up()
+    test_requires_visualizer()
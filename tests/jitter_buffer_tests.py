@@ -0,0 +1,78 @@
+from exhibit.game.jitter_buffer import ActionJitterBuffer
+
+"""
+These tests check that networked actions are applied on the same frame the simulator would apply them,
+regardless of when they actually arrive.
+"""
+
+
+def test_on_time_action_waits_for_target():
+    buffer = ActionJitterBuffer(delay_frames=5)
+    buffer.mark_requested(0)
+    buffer.push(0, 1)
+    for frame in range(5):
+        assert buffer.poll(frame) == 2
+    assert buffer.poll(5) == 1
+    assert buffer.on_time == 1 and buffer.late == 0
+
+
+def test_late_action_applies_next_frame():
+    buffer = ActionJitterBuffer(delay_frames=5)
+    buffer.mark_requested(0)
+    for frame in range(7):
+        assert buffer.poll(frame) == 2
+    buffer.push(0, 0)
+    assert buffer.poll(7) == 0
+    assert buffer.late == 1
+    assert list(buffer.late_frames) == [2]
+
+
+def test_stale_actions_are_ignored():
+    buffer = ActionJitterBuffer(delay_frames=5)
+    buffer.push(400, 1)  # Reply to a request from the previous game
+    assert buffer.poll(0) == 2
+    assert buffer.stale == 1
+
+
+def test_late_action_does_not_override_newer():
+    buffer = ActionJitterBuffer(delay_frames=5)
+    buffer.mark_requested(0)
+    buffer.mark_requested(5)
+    buffer.push(5, 1)
+    for frame in range(11):
+        buffer.poll(frame)
+    buffer.push(0, 0)
+    assert buffer.poll(11) == 1
+    assert buffer.superseded == 1
+
+
+def test_unscheduled_reply_still_measures_round_trip():
+    buffer = ActionJitterBuffer(delay_frames=5)
+    buffer.mark_requested(0)
+    buffer.push(0, 1, schedule=False)
+    assert buffer.last_round_trip() is not None
+    assert not buffer.requested
+    assert buffer.poll(5) == 2  # The game applies actions itself when the buffer is off
+
+
+def test_tracking_is_bounded():
+    buffer = ActionJitterBuffer(delay_frames=1, history=3)
+    # Requests that are never answered or polled are forgotten
+    for frame in range(0, 100, 5):
+        buffer.mark_requested(frame)
+    assert len(buffer.requested) <= 3
+    for frame in range(90, 100, 5):
+        buffer.push(frame, 1)
+    for frame in range(5):
+        buffer.mark_requested(100 + frame)
+        buffer.push(100 + frame, 1)
+    assert len(buffer.round_trips) == 3
+
+
+if __name__ == "__main__":
+    test_on_time_action_waits_for_target()
+    test_late_action_applies_next_frame()
+    test_stale_actions_are_ignored()
+    test_late_action_does_not_override_newer()
+    test_unscheduled_reply_still_measures_round_trip()
+    test_tracking_is_bounded()
@@ -0,0 +1,59 @@
+import numpy as np
+
+from exhibit.game.jitter_buffer import ActionJitterBuffer
+from exhibit.shared.latency import LatencyHistogram, LatencyRecorder
+
+"""
+These tests check that the latency histograms report percentiles close to the exact values,
+and that the jitter buffer feeds the per-stage timings.
+"""
+
+
+def test_histogram_percentiles_within_bucket_error():
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(mean=np.log(0.02), sigma=0.8, size=5000)
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+    for p in (50, 90, 99):
+        exact = np.percentile(samples, p) * 1000
+        assert abs(histogram.percentile(p) - exact) / exact < 0.07
+    assert histogram.summary()["count"] == len(samples)
+
+
+def test_disabled_recorder_is_a_no_op():
+    recorder = LatencyRecorder("test", enabled=False)
+    recorder.record("stage", 0.01)
+    assert recorder.summary() == {}
+
+
+def test_jitter_buffer_records_stages():
+    recorder = LatencyRecorder("game")
+    buffer = ActionJitterBuffer(delay_frames=2, latency=recorder)
+    buffer.mark_requested(0)
+    buffer.push(0, 1, ai_time=0)
+    buffer.poll(2)
+    summary = recorder.summary()
+    for stage in ("round_trip", "network", "apply_wait", "emit_to_apply"):
+        assert summary[stage]["count"] == 1
+
+
+def test_merged_recorders_combine_stages():
+    game, paddle1, paddle2 = LatencyRecorder("game"), LatencyRecorder("paddle1"), LatencyRecorder("paddle2")
+    game.record("emit", 0.001)
+    paddle1.record("round_trip", 0.01)
+    paddle2.record("round_trip", 0.02)
+    merged = game.merged(paddle1, paddle2)
+    assert merged.name == "game"
+    summary = merged.summary()
+    assert summary["emit"]["count"] == 1
+    assert summary["round_trip"]["count"] == 2
+    # The parts are left as they were
+    assert paddle1.summary()["round_trip"]["count"] == 1
+
+
+if __name__ == "__main__":
+    test_histogram_percentiles_within_bucket_error()
+    test_disabled_recorder_is_a_no_op()
+    test_jitter_buffer_records_stages()
+    test_merged_recorders_combine_stages()
@@ -0,0 +1,124 @@
+import threading
+
+from exhibit.shared.local_bus import LocalBus, InProcessTransport
+
+"""
+These tests check the in-process transport used when the game and the AI run in one process.
+"""
+
+
+class RecordingBridge:
+    """
+    Stands in for the MQTT bridge and records what would be sent to the broker
+    """
+
+    def __init__(self):
+        self.subscribed = []
+        self.published = []
+        self.on_connect = None
+        self.on_message = None
+
+    def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    def publish(self, topic, message, qos=0):
+        self.published.append(topic)
+
+    def publish_binary(self, topic, payload, qos=0):
+        self.published.append(topic)
+
+    def loop_start(self):
+        pass
+
+
+def test_messages_are_passed_by_reference():
+    bus = LocalBus()
+    bridge = RecordingBridge()
+    bus.attach_bridge(bridge)
+    game, ai = InProcessTransport("game", bus=bus), InProcessTransport("ai", bus=bus)
+    ready = threading.Event()
+    received = []
+    ai.on_message = lambda topic, message: received.append((topic, message))
+    ai.on_connect = lambda: (ai.subscribe("game/frame"), ai.subscribe("game/level"), ready.set())
+    ai.loop_start()
+    assert ready.wait(1)
+
+    request = {"frame": 5}
+    game.publish("game/frame", request)
+    game.publish("game/level", {"level": 2}, qos=2)
+    game.publish("puck/position", {"x": 1, "y": 2})  # Nobody subscribed
+    ai.disconnect()
+    ai.thread.join()
+    while True:
+        message = ai.get(timeout=0)
+        if message is None:
+            break
+        received.append(message)
+    assert received[0][1] is request
+    assert [topic for topic, message in received] == ["game/frame", "game/level"]
+
+    # Game <-> AI traffic stays in process, the rest also goes to the broker
+    assert bridge.subscribed == ["game/level"]
+    assert bridge.published == ["game/level"]
+    # The broker echoing our own level message back isn't delivered twice
+    bus.attach(ai)
+    bus.bridged("game/level", {"level": 2})
+    assert ai.get(timeout=0) is None
+
+
+def test_slow_subscriber_drops_oldest():
+    bus = LocalBus(maxsize=3)
+    game, ai = InProcessTransport("game", bus=bus), InProcessTransport("ai", bus=bus)
+    bus.attach(ai)
+    bus.subscribe(ai, "puck/position")
+    for x in range(5):
+        game.publish("puck/position", {"x": x, "y": 0})
+    assert ai.dropped == 2
+    assert [ai.get()[1]["x"] for _ in range(3)] == [2, 3, 4]
+
+
+def test_qos_messages_are_never_dropped():
+    bus = LocalBus(maxsize=3)
+    game, ai = InProcessTransport("game", bus=bus), InProcessTransport("ai", bus=bus)
+    bus.attach(ai)
+    bus.subscribe(ai, "puck/position")
+    bus.subscribe(ai, "game/level")
+    game.publish("game/level", {"level": 3}, qos=2)
+    for x in range(3):
+        game.publish("puck/position", {"x": x, "y": 0})
+    game.publish("puck/position", {"x": 3, "y": 0})
+    assert ai.dropped == 1
+    assert ai.get() == ("game/level", {"level": 3})
+    assert [ai.get()[1]["x"] for _ in range(3)] == [1, 2, 3]
+    assert ai.get(timeout=0) is None
+
+
+def test_failed_subscriber_is_detached():
+    bus = LocalBus(maxsize=3)
+    game, ai = InProcessTransport("game", bus=bus), InProcessTransport("ai", bus=bus)
+
+    def fail(topic, message):
+        raise RuntimeError("handler failed")
+
+    ai.on_message = fail
+    ai.on_connect = lambda: (ai.subscribe("game/level"), game.publish("game/level", {"level": 1}, qos=2))
+    try:
+        ai.loop_forever()
+    except RuntimeError:
+        pass
+    assert ai not in bus.transports
+    assert not ai.running
+    # Publishing to the dead subscriber's topics neither blocks nor queues anything
+    for level in range(100):
+        thread = threading.Thread(target=game.publish, args=("game/level", {"level": level}), kwargs={"qos": 2})
+        thread.start()
+        thread.join(1)
+        assert not thread.is_alive()
+    assert ai.get(timeout=0) is None
+
+
+if __name__ == "__main__":
+    test_messages_are_passed_by_reference()
+    test_slow_subscriber_drops_oldest()
+    test_qos_messages_are_never_dropped()
+    test_failed_subscriber_is_detached()
@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+
+from exhibit.visualization.model_export import build_model_pack, read_model_pack, browser_weights, render_rescale, \
+    HIDDEN_EDGE_FRACTION, OUTPUT_EDGE_FRACTION, ALIGNMENT
+
+"""
+These tests pack a random model the size of the real one and read it back.
+"""
+
+STATE_SHAPE = (80, 96)
+HIDDEN = 200
+
+
+def make_weights():
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(80 * 96, HIDDEN)).astype(np.float32), rng.normal(size=HIDDEN).astype(np.float32),
+            rng.normal(size=(HIDDEN, 3)).astype(np.float32), rng.normal(size=3).astype(np.float32)]
+
+
+def test_round_trip():
+    weights = make_weights()
+    manifest, sections = read_model_pack(build_model_pack(weights, STATE_SHAPE, source="test.h5"))
+    assert manifest["source"] == "test.h5"
+    assert all(entry["offset"] % ALIGNMENT == 0 for entry in manifest["sections"].values())
+    rotated = browser_weights(weights, STATE_SHAPE)
+    for name, expected in zip(["hidden_weights", "hidden_biases", "output_weights", "output_biases"], rotated):
+        assert sections[name].shape == expected.shape
+        assert np.allclose(sections[name], expected, atol=1e-2)
+    assert sections["hidden_weight_maps"].shape == (HIDDEN, 80 * 96)
+
+
+def test_rotation_matches_json_export():
+    # get_json_model.py rotated the first layer into the visualizer's pixel order like this
+    weights = make_weights()
+    expected = np.rot90(weights[0].reshape(*STATE_SHAPE, -1), axes=(0, 1), k=1).reshape(80 * 96, HIDDEN)
+    assert np.array_equal(browser_weights(weights, STATE_SHAPE)[0], expected)
+
+
+def test_edges_are_the_largest_weights_in_drawing_order():
+    weights = make_weights()
+    manifest, sections = read_model_pack(build_model_pack(weights, STATE_SHAPE))
+    hidden = browser_weights(weights, STATE_SHAPE)[0]
+    inputs, outputs = sections["hidden_edge_inputs"].astype(np.int64), sections["hidden_edge_outputs"].astype(np.int64)
+    assert len(inputs) == int(hidden.size * HIDDEN_EDGE_FRACTION)
+    # Row-major order, like the argwhere the visualizer used to draw from
+    flat = inputs * HIDDEN + outputs
+    assert np.all(np.diff(flat) > 0)
+    assert hidden[inputs, outputs].min() >= np.sort(hidden.ravel())[-len(inputs)]
+    assert np.allclose(sections["hidden_edge_widths"], render_rescale(hidden)[inputs, outputs], atol=1e-2)
+    assert len(sections["output_edge_inputs"]) == int(HIDDEN * 3 * OUTPUT_EDGE_FRACTION)
+
+
+def test_pack_is_smaller_than_json():
+    weights = make_weights()
+    json_size = len(json.dumps([w.tolist() for w in browser_weights(weights, STATE_SHAPE)]))
+    assert len(build_model_pack(weights, STATE_SHAPE)) * 4 < json_size
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_rotation_matches_json_export()
+    test_edges_are_the_largest_weights_in_drawing_order()
+    test_pack_is_smaller_than_json()
@@ -0,0 +1,87 @@
+import socket
+import struct
+
+from exhibit.shared.mqtt_broker import LocalBroker, topic_matches, encode_packet, encode_string, encode_publish, \
+    read_packet, read_string, CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT
+
+"""
+These tests talk to the in-process broker over real sockets with hand-built MQTT packets.
+"""
+
+
+class RawClient:
+    def __init__(self, port, client_id, will=None):
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=2)
+        self.stream = self.socket.makefile("rb")
+        flags = 0x02
+        payload = encode_string(client_id)
+        if will is not None:
+            flags |= 0x04
+            payload += encode_string(will[0]) + encode_string(will[1])
+        body = encode_string("MQTT") + bytes([4, flags]) + struct.pack(">H", 60) + payload
+        self.socket.sendall(encode_packet(CONNECT, body))
+        assert self.read()[0] == CONNACK
+
+    def read(self):
+        return read_packet(self.stream)
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def subscribe(self, topic_filter):
+        self.socket.sendall(encode_packet(SUBSCRIBE, b"\x00\x01" + encode_string(topic_filter) + b"\x00", flags=2))
+        assert self.read()[0] == SUBACK
+
+    def read_message(self):
+        packet_type, flags, body = self.read()
+        assert packet_type == PUBLISH
+        topic, offset = read_string(body, 0)
+        return topic.decode(), body[offset:]
+
+
+def test_topic_wildcards():
+    assert topic_matches("paddle1/action", "paddle1/action")
+    assert topic_matches("games/+/game/frame", "games/3/game/frame")
+    assert topic_matches("games/#", "games/3/game/frame")
+    assert not topic_matches("games/+/game/frame", "games/3/game/level")
+    assert not topic_matches("paddle1/action", "paddle1/action/extra")
+
+
+def test_publish_subscribe_and_retain():
+    with LocalBroker(port=0) as broker:
+        game = RawClient(broker.port, "game")
+        ai = RawClient(broker.port, "ai")
+        ai.subscribe("game/#")
+        game.socket.sendall(encode_publish("game/frame", b'{"frame": 5}'))
+        assert ai.read_message() == ("game/frame", b'{"frame": 5}')
+
+        # QoS 1 is acknowledged, retained messages reach later subscribers
+        body = encode_string("game/level") + b"\x00\x07" + b'{"level": 2}'
+        game.socket.sendall(encode_packet(PUBLISH, body, flags=0x02 | 0x01))
+        assert game.read()[0] == PUBACK
+        assert ai.read_message() == ("game/level", b'{"level": 2}')
+        late = RawClient(broker.port, "visualizer")
+        late.subscribe("game/level")
+        assert late.read_message() == ("game/level", b'{"level": 2}')
+
+        game.socket.sendall(encode_packet(PINGREQ))
+        assert game.read()[0] == PINGRESP
+
+
+def test_will_is_sent_on_abrupt_disconnect():
+    with LocalBroker(port=0) as broker:
+        watcher = RawClient(broker.port, "watcher")
+        watcher.subscribe("visualizer/status")
+        clean = RawClient(broker.port, "clean", will=("visualizer/status", b"clean"))
+        clean.socket.sendall(encode_packet(DISCONNECT))
+        clean.close()
+        dropped = RawClient(broker.port, "dropped", will=("visualizer/status", b"dropped"))
+        dropped.close()
+        assert watcher.read_message() == ("visualizer/status", b"dropped")
+
+
+if __name__ == "__main__":
+    test_topic_wildcards()
+    test_publish_subscribe_and_retain()
+    test_will_is_sent_on_abrupt_disconnect()
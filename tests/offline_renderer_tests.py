@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from exhibit.shared.video import VideoEncoder
+from exhibit.visualization.offline_renderer import NetworkRasterizer, render_activation_video, hex_to_bgr
+from exhibit.visualization.render_utils import WEIGHT_COLOR_ACTIVE
+
+"""
+These tests render a small synthetic network headlessly and check the encoded video.
+"""
+
+STATE_SHAPE = (8, 10)
+HIDDEN = 100  # enough neurons to keep them small, like the 200 of the real model
+
+
+def make_weights():
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(80, HIDDEN)), rng.normal(size=HIDDEN), rng.normal(size=(HIDDEN, 3)), rng.normal(size=3)]
+
+
+def make_packets(count):
+    rng = np.random.default_rng(1)
+    packets = []
+    for i in range(count):
+        state = np.zeros(80)
+        state[rng.choice(80, 10, replace=False)] = 1
+        packets.append({"state": state, "hidden": np.maximum(rng.normal(size=HIDDEN), 0), "output": np.array([0.2, 0.7, 0.1])})
+    return packets
+
+
+def test_firing_edges_are_drawn():
+    rasterizer = NetworkRasterizer(make_weights(), STATE_SHAPE, scale=0.5)
+    quiet = rasterizer.render(np.zeros(STATE_SHAPE), np.zeros(STATE_SHAPE), [0.5, 0.5, 0], np.zeros(HIDDEN)).copy()
+    state = np.zeros(STATE_SHAPE)
+    state.flat[rasterizer.hw_significance.edges[0, 0]] = 1
+    busy = rasterizer.render(state, state, [0.5, 0.5, 0], np.zeros(HIDDEN))
+    color = hex_to_bgr(WEIGHT_COLOR_ACTIVE)
+    assert not np.any(np.all(quiet == color, axis=2))
+    assert np.count_nonzero(np.all(busy == color, axis=2)) > 10
+
+
+def test_video_is_encoded():
+    path = os.path.join(tempfile.mkdtemp(), "network.avi")
+    assert render_activation_video(make_weights(), make_packets(12), path, scale=0.25, state_shape=STATE_SHAPE) == 12
+    video = cv2.VideoCapture(path)
+    frames = 0
+    while video.read()[0]:
+        frames += 1
+    assert frames == 12
+
+
+def test_encoder_accepts_game_states():
+    path = os.path.join(tempfile.mkdtemp(), "states.avi")
+    with VideoEncoder(path, fps=10) as encoder:
+        for i in range(5):
+            encoder.write(np.eye(16, dtype=np.uint8))
+    ok, frame = cv2.VideoCapture(path).read()
+    assert ok and frame.shape == (16, 16, 3) and frame[0, 0, 0] > 200
+
+
+def test_failed_encoder_raises_instead_of_blocking():
+    # The encoder can't open a file in a directory that doesn't exist
+    path = os.path.join(tempfile.mkdtemp(), "missing", "states.avi")
+    encoder = VideoEncoder(path, fps=10, max_pending=2)
+    try:
+        for i in range(100):
+            encoder.write(np.eye(16, dtype=np.uint8))
+        encoder.close()
+    except RuntimeError as error:
+        assert "could not open" in str(error)
+    else:
+        assert False, "the encoder failure was not reported"
+
+
+if __name__ == "__main__":
+    test_firing_edges_are_drawn()
+    test_video_is_encoded()
+    test_encoder_accepts_game_states()
+    test_failed_encoder_raises_instead_of_blocking()
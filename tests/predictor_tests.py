@@ -0,0 +1,66 @@
+from exhibit.ai.predictor import StatePredictor
+from exhibit.shared.config import Config
+
+"""
+These tests check the ball extrapolation the AI uses to react to where the ball will be when its action lands.
+"""
+
+
+def observe(predictor, positions):
+    for x, y in positions:
+        predictor.observe_ball(x, y)
+
+
+def test_ball_reflects_off_wall():
+    predictor = StatePredictor(Config())
+    observe(predictor, [(186, 50), (188, 52), (190, 54)])
+    # Reaches the right edge (192) on the second frame and comes back
+    assert predictor.predict_ball(5) == (186, 64)
+
+
+def test_prediction_stops_at_paddle_line():
+    config = Config()
+    predictor = StatePredictor(config)
+    observe(predictor, [(50, 20), (50, 18), (50, 16)])
+    x, y = predictor.predict_ball(20)
+    assert x == 50
+    assert config.TOP_PADDLE_Y - 2 < y <= config.TOP_PADDLE_Y
+
+
+def test_serve_jump_resets_history():
+    predictor = StatePredictor(Config())
+    observe(predictor, [(50, 50), (52, 52), (150, 100)])
+    assert len(predictor.positions) == 1
+    assert predictor.velocity() == (0, 0)
+    assert predictor.predict_ball(5) == (150, 100)
+
+
+def test_horizon():
+    config = Config()
+    config.AI_FRAME_DELAY, config.AI_FRAME_INTERVAL, config.GAME_FPS = 1, 5, 60
+    predictor = StatePredictor(config, smoothing=1)
+    assert predictor.horizon() == 5  # Scheduled delay until a round trip is measured
+    predictor.observe_round_trip(0.2)
+    assert predictor.horizon() == 12  # Late replies land when they arrive
+    predictor.observe_round_trip(0.01)
+    assert predictor.horizon() == 5  # Early replies wait for the scheduled frame
+    config.AI_JITTER_BUFFER = False
+    assert predictor.horizon() == 1  # Without the buffer, actions land when they arrive
+
+
+def test_frames_since_request_count_against_horizon():
+    config = Config()
+    predictor = StatePredictor(config)
+    observe(predictor, [(50, 60), (51, 62)])
+    predictor.observe_request()
+    observe(predictor, [(52, 64), (53, 66)])
+    assert predictor.elapsed() == 2
+    assert predictor.predict_ball() == predictor.predict_ball(predictor.horizon() - 2)
+
+
+if __name__ == "__main__":
+    test_ball_reflects_off_wall()
+    test_prediction_stops_at_paddle_line()
+    test_serve_jump_resets_history()
+    test_horizon()
+    test_frames_since_request_count_against_horizon()
@@ -0,0 +1,42 @@
+import numpy as np
+
+from exhibit.camera.presence import PresenceDetector, PRESENT, STILL, LEFT
+
+"""
+These tests check the presence detector's events and hysteresis.
+"""
+
+
+def run(detector, frames):
+    events = []
+    for pixels, position in frames:
+        events.extend(detector.update(pixels, position))
+    return events
+
+
+def test_still_player_is_detected_once():
+    detector = PresenceDetector(window=30)
+    rng = np.random.default_rng(0)
+    events = run(detector, [(500, 0.5 + rng.normal(0, 0.01)) for i in range(40)])
+    assert events == [PRESENT, STILL]
+    assert detector.present and detector.still
+
+
+def test_walking_player_is_never_still():
+    detector = PresenceDetector(window=30)
+    events = run(detector, [(500, i / 60) for i in range(60)])
+    assert events == [PRESENT]
+
+
+def test_single_frame_dropouts_do_not_end_presence():
+    detector = PresenceDetector(leave_frames=5)
+    run(detector, [(500, 0.5)] * 10)
+    assert run(detector, [(0, None), (500, 0.5), (0, None)]) == []
+    assert run(detector, [(0, None)] * 5) == [LEFT]
+    assert not detector.present
+
+
+if __name__ == "__main__":
+    test_still_player_is_detected_once()
+    test_walking_player_is_never_still()
+    test_single_frame_dropouts_do_not_end_presence()
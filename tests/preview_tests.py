@@ -0,0 +1,54 @@
+import time
+
+import cv2
+import numpy as np
+
+from exhibit.camera.preview import DepthPreviewRenderer, DepthPreviewWorker
+
+"""
+These tests check that the depth preview looks the same as before and is produced off the tracking thread.
+"""
+
+
+class FakePublisher:
+    def __init__(self):
+        self.offered = []
+
+    def active(self):
+        return True
+
+    def due(self):
+        return not self.offered
+
+    def offer(self, image_id, image):
+        self.offered.append((image_id, image.copy()))
+
+
+def test_renderer_matches_original_preview():
+    depth = np.random.default_rng(0).integers(0, 5000, (80, 106)).astype(np.uint16)
+    clipping_distance, column = 1600, 50.5
+    # The colorizing steps that used to run inside Pong.get_human_x
+    stacked = np.dstack((depth, depth, depth))
+    expected = cv2.applyColorMap(cv2.convertScaleAbs(stacked, alpha=0.03), cv2.COLORMAP_RAINBOW)
+    expected = np.where((stacked < clipping_distance) & (stacked > 0.1), expected, 40).astype(np.uint8)
+    expected = cv2.line(expected, (int(column), 80), (int(column), 0), (255, 255, 255), 1)
+    assert np.array_equal(DepthPreviewRenderer().render(depth, clipping_distance, column), expected)
+
+
+def test_worker_renders_in_background_at_preview_rate():
+    publisher = FakePublisher()
+    worker = DepthPreviewWorker(publisher)
+    worker.start()
+    depth = np.full((80, 106), 1000, dtype=np.uint16)
+    for i in range(10):
+        worker.submit(depth, 1600, 40)
+        time.sleep(0.01)
+    worker.stop()
+    # FakePublisher is only due once, so later submissions are skipped without being copied or rendered
+    assert len(publisher.offered) == 1
+    assert publisher.offered[0][1].shape == (80, 106, 3)
+
+
+if __name__ == "__main__":
+    test_renderer_matches_original_preview()
+    test_worker_renders_in_background_at_preview_rate()
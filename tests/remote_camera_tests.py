@@ -0,0 +1,47 @@
+import time
+
+from exhibit.camera.capture import LatestValue
+from exhibit.game.remote_camera import RemoteCamera
+
+"""
+These tests check that the level state machine reads the camera service's cached presence state.
+"""
+
+
+class FakeSubscriber:
+    def __init__(self):
+        self.camera_presence = None
+        self.camera_position = LatestValue()
+
+
+def test_checks_follow_presence_state():
+    subscriber = FakeSubscriber()
+    subscriber.camera_position.put({"present": True})
+    camera = RemoteCamera(subscriber, still_timeout=0.05)
+    assert not camera.check_for_player()
+    subscriber.camera_presence = {"present": True, "still": False}
+    assert camera.check_for_player()
+    # Present but never still within the timeout
+    assert not camera.check_for_still_player()
+    subscriber.camera_presence = {"present": True, "still": True}
+    assert camera.check_for_still_player()
+
+
+def test_retained_presence_needs_live_positions():
+    subscriber = FakeSubscriber()
+    camera = RemoteCamera(subscriber, still_timeout=0.05, max_age=0.02)
+    # The retained state of a camera service that isn't tracking
+    subscriber.camera_presence = {"present": True, "still": True}
+    assert not camera.check_for_player()
+    subscriber.camera_position.put({"present": True})
+    assert camera.check_for_player()
+    assert camera.check_for_still_player()
+    # The service stopped publishing positions
+    time.sleep(0.03)
+    assert not camera.check_for_player()
+    assert not camera.check_for_still_player()
+
+
+if __name__ == "__main__":
+    test_checks_follow_presence_state()
+    test_retained_presence_needs_live_positions()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from exhibit.visualization.render_utils import ItemTable, SignificantEdges, layer_positions, is_significant, is_weight_active
+
+"""
+These tests check the vectorized weight masks and that retained canvas items are only reconfigured when their values
+change.
+"""
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.configured = []
+
+    def itemconfig(self, item, options):
+        self.configured.append((item, options))
+
+
+def test_only_changed_items_are_reconfigured():
+    canvas = RecordingCanvas()
+    table = ItemTable(canvas, [11, 12, 13], fill=np.full(3, "#000000"))
+    assert table.update("fill", ["#000000", "#DD2222", "#000000"]) == 1
+    assert canvas.configured == [(12, {"fill": "#DD2222"})]
+    # nothing changed, nothing sent
+    assert table.update("fill", ["#000000", "#DD2222", "#000000"]) == 0
+    assert len(canvas.configured) == 1
+
+
+def test_layer_positions_are_evenly_spaced():
+    positions = layer_positions(4, 0, 100, 50, 10)
+    ys = [y for x, y in positions]
+    assert all(x == 50 for x, y in positions)
+    assert np.allclose(np.diff(ys), 22)
+    assert np.isclose(ys[0] - 5, 100 - (ys[-1] + 5))
+
+
+def test_masks_match_loop_versions():
+    rng = np.random.default_rng(0)
+    w = rng.normal(size=(7680, 200))
+    firing = rng.random(7680) > 0.9
+    # the original loops
+    expected_active = np.zeros_like(w)
+    for i in range(len(firing)):
+        if firing[i]: expected_active[i] = 1
+    top = np.dstack(np.unravel_index(np.argpartition(w.ravel(), -1536)[-1536:], w.shape)).squeeze()[:1536]
+    expected_significant = np.zeros_like(w)
+    for l1, l2 in top:
+        expected_significant[l1, l2] = 1
+    assert np.array_equal(is_weight_active(w, firing), expected_active.astype(bool))
+    assert np.array_equal(is_significant(w, 0.2), expected_significant.astype(bool))
+
+
+def test_significant_edges_follow_weights():
+    rng = np.random.default_rng(1)
+    w = rng.normal(size=(50, 4))
+    edges = SignificantEdges(w, 0.2)
+    assert len(edges.edges) == 10
+    assert np.array_equal(edges.mask, is_significant(w, 0.2))
+    firing = np.zeros(50, dtype=bool)
+    firing[edges.edges[0, 0]] = True
+    active = edges.active_edges(firing)
+    assert len(active) > 0 and np.all(active[:, 0] == edges.edges[0, 0])
+    # Other weights of the same shape get their own edges
+    assert np.array_equal(SignificantEdges(-w, 0.2).mask, is_significant(-w, 0.2))
+
+
+if __name__ == "__main__":
+    test_masks_match_loop_versions()
+    test_significant_edges_follow_weights()
+    test_only_changed_items_are_reconfigured()
+    test_layer_positions_are_evenly_spaced()
@@ -0,0 +1,46 @@
+import time
+
+from exhibit.shared.clock import WarpClock, WallClock, make_clock
+from exhibit.shared.latency import SaturationMonitor
+from exhibit.game.soak import summarize
+
+"""
+These tests check the virtual game clock and the saturation bookkeeping used by soak runs.
+"""
+
+
+def test_warp_clock_runs_faster():
+    clock = WarpClock(20)
+    start_real = time.perf_counter()
+    start = clock.time()
+    clock.sleep(1.0)  # one game second
+    assert time.perf_counter() - start_real < 0.5
+    assert clock.time() - start >= 0.95
+    assert clock.real_seconds(1.0) == 0.05
+    assert type(make_clock(1)) == WallClock and type(make_clock(4)) == WarpClock
+
+
+def test_saturation_needs_a_sustained_backlog():
+    monitor = SaturationMonitor(window=10, threshold=0.5)
+    for frame in range(100):
+        # the game misses an occasional frame, the AI falls behind for good from frame 40
+        monitor.observe("game", frame % 20 == 0, frame)
+        monitor.observe("ai", frame >= 40, frame)
+    assert monitor.first_saturated() == "ai"
+    assert monitor.saturated_at["ai"][0] == 45
+    assert "game" not in monitor.saturated_at
+    assert "ai saturated first" in monitor.report()
+
+
+def test_summary_ranks_first_saturated():
+    run = {"frames": 600, "real_seconds": 2.0, "game_seconds": 10.0, "first_saturated": "mqtt",
+           "saturation": {"mqtt": {"reports": 100, "behind": 80, "saturated_at": (300, 5.0)}}}
+    text = summarize([run, dict(run, first_saturated=None)])
+    assert "mqtt (1 levels)" in text
+    assert "1200 frames" in text
+
+
+if __name__ == "__main__":
+    test_warp_clock_runs_faster()
+    test_saturation_needs_a_sustained_backlog()
+    test_summary_ranks_first_saturated()
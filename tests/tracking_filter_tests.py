@@ -0,0 +1,53 @@
+import numpy as np
+
+from exhibit.camera.tracking_filter import PlayerTrackingFilter
+
+"""
+These tests check that the player tracking filter lags less and jitters less than the raw camera positions.
+"""
+
+
+def simulate(player, camera_fps=30, game_fps=60, latency=0.045, seconds=20, seed=0):
+    rng = np.random.default_rng(seed)
+    tracking = PlayerTrackingFilter()
+    raw_errors, filtered_errors, raw_positions, filtered_positions = [], [], [], []
+    last_frame = None
+    raw = None
+    for tick in range(int(latency * game_fps) + 1, seconds * game_fps):
+        now = tick / game_fps
+        frame = int((now - latency) * camera_fps)
+        if frame != last_frame:
+            captured = frame / camera_fps
+            raw = player(captured) + rng.normal(0, 0.015)
+            tracking.update(raw, captured + latency)
+            last_frame = frame
+        filtered = tracking.predict(now)
+        raw_errors.append(raw - player(now))
+        filtered_errors.append(filtered - player(now))
+        raw_positions.append(raw)
+        filtered_positions.append(filtered)
+    rms = lambda errors: np.sqrt(np.mean(np.square(errors)))
+    jitter = lambda positions: np.std(np.diff(positions, n=2))
+    return rms(raw_errors), rms(filtered_errors), jitter(raw_positions), jitter(filtered_positions)
+
+
+def test_filter_is_closer_and_smoother_than_raw():
+    raw_error, filtered_error, raw_jitter, filtered_jitter = simulate(lambda t: 0.5 + 0.35 * np.sin(2 * np.pi * t / 3))
+    assert filtered_error < raw_error
+    assert filtered_jitter < raw_jitter / 2
+
+
+def test_single_frame_glitch_is_ignored_but_real_jump_is_followed():
+    tracking = PlayerTrackingFilter(max_outliers=2)
+    for i in range(10):
+        tracking.update(0.3, i / 30)
+    tracking.update(0.9, 10 / 30)
+    assert abs(tracking.predict(10 / 30) - 0.3) < 0.01
+    tracking.update(0.9, 11 / 30)
+    tracking.update(0.9, 12 / 30)
+    assert tracking.predict(12 / 30) == 0.9
+
+
+if __name__ == "__main__":
+    test_filter_is_closer_and_smoother_than_raw()
+    test_single_frame_glitch_is_ignored_but_real_jump_is_followed()
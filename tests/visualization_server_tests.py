@@ -0,0 +1,74 @@
+import gzip
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from exhibit.visualization.visualization_driver import VisualizerServer, Handler
+
+"""
+These tests run the visualizer file server on a scratch directory and check compression and caching headers.
+"""
+
+
+def serve(directory):
+    server = VisualizerServer(("127.0.0.1", 0), lambda *args, **kwargs: Handler(*args, directory=directory, **kwargs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def get(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as ex:
+        return ex.code, ex.headers, b""
+
+
+def make_site():
+    directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(directory, "models"))
+    os.makedirs(os.path.join(directory, "vendor"))
+    model = ("var easy_model = [" + ",".join(["0.125"] * 20000) + "];").encode()
+    with open(os.path.join(directory, "models", "easy.js"), "wb") as f:
+        f.write(model)
+    with open(os.path.join(directory, "vendor", "lib.js"), "wb") as f:
+        f.write(b"// vendored\n" * 200)
+    return directory, model
+
+
+def test_serves_gzip_variant_and_revalidates():
+    directory, model = make_site()
+    server, url = serve(directory)
+    try:
+        status, headers, body = get(url + "/models/easy.js", **{"Accept-Encoding": "gzip"})
+        assert status == 200 and headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(body) == model and len(body) < len(model) / 10
+        assert os.path.exists(os.path.join(directory, "models", "easy.js.gz"))
+        status, headers, body = get(url + "/models/easy.js", **{"Accept-Encoding": "gzip", "If-None-Match": headers["ETag"]})
+        assert status == 304 and body == b""
+        # clients that can't decompress get the original
+        status, headers, body = get(url + "/models/easy.js")
+        assert status == 200 and "Content-Encoding" not in headers and body == model
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_vendor_assets_are_cached_long():
+    directory, model = make_site()
+    server, url = serve(directory)
+    try:
+        status, headers, body = get(url + "/vendor/lib.js")
+        assert status == 200 and "immutable" in headers["Cache-Control"]
+        status, headers, body = get(url + "/models/easy.js")
+        assert headers["Cache-Control"] == "no-cache" and headers["Last-Modified"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    test_serves_gzip_variant_and_revalidates()
+    test_vendor_assets_are_cached_long()
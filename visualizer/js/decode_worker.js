@@ -0,0 +1,47 @@
+/*
+Web Worker that decodes the visualizer's MQTT payloads off the UI thread.
+
+Messages in:  {type: "activation", payload}  JSON string or binary packet bytes from ai/activation
+              {type: "depth", payload}       raw JPEG bytes or the JSON {"feed": base64} message from depth/feed
+Messages out: {type: "activation", packet}   see decode_activation_message in packets.js
+              {type: "depth", bitmap}        decoded ImageBitmap, ready to draw
+              {type: "depth", bytes}         JPEG bytes, if this browser can't decode images in a worker
+              {type: "error", source, error}
+All arrays and bitmaps are transferred, not copied.
+*/
+importScripts("packets.js");
+
+function activation_transfers(packet) {
+    return [packet.state.buffer, packet.firing.buffer, packet.hidden.buffer, packet.output.buffer, packet.image.buffer];
+}
+
+function depth_bytes(payload) {
+    if (typeof(payload) !== "string") return payload;
+    const feed = atob(JSON.parse(payload)["feed"]);
+    const bytes = new Uint8Array(feed.length);
+    for (let i = 0; i < feed.length; i++) {
+        bytes[i] = feed.charCodeAt(i);
+    }
+    return bytes;
+}
+
+onmessage = function(event) {
+    const message = event.data;
+    try {
+        if (message.type === "activation") {
+            const packet = decode_activation_message(message.payload);
+            postMessage({type: "activation", packet: packet}, activation_transfers(packet));
+        } else if (message.type === "depth") {
+            const bytes = depth_bytes(message.payload);
+            if (typeof(createImageBitmap) === "undefined") {
+                postMessage({type: "depth", bytes: bytes}, [bytes.buffer]);
+                return;
+            }
+            createImageBitmap(new Blob([bytes], {type: "image/jpeg"}))
+                .then(bitmap => postMessage({type: "depth", bitmap: bitmap}, [bitmap]))
+                .catch(error => postMessage({type: "error", source: "depth", error: String(error)}));
+        }
+    } catch (error) {
+        postMessage({type: "error", source: message.type, error: String(error)});
+    }
+};
@@ -0,0 +1,95 @@
+/*
+Decoder for the packed per-level models written by exhibit/visualization/model_export.py
+(scripts/export_visualizer_models.py). See that file for the layout.
+*/
+const MODEL_PACK_MAGIC = "PVM";
+const MODEL_PACK_VERSION = 1;
+
+// float16 bit pattern -> value, built on first use
+var float16_table = null;
+
+function build_float16_table() {
+    float16_table = new Float32Array(65536);
+    for (let bits = 0; bits < 65536; bits++) {
+        const sign = (bits & 0x8000) ? -1 : 1;
+        const exponent = (bits >> 10) & 0x1f;
+        const fraction = bits & 0x03ff;
+        if (exponent === 0) {
+            float16_table[bits] = sign * Math.pow(2, -14) * (fraction / 1024);
+        } else if (exponent === 0x1f) {
+            float16_table[bits] = fraction ? NaN : sign * Infinity;
+        } else {
+            float16_table[bits] = sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+        }
+    }
+}
+
+function decode_float16(halves) {
+    if (float16_table === null) build_float16_table();
+    const values = new Float32Array(halves.length);
+    for (let i = 0; i < halves.length; i++) {
+        values[i] = float16_table[halves[i]];
+    }
+    return values;
+}
+
+function to_rows(values, shape) {
+    // Nested arrays, for the 2D helpers in render_utils.js
+    const rows = [];
+    for (let i = 0; i < shape[0]; i++) {
+        rows.push(Array.from(values.subarray(i * shape[1], (i + 1) * shape[1])));
+    }
+    return rows;
+}
+
+function decode_model_pack(buffer) {
+    /*
+    buffer: ArrayBuffer of a model pack
+    returns: {manifest, hidden_biases, output_biases, output_weights, hidden_edges, output_edges, hidden_weight_maps,
+              hidden_weights()} where edges are {inputs, outputs, widths} typed arrays in drawing order
+    */
+    const bytes = new Uint8Array(buffer);
+    const magic = String.fromCharCode(bytes[0], bytes[1], bytes[2]);
+    if (magic !== MODEL_PACK_MAGIC || bytes[3] !== MODEL_PACK_VERSION) {
+        throw "Unsupported model pack " + magic + " v" + bytes[3];
+    }
+    const manifest_length = new DataView(buffer).getUint32(4, true);
+    const manifest = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + manifest_length)));
+
+    const section = (name) => {
+        const entry = manifest.sections[name];
+        const count = entry.shape.reduce((a, b) => a * b, 1);
+        switch (entry.dtype) {
+            case "float16": return decode_float16(new Uint16Array(buffer, entry.offset, count));
+            case "uint16": return new Uint16Array(buffer, entry.offset, count);
+            case "uint8": return new Uint8Array(buffer, entry.offset, count);
+        }
+        throw "Unknown model pack dtype " + entry.dtype;
+    };
+    const edges = (prefix) => ({
+        inputs: section(prefix + "_edge_inputs"),
+        outputs: section(prefix + "_edge_outputs"),
+        widths: section(prefix + "_edge_widths"),
+    });
+
+    return {
+        manifest: manifest,
+        hidden_biases: Array.from(section("hidden_biases")),
+        output_biases: Array.from(section("output_biases")),
+        output_weights: to_rows(section("output_weights"), manifest.sections["output_weights"].shape),
+        hidden_edges: edges("hidden"),
+        output_edges: edges("output"),
+        hidden_weight_maps: section("hidden_weight_maps"),
+        // The full first layer isn't needed for drawing, so it is only decoded if asked for
+        hidden_weights: () => to_rows(section("hidden_weights"), manifest.sections["hidden_weights"].shape),
+    };
+}
+
+function load_model_pack(url) {
+    return fetch(url)
+        .then(response => {
+            if (!response.ok) throw "HTTP " + response.status;
+            return response.arrayBuffer();
+        })
+        .then(decode_model_pack);
+}
@@ -0,0 +1,115 @@
+/*
+Decoder for the compact binary ai/activation packets.
+See exhibit/shared/activation_packet.py for the layout: a 20 byte little endian header, then the
+sparse signed input indices, then uint8 quantized hidden and output activations.
+*/
+const ACTIVATION_MAGIC = [0x50, 0x41]; // "PA"
+const ACTIVATION_VERSION = 1;
+const ACTIVATION_HEADER_SIZE = 20;
+const ACTIVATION_SIGN_BIT = 0x8000;
+
+function is_activation_packet(bytes) {
+    // JSON packets start with "[", binary ones with the magic bytes
+    return bytes.length >= ACTIVATION_HEADER_SIZE && bytes[0] === ACTIVATION_MAGIC[0] && bytes[1] === ACTIVATION_MAGIC[1];
+}
+
+function decode_activation_packet(bytes) {
+    /*
+    Unpack a binary packet into the same [state, hidden, output] arrays the JSON packet carried
+    bytes: Uint8Array payload
+    returns: {frame, level, state, hidden, output}
+    */
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    const version = view.getUint8(2);
+    if (version !== ACTIVATION_VERSION) {
+        throw "Unsupported activation packet version " + version;
+    }
+    const level = view.getUint8(3);
+    const frame = view.getUint32(4, true);
+    const size = view.getUint16(8, true);
+    const nonzero = view.getUint16(10, true);
+    const hidden_size = view.getUint16(12, true);
+    const output_size = view.getUint16(14, true);
+    const scale = view.getFloat32(16, true);
+
+    let offset = ACTIVATION_HEADER_SIZE;
+    const state = new Array(size).fill(0);
+    for (let i = 0; i < nonzero; i++) {
+        const packed = view.getUint16(offset, true);
+        offset += 2;
+        state[packed & ~ACTIVATION_SIGN_BIT] = (packed & ACTIVATION_SIGN_BIT) ? -1 : 1;
+    }
+
+    const hidden = new Array(hidden_size);
+    const hidden_step = scale / 255;
+    for (let i = 0; i < hidden_size; i++) {
+        hidden[i] = bytes[offset + i] * hidden_step;
+    }
+    offset += hidden_size;
+
+    const output = new Array(output_size);
+    for (let i = 0; i < output_size; i++) {
+        output[i] = bytes[offset + i] / 255;
+    }
+
+    return {frame: frame, level: level, state: state, hidden: hidden, output: output};
+}
+
+function decode_activations(payload) {
+    /*
+    Accept either packet format from ai/activation
+    payload: JSON string or binary Uint8Array
+    returns: [state, hidden, output]
+    */
+    if (typeof(payload) === "string") {
+        return JSON.parse(payload);
+    }
+    const packet = decode_activation_packet(payload);
+    last_activation_frame = packet.frame;
+    return [packet.state, packet.hidden, packet.output];
+}
+
+// Frame id of the most recently decoded binary packet (JSON packets don't carry one)
+var last_activation_frame = null;
+
+const FIRING_THRESHOLD = 0.01; // Same as is_firing in render_utils.js
+const GAME_FRAME_BASE = 200; // Gray level of an unchanged pixel in the rendered game frame
+
+function game_frame_rgba(state, rgba) {
+    /*
+    Fill an RGBA image of the model input the way render_game draws it: 200 - 255 * pixel, as gray
+    state: model input values (-1, 0 or 1)
+    rgba: Uint8ClampedArray of 4 * state.length bytes
+    */
+    for (let i = 0; i < state.length; i++) {
+        const value = GAME_FRAME_BASE - 255 * state[i];
+        const idx = i * 4;
+        rgba[idx] = value;
+        rgba[idx + 1] = value;
+        rgba[idx + 2] = value;
+        rgba[idx + 3] = 255;
+    }
+    return rgba;
+}
+
+function decode_activation_message(payload) {
+    /*
+    Everything a frame needs from an ai/activation message, as typed arrays that can be transferred from a worker
+    payload: JSON string or binary Uint8Array
+    returns: {frame, state, firing, hidden, output, image} where firing flags the input pixels that changed and image
+             is the RGBA game frame
+    */
+    const [state, hidden, output] = decode_activations(payload);
+    const firing = new Uint8Array(state.length);
+    for (let i = 0; i < state.length; i++) {
+        firing[i] = state[i] >= FIRING_THRESHOLD ? 1 : 0;
+    }
+    return {
+        frame: typeof(payload) === "string" ? null : last_activation_frame,
+        state: Float32Array.from(state),
+        firing: firing,
+        hidden: Float32Array.from(hidden),
+        output: Float32Array.from(output),
+        image: game_frame_rgba(state, new Uint8ClampedArray(state.length * 4)),
+    };
+}
@@ -359,10 +359,14 @@ function render_info(canvas, index, main_text, additional_text, info_step) {
     }
 }
 
-function render_layer(canvas, neurons, left_x, right_x, y, neuron_size, activations=null, labels=null, activation_intensities=null) {
+function neuron_scales(neurons) {
     // Scale and normalize biases around 1 to represent useful node scale factors (ranging from ~0.3 - ~1.7)
     neurons = abs(scale(neurons, 10));
-    neurons = add(neurons, 1); // Ensure no neurons are zero-sized
+    return add(neurons, 1); // Ensure no neurons are zero-sized
+}
+
+function render_layer(canvas, neurons, left_x, right_x, y, neuron_size, activations=null, labels=null, activation_intensities=null) {
+    neurons = neuron_scales(neurons);
     coordinates = [];
 
 
@@ -400,6 +404,27 @@ function render_layer(canvas, neurons, left_x, right_x, y, neuron_size, activati
     return coordinates
 }
 
+function render_layer_activity(canvas, scales, positions, neuron_size, activations=null, activation_intensities=null, spread=false) {
+    /*
+    Draw the per-frame state of a layer over the inactive layer render_layer drew once
+    scales: neuron scale factors from neuron_scales
+    positions: coordinates returned by render_layer
+    activations: only the neurons that fire are drawn, in NEURON_COLOR_ACTIVE
+    activation_intensities: every neuron is drawn, colored by get_intensity
+    spread: apply the hidden layer's vertical spread
+    */
+    if (neuron_size <= 0) {neuron_size = 0.72}
+    for (let i = 0; i < positions.length; i++) {
+        let fill = null;
+        if (activation_intensities) fill = get_intensity(activation_intensities[i]);
+        if (activations && activations[i]) fill = NEURON_COLOR_ACTIVE;
+        if (fill === null) continue;
+        const [x, y] = positions[i];
+        const y_pos = spread ? y + (Math.sin(x/canvas_width*SPREAD_VALUE)*VERTICAL_SPREAD) : y;
+        create_circle(x, y_pos, (neuron_size / 2) * scales[i] * 2.5, canvas, fill);
+    }
+}
+
 // Rescale data so that it is in pixel-friendly magnitude
 function render_rescale(data, magnitude=2) {
     biggest = max(data)
@@ -470,10 +495,47 @@ function is_significant(w, threshold=0.2) {
 }
 
 
+function draw_weight_line(canvas, l1_pos, l2_pos, weight, l2, value1, active) {
+    /*
+    Draw one weight in the style of its layer
+    value1: 1 for image -> hidden (l2 spread), 2 for hidden -> output (l1 spread), 3 for hidden -> hidden (both)
+    */
+    weight = Math.abs(weight)
+    let fill = WEIGHT_COLOR
+    switch (value1) {
+        case 1: // l2 spread
+            if (active) fill = WEIGHT_COLOR_ACTIVE
+            canvas.lineWidth = weight*1.2;
+            canvas.strokeStyle = fill;
+            canvas.beginPath();
+            canvas.moveTo(l1_pos[0], l1_pos[1]); // + (Math.sin(l1_pos[0] * 4) * 40));
+            canvas.lineTo(l2_pos[0], l2_pos[1] + (Math.sin(l2_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
+            break;
+        case 2: // l1 spread
+            if (active) fill = WEIGHT_COLOR_ACTIVE
+            canvas.lineWidth = weight*1.5;
+            if (l2 !== labelChosen) {canvas.lineWidth = canvas.lineWidth/8; fill = UNCHOSEN_OUT_WEIGHT_COLOR;}
+            canvas.strokeStyle = fill;
+            canvas.beginPath();
+            canvas.moveTo(l1_pos[0], l1_pos[1] + (Math.sin(l1_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
+            canvas.lineTo(l2_pos[0], l2_pos[1]); // + (Math.sin(l2_pos[0] * 4) * 40));
+            break;
+        case 3: // l2 and l1 spread
+            if (typeof l1_pos === 'undefined') return;
+            if (active) fill = WEIGHT_COLOR_ACTIVE2
+            canvas.lineWidth = weight * 5;
+            canvas.strokeStyle = fill;
+            canvas.beginPath();
+            canvas.moveTo(l1_pos[0], l1_pos[1] + (Math.sin(l1_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
+            canvas.lineTo(l2_pos[0], l2_pos[1]+ (Math.sin(l2_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
+            break;
+    }
+    canvas.stroke();
+    canvas.lineWidth = 1;
+}
+
 function render_weights(canvas, l1_positions, l2_positions, w, render_filter=null, value1) {
     // Set up filtering
-    let t2 = timer("and")
-
     let should_render = null;
     t = timer("argwhere");
     if(render_filter) {
@@ -482,90 +544,32 @@ function render_weights(canvas, l1_positions, l2_positions, w, render_filter=nul
         console.log("Warning: using poorly optimized unfiltered render_weights. If this is called often, write a faster one.")
         should_render = argwhere(ones_like(w));
     }
-
     t.stop();
 
     t = timer("rendering");
-
-    switch (value1) {
-        case 1: // l2 spread
-            for (let i = 0; i < should_render.length; i++) {
-                const [l1, l2] = should_render[i];
-                l2_pos = l2_positions[l2]
-                l1_pos = l1_positions[l1]
-                let weight = w[l1][l2]
-                let fill = WEIGHT_COLOR
-                weight = abs(weight)
-
-                // Render activation if l1 activation values are supplied
-                if (render_filter) {
-                    active = render_filter[l1, l2]
-                    if (active) fill = WEIGHT_COLOR_ACTIVE
-                }
-                canvas.lineWidth = weight*1.2;
-                canvas.strokeStyle = fill;
-                canvas.beginPath();
-                    canvas.moveTo(l1_pos[0], l1_pos[1]); // + (Math.sin(l1_pos[0] * 4) * 40));
-                    canvas.lineTo(l2_pos[0], l2_pos[1] + (Math.sin(l2_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
-                    canvas.stroke();
-                    canvas.lineWidth = 1;
-            }
-            break;
-        case 2: // l1 spread
-            for (let i = 0; i < should_render.length; i++) {
-                const [l1, l2] = should_render[i];
-                // if (l2 !== labelChosen) {continue;} // only render lines to the chosen action
-                l2_pos = l2_positions[l2]
-                l1_pos = l1_positions[l1]
-                let weight = w[l1][l2]
-                let fill = WEIGHT_COLOR
-                weight = abs(weight)
-
-                // Render activation if l1 activation values are supplied
-                if (render_filter) {
-                    active = render_filter[l1, l2]
-                    if (active) fill = WEIGHT_COLOR_ACTIVE
-                }
-                canvas.lineWidth = weight*1.5;
-                if (l2 !== labelChosen) {canvas.lineWidth = canvas.lineWidth/8; fill = UNCHOSEN_OUT_WEIGHT_COLOR;}
-                canvas.strokeStyle = fill;
-                canvas.beginPath();
-                    canvas.moveTo(l1_pos[0], l1_pos[1] + (Math.sin(l1_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
-                    canvas.lineTo(l2_pos[0], l2_pos[1]); // + (Math.sin(l2_pos[0] * 4) * 40));
-                    canvas.stroke();
-                    canvas.lineWidth = 1;
-            }
-            break;
-        case 3: // l2 and l1 spread
-
-            for (let i = 0; i < should_render.length; i++) {
-                const [l1, l2] = should_render[i];
-
-                l2_pos = l2_positions[l2]
-                l1_pos = l1_positions[l1]
-                let weight = w[l1][l2]
-                let fill = WEIGHT_COLOR
-                weight = abs(weight)
-
-                // Render activation if l1 activation values are supplied
-                if (render_filter) {
-                    active = render_filter[l1, l2]
-                    if (active) fill = WEIGHT_COLOR_ACTIVE2
-                }
-                canvas.lineWidth = weight * 5; 
-                canvas.strokeStyle = fill;
-                canvas.beginPath();
-                if (typeof l1_pos !== 'undefined') {
-                    canvas.moveTo(l1_pos[0], l1_pos[1] + (Math.sin(l1_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
-                    canvas.lineTo(l2_pos[0], l2_pos[1]+ (Math.sin(l2_pos[0]/canvas_width * SPREAD_VALUE) * VERTICAL_SPREAD));
-                    canvas.stroke();
-                    canvas.lineWidth = 1;
-                } else {
-                    //console.log("null l1_pos")
-                }
-            }
-            break;
+    // Everything that passes the filter is drawn as active
+    for (let i = 0; i < should_render.length; i++) {
+        const [l1, l2] = should_render[i];
+        draw_weight_line(canvas, l1_positions[l1], l2_positions[l2], w[l1][l2], l2, value1, render_filter !== null);
     }
+    t.stop();
+}
 
+function render_edges(canvas, l1_positions, l2_positions, edges, l1_activations, value1) {
+    /*
+    Draw the precomputed significant edges whose input is active
+    edges: {inputs, outputs, widths} from a model pack, already in drawing order
+    l1_activations: firing flags or activation values of the input layer; zero/false inputs are skipped
+    */
+    t = timer("rendering");
+    const inputs = edges.inputs;
+    const outputs = edges.outputs;
+    const widths = edges.widths;
+    for (let i = 0; i < inputs.length; i++) {
+        const l1 = inputs[i];
+        if (!l1_activations[l1]) continue;
+        const l2 = outputs[i];
+        draw_weight_line(canvas, l1_positions[l1], l2_positions[l2], widths[i], l2, value1, true);
+    }
     t.stop();
-}
\ No newline at end of file
+}
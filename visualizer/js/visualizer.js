@@ -4,11 +4,40 @@
 function onConnect() {
   // Once a connection has been made, make a subscription and send a message.
   console.log("Connected to MQTT broker");
-  client.subscribe("game/level");
-  client.subscribe("player2/score"); // player 2 is ai
-  client.subscribe("player1/score"); // player 1 is human
-  client.subscribe("ai/activation");
+  client.subscribe(game_topic("game/level"));
+  client.subscribe(game_topic("player2/score")); // player 2 is ai
+  client.subscribe(game_topic("player1/score")); // player 1 is human
+  client.subscribe(game_topic("ai/activation"));
   client.subscribe("depth/feed");
+
+  // Tell the game someone is watching so it produces the depth feed (see DEPTH_FEED_REQUIRE_VISUALIZER)
+  publish_visualizer_status(true);
+  if (!visualizerHeartbeat) {
+    visualizerHeartbeat = setInterval(() => publish_visualizer_status(true), VISUALIZER_HEARTBEAT_MS);
+  }
+}
+
+function game_topic(topic) {
+  return GAME_ID === null ? topic : "games/" + GAME_ID + "/" + topic;
+}
+
+function local_topic(topic) {
+  // Strip this station's namespace, so messages are handled the same with or without one
+  const prefix = game_topic("");
+  return prefix !== "" && topic.startsWith(prefix) ? topic.slice(prefix.length) : topic;
+}
+
+function visualizer_status_message(online) {
+  const message = new Paho.MQTT.Message(JSON.stringify({"online": online}));
+  message.destinationName = "visualizer/status";
+  message.retained = true;
+  return message;
+}
+
+function publish_visualizer_status(online) {
+  if (client.isConnected()) {
+    client.send(visualizer_status_message(online));
+  }
 }
 
 // called when the client loses its connection
@@ -34,11 +63,11 @@ function onConnectionLost(responseObject) {
 //     }
 // }
 function myMethod(message) {
+    const topic = local_topic(message.destinationName);
     //console.log(message.destinationName)
-    if(message.destinationName === "game/level") {
+    if(topic === "game/level") {
         level = JSON.parse(message.payloadString)["level"];
         levelg = level // levelg is global 
-        model_initialized = false;
         //init_model(level);
         //console.log("Changing to level:")
         //console.log(level);
@@ -126,10 +155,11 @@ function myMethod(message) {
                 break;
         }
 
-    } else if(message.destinationName === "ai/activation") {
-        last_activations = message.payloadString;
+    } else if(topic === "ai/activation") {
+        const bytes = message.payloadBytes;
+        decode_in_background("activation", is_activation_packet(bytes) ? bytes : message.payloadString);
         //morphOp("Sad",0.5)
-    } else if(message.destinationName === "player2/score") {
+    } else if(topic === "player2/score") {
         newScore = JSON.parse(message.payloadString)["score"]
         //console.log("score received")
         if (ai_score !== newScore) {
@@ -164,7 +194,7 @@ function myMethod(message) {
                     break;
             }
         }
-    } else if(message.destinationName === "player1/score") {
+    } else if(topic === "player1/score") {
         newScore = JSON.parse(message.payloadString)["score"]
         //console.log("score received")
         if (player_score !== newScore) {
@@ -192,11 +222,12 @@ function myMethod(message) {
                     break;
             }
         }
-    } else if(message.destinationName === "depth/feed") {
+    } else if(topic === "depth/feed") {
         //console.log('received depth image')
-        depthFeedStr = (JSON.parse(message.payloadString)["feed"])
-        //console.log(depthFeedStr)
-        //decoded = atob(rawfeed)
+        const bytes = message.payloadBytes;
+        // Raw JPEG (the JPEG start-of-image marker) or the older base64 JSON message
+        const is_jpeg = bytes.length > 1 && bytes[0] === 0xFF && bytes[1] === 0xD8;
+        decode_in_background("depth", is_jpeg ? bytes : message.payloadString);
 
         
     } 
@@ -261,87 +292,88 @@ function leftZero() {
 }
 
 
-function render_game(ctx, frame, image_upscale = 2) {
+function render_game(ctx, image) {
     // For rendering the image of the Pong game environment
-
-    frame = scale(frame, 255);
-    image_upscale = canvas.width / 225
-    frameCanvas.width = frame_width
-    frameCanvas.height = frame_height
-
-    // Get the canvas
-    const frame_ctx = frameCanvas.getContext("2d");
-    const imageData = frame_ctx.getImageData(0, 0, frame_width, frame_height);
-    const frameData = imageData.data;
-    
-    for(let i = 0; i < frame.length; i++) {
-        idx = i * 4;
-        // convert our -1, 0 and 1 values into a full RGB image
-        frameData[idx] = 200-frame[i]; // Red
-        frameData[idx+1] = 200-frame[i]; // Green
-        frameData[idx+2] = 200-frame[i]; // Blue
-        frameData[idx+3] = 255; // Alpha
+    // image: RGBA pixels of the game frame, built by the decoder (game_frame_rgba)
+    if (frameCanvas.width !== frame_width || frameCanvas.height !== frame_height) {
+        frameCanvas.width = frame_width
+        frameCanvas.height = frame_height
+        frameImageData = null;
     }
+    const frame_ctx = frameCanvas.getContext("2d");
+    if (!frameImageData) frameImageData = frame_ctx.createImageData(frame_width, frame_height);
+    frameImageData.data.set(image);
 
     // Draw the image
-    frame_ctx.putImageData(imageData, 0, 0);
+    frame_ctx.putImageData(frameImageData, 0, 0);
     ctx.drawImage(frameCanvas, img_x, img_y, img_w, img_h); 
 
 }
 function render_depth_feed(ctx, image_upscale = 3.6) {
-    var image = new Image();
-    image.src = 'data:image/jpg;base64,' + depthFeedStr 
-    // We received the image from the depth camera via MQTT
+    // The depth canvas keeps its contents, so it is only redrawn when a new image from the depth camera arrived
+    if (!depthImage || depthImage === drawnDepthImage) return;
+    drawnDepthImage = depthImage;
+    const image = depthImage;
 
-    // You have to use image.onload so that you dont try to use the image before it exists
-    image.onload = function() {
-        // scale image_upscale to fit to the left of the pong screen
-        // the left edge of yellow box / this image width
-        image_upscale = (img_x - (0.1*img_w)) /image.width;
-        ctx.drawImage(image, 0, (img_y + (.5 * img_h)) -( 0.5 * image.height*image_upscale), image.width * image_upscale, image.height * image_upscale)
-
-        // Text of labels that say "YOU" and 'AI INPUT" below the depth image and Pong image
-        ctx.textAlign = "center";
-        ctx.font = FEED_LABELS_FONT;
-        ctx.fillStyle = "#333333"
-        ctx.fillText("^ YOU ^", image.width * image_upscale * 0.5, img_y + (1.1*img_h));
-        ctx.fillText("^ AI INPUT ^", img_x + 0.5*img_w, img_y + (1.1*img_h));
-        ctx.font = "22px monospace";
-        ctx.fillText("^ NEURAL NETWORK - AI 'THINKING' ^", 0.5*canvas_width, img_y - (0.08*img_h));
-        ctx.fillText("^ AI DECISION ^", 0.5*canvas_width, OUTPUT_LAYER_Y * canvas_height * 1.7);
-    }
-    
+    // scale image_upscale to fit to the left of the pong screen
+    // the left edge of yellow box / this image width
+    image_upscale = (img_x - (0.1*img_w)) /image.width;
+    ctx.drawImage(image, 0, (img_y + (.5 * img_h)) -( 0.5 * image.height*image_upscale), image.width * image_upscale, image.height * image_upscale)
 
+    // Text of labels that say "YOU" and 'AI INPUT" below the depth image and Pong image
+    ctx.textAlign = "center";
+    ctx.font = FEED_LABELS_FONT;
+    ctx.fillStyle = "#333333"
+    ctx.fillText("^ YOU ^", image.width * image_upscale * 0.5, img_y + (1.1*img_h));
+    ctx.fillText("^ AI INPUT ^", img_x + 0.5*img_w, img_y + (1.1*img_h));
+    ctx.font = "22px monospace";
+    ctx.fillText("^ NEURAL NETWORK - AI 'THINKING' ^", 0.5*canvas_width, img_y - (0.08*img_h));
+    ctx.fillText("^ AI DECISION ^", 0.5*canvas_width, OUTPUT_LAYER_Y * canvas_height * 1.7);
+}
+
+function set_depth_image(image) {
+    // Release the previous bitmap's memory right away instead of waiting for garbage collection
+    if (depthImage && depthImage !== image && depthImage.close) depthImage.close();
+    depthImage = image;
+}
+
+function load_depth_image(bytes) {
+    // Decode a JPEG on the UI thread, for browsers without worker image decoding
+    const url = URL.createObjectURL(new Blob([bytes], {type: "image/jpeg"}));
+    const image = new Image();
+    image.onload = function() {
+        URL.revokeObjectURL(url);
+        set_depth_image(image);
+    };
+    image.onerror = function() { URL.revokeObjectURL(url); };
+    image.src = url;
 }
 
 function render_weight_image(ctx, hl_activations, image_upscale = 5) {
     // Get the neuron with the strongest activity
     const top_neuron = argmax(hl_activations);
-    console.log('INSIDE RENDER WEIGHT IMAGE')
-    // Select its weight with respect to each input pixel
-    let frame = get_weight_map(hidden_weights, top_neuron)
-    max_weight = max(frame)
-    frame = scale(frame, 127/max_weight);
-    frame = add(frame, 127)
-    //Render game frame
-    const frame_width = 160; // Base state dimension
-    const frame_height = 192; 
-
-    weightImageCanvas.width = frame_width
-    weightImageCanvas.height = frame_height
-
-    const frame_ctx = weightImageCanvas.getContext("2d");
-    const imageData = frame_ctx.getImageData(0, 0, frame_width, frame_height);
-    const frameData = imageData.data;
-    for(let i = 0; i < frame.length; i++) {
-        idx = i * 4;
-        frameData[idx] = frame[i]; // Red
-        frameData[idx+1] = frame[i]; // Green
-        frameData[idx+2] = frame[i]; // Blue
-        frameData[idx+3] = Math.max((frame[i] - 64), 0); // Alpha
-    }
+    if (top_neuron !== weightImageNeuron) {
+        // Select its weight with respect to each input pixel, already scaled to 0-255 by the model export
+        const pixels = frame_width * frame_height;
+        const frame = hidden_weight_maps.subarray(top_neuron * pixels, (top_neuron + 1) * pixels);
+
+        weightImageCanvas.width = frame_width
+        weightImageCanvas.height = frame_height
+
+        const frame_ctx = weightImageCanvas.getContext("2d");
+        const imageData = frame_ctx.createImageData(frame_width, frame_height);
+        const frameData = imageData.data;
+        for(let i = 0; i < frame.length; i++) {
+            idx = i * 4;
+            frameData[idx] = frame[i]; // Red
+            frameData[idx+1] = frame[i]; // Green
+            frameData[idx+2] = frame[i]; // Blue
+            frameData[idx+3] = Math.max((frame[i] - 64), 0); // Alpha
+        }
 
-    frame_ctx.putImageData(imageData, 0, 0);
+        frame_ctx.putImageData(imageData, 0, 0);
+        weightImageNeuron = top_neuron;
+    }
 
     img_w = frame_width * image_upscale;
     img_h = frame_height * image_upscale;
@@ -351,113 +383,109 @@ function render_weight_image(ctx, hl_activations, image_upscale = 5) {
     ctx.drawImage(weightImageCanvas, img_x, img_y, img_w, img_h); 
 }
 
-function render_tick(ctx, render_frame, state_frame, hl_activations, ol_activations, d_ctx) {
+function render_static_layers() {
+    /*
+    Draw everything that only changes with the model, the level or the window size into offscreen canvases,
+    so each frame just copies them and draws the activity on top
+    */
+    backgroundLayer.width = canvas_width;
+    backgroundLayer.height = canvas_height;
+    networkLayer.width = canvas_width;
+    networkLayer.height = canvas_height;
+
+    const bg_ctx = backgroundLayer.getContext("2d");
+    if (levelg == 1) {
+        // Draws a yellow rectangle to highlight the game view camera
+        bg_ctx.beginPath();
+        bg_ctx.strokeStyle = "yellow";
+        bg_ctx.lineWidth = 15;
+        bg_ctx.fillStyle = "yellow";
+        bg_ctx.strokeRect(img_x - (0.05 * img_w), img_y - (0.05 * img_h), 1.1 * img_w, 1.1 * img_h);
+    } else if (levelg == 2) {
+        // Draws a yellow rectangle to highlight the nodes of the neural network
+        bg_ctx.beginPath();
+        bg_ctx.strokeStyle = "yellow";
+        bg_ctx.lineWidth = 15;
+        bg_ctx.strokeRect(0, (img_y - (0.2 * img_h)) - (VERTICAL_SPREAD) - (VERTICAL_SPREAD * 1.1), canvas_width, 2 * VERTICAL_SPREAD * 1.1);
+    } else if (levelg == 3) {
+        // Draws a yellow rectangle to highlight the output of the neural network
+        bg_ctx.beginPath();
+        bg_ctx.strokeStyle = "yellow";
+        bg_ctx.lineWidth = 15;
+        bg_ctx.strokeRect(canvas_width * (1/5), OUTPUT_LAYER_Y * canvas_height /6, canvas_width * (3/5), canvas_height * OUTPUT_LAYER_Y * 1.2);
+    }
+
+    // Render the idle neuron nodes and output labels, saving calculated positions for weight rendering
+    const net_ctx = networkLayer.getContext("2d");
+    hidden_pos = render_layer(net_ctx, render_rescale(hidden_biases, 1), 0,
+        canvas_width, (img_y - (0.2*img_h)) - (VERTICAL_SPREAD), NEURON_SIZE)
+    out_pos = render_layer(net_ctx, render_rescale(output_biases, 1), 0,
+        canvas_width, OUTPUT_LAYER_Y * canvas_height, NEURON_SIZE, null, OUTPUT_LABELS)
+}
+
+function render_tick(ctx, packet, d_ctx) {
+    /*
+    Draw one inference over the cached static layers
+    packet: decoded ai/activation message, see decode_activation_message in packets.js
+    */
+    const hl_activations = packet.hidden;
+    const ol_activations = packet.output;
+
     // Clean slate before redraw
     ctx.clearRect(0, 0, canvas_width, canvas_height); 
 
     // Update rendered probabilities
     percent_prob = scale(ol_activations, 100)
-    up_prob = parseFloat(percent_prob[0]).toFixed(2)+"%"
-    down_prob = parseFloat(percent_prob[1]).toFixed(2)+"%"
-    none_prob = parseFloat(percent_prob[2]).toFixed(2)+"%"
 
     if (percent_prob[0] > percent_prob[1] & percent_prob[0] > percent_prob[2]) {labelChosen = 0}
     else if (percent_prob[1] > percent_prob[2]) {labelChosen = 1}
     else {labelChosen = 2}
 
+    ctx.drawImage(backgroundLayer, 0, 0);
 
-    if (levelg == 1) {
-        // Draws a yellow rectangle to highlight the game view camera
-        ctx.beginPath();
-        ctx.strokeStyle = "yellow";
-        ctx.lineWidth = 15;
-        ctx.fillStyle = "yellow";
-        ctx.strokeRect(img_x - (0.05 * img_w), img_y - (0.05 * img_h), 1.1 * img_w, 1.1 * img_h);
-    } else if (levelg == 2) {
-        // Draws a yellow rectangle to highlight the nodes of the neural network
-        ctx.beginPath();
-        ctx.strokeStyle = "yellow";
-        ctx.lineWidth = 15;
-        ctx.strokeRect(0, (img_y - (0.2 * img_h)) - (VERTICAL_SPREAD) - (VERTICAL_SPREAD * 1.1), canvas_width, 2 * VERTICAL_SPREAD * 1.1);
-    } else if (levelg == 3) {
-        // Draws a yellow rectangle to highlight the output of the neural network
-        ctx.beginPath();
-        ctx.strokeStyle = "yellow";
-        ctx.lineWidth = 15;
-        ctx.strokeRect(canvas_width * (1/5), OUTPUT_LAYER_Y * canvas_height /6, canvas_width * (3/5), canvas_height * OUTPUT_LAYER_Y * 1.2);
-    }
     let t = timer("render_game");
     // Render game frame
-
     render_depth_feed(d_ctx)
-    render_game(ctx, render_frame);
-    t.stop()
-
-    t = timer("render_weight_image");
-    // Render game frame
-    t.stop()
-    /*************************** */
-    // Render image weights
-    t = timer("image_activations");
-    const image_activations = is_firing(state_frame);
-    const hw_activations = is_weight_active(hidden_weights, image_activations, copy(significant_hw));
+    render_game(ctx, packet.image);
     t.stop()
 
+    // The significant weights come precomputed with the model, only the ones whose input fires are drawn
     t = timer("render_hidden_weights");
-    render_weights(ctx, pixel_pos, hidden_pos, rescaled_hw, hw_activations, 1)
+    render_edges(ctx, pixel_pos, hidden_pos, hidden_edges, packet.firing, 1)
     t.stop()
     /******************************************** */
-    // Re-compute hidden activations for rendering
-    t = timer("hl_activations");
-    ow_activations = is_weight_active(output_weights, hl_activations, copy(significant_ow))
-    t.stop()
-
     // Render hidden weights
     t = timer("render_output_weights");
-    render_weights(ctx, hidden_pos, out_pos, render_rescale(output_weights), ow_activations, 2)
+    render_edges(ctx, hidden_pos, out_pos, output_edges, hl_activations, 2)
     t.stop()
     /********************************************* */
-    // Re-compute middle activations for rendering
-    t = timer("il_activations");
-    iw_activations = is_weight_active(hidden_weights, hl_activations, copy(significant_hw))
-    t.stop()
-
     // Render middle weights
     t = timer("render_middle_weights");
-    render_weights(ctx, hidden_pos, hidden_pos, rescaled_hw, iw_activations, 3)
+    render_edges(ctx, hidden_pos, hidden_pos, hidden_edges, hl_activations, 3)
     t.stop()
     /************************************************** */
 
     t = timer("render_layers");
-     // render node circles
-    render_layer(ctx, render_rescale(hidden_biases, 1), 0,
-         canvas_width, (img_y - (0.2*img_h)) - (VERTICAL_SPREAD), NEURON_SIZE, hl_activations)
-    render_layer(ctx, render_rescale(output_biases, 1), 0,
-        canvas_width, OUTPUT_LAYER_Y * canvas_height, NEURON_SIZE, null, OUTPUT_LABELS, ol_activations)
+    // Idle node circles come from the cached layer, only the active ones and the outputs are drawn per frame
+    ctx.drawImage(networkLayer, 0, 0);
+    render_layer_activity(ctx, hidden_scales, hidden_pos, NEURON_SIZE, hl_activations, null, true)
+    render_layer_activity(ctx, output_scales, out_pos, NEURON_SIZE, null, ol_activations)
     t.stop()
-
-    // Create dynamic labels for inference confidence
-    up_pos = out_pos[0]
-    down_pos = out_pos[1]
-    none_pos = out_pos[2]
-    ctx.font = TITLE_FONT;
-    ctx.textAlign = "center";
-    
-    // These lines show the actual probability value of the output.
-    // This was too busy for exhibit and didn't add value.
-    // ctx.fillText(up_prob, up_pos[0], up_pos[1]-40);
-    // ctx.fillText(down_prob, down_pos[0], down_pos[1]-40);
-    // ctx.fillText(none_prob, none_pos[0], none_pos[1]-40);
 }
+
 function render_loop() {
     const info_ctx = infoCanvas.getContext("2d");
-    if (last_activations && last_activations != last_rendered_activations) {
+    if (!decoder && last_activations) {
+        // No worker (e.g. the page was opened from disk), decode on the UI thread
+        latest_packet = decode_activation_message(last_activations);
+        last_activations = null;
+    }
+    if (latest_packet && latest_packet !== last_rendered_packet) {
         const ctx = canvas.getContext("2d");
         const d_ctx = d_canvas.getContext("2d");
 
-        const [state_frame, hl_activations, ol_activations] = JSON.parse(last_activations);
-        render_tick(ctx, state_frame, state_frame, hl_activations, ol_activations, d_ctx);
-        last_rendered_activations = last_activations;
+        render_tick(ctx, latest_packet, d_ctx);
+        last_rendered_packet = latest_packet;
     }
 
     // Slide and fade in the info label for our highlighted section. 
@@ -483,10 +511,7 @@ function render_loop() {
         emptyAnimateFunction(oldOpPos);
     }
     
-    // Break out of render loop if we receive a new model to render
-    if(model_initialized) {
-        requestAnimationFrame(render_loop);
-    }
+    requestAnimationFrame(render_loop);
 }
 
 function init_model(level) {
@@ -499,25 +524,22 @@ function init_model(level) {
         console.log("!initialized")
         init_model(structure);
     } else {
-        const ctx = canvas.getContext("2d");
-        structure = null;
         // Switch between the three models (1 per level)
-        switch(level) {
-            case 1:
-                structure = easy_model;
-                break;
-            case 2:
-                structure = medium_model;
-                break;
-            case 3:
-                structure = hard_model;
-                break;
+        const pack = level_models[level];
+        if (!pack) {
+            // Still downloading, load_models initializes it once it arrives
+            pending_model_level = level;
+            return;
         }
+        pending_model_level = null;
+        current_model_level = level;
         // Parse out the structure
-        hidden_weights = structure[0];
-        hidden_biases = structure[1];
-        output_weights = structure[2];
-        output_biases = structure[3];
+        hidden_biases = pack.hidden_biases;
+        output_weights = pack.output_weights;
+        output_biases = pack.output_biases;
+        hidden_edges = pack.hidden_edges;
+        output_edges = pack.output_edges;
+        hidden_weight_maps = pack.hidden_weight_maps;
 
         // Store image-related rendering measurements
         const pixel_dims = [frame_width, frame_height]
@@ -536,26 +558,113 @@ function init_model(level) {
             }
         }
 
-        rescaled_hw = render_rescale(hidden_weights);
-
-        // Save the "significant" weights: we only render the 2% most important hidden weights and
-        // the 30% most important output weights so the screen doesn't get crowded
-        significant_hw = is_significant(hidden_weights, 0.02);
-        significant_ow = is_significant(output_weights, 0.3)
+        // The model packs only hold the "significant" weights as edges: the 2% most important hidden weights and
+        // the 30% most important output weights, so the screen doesn't get crowded
 
         // Determine appropriate base size for a neuron based on minimum allowable padding for a specific layer
         NEURON_SIZE = (canvas_height - (hidden_biases.length * MIN_PADDING)) / (hidden_biases.length)
         NEURON_SIZE = 0.8;
 
-        // Render neuron nodes, saving calculated positions for weight rendering
-        hidden_pos = render_layer(ctx, render_rescale(hidden_biases, 1), 0,
-            canvas_width, (img_y - (0.2*img_h)) - (VERTICAL_SPREAD), NEURON_SIZE)
-
-        out_pos = render_layer(ctx, render_rescale(output_biases, 1), 0,
-            canvas_width, OUTPUT_LAYER_Y * canvas_height, NEURON_SIZE, null, OUTPUT_LABELS)
+        hidden_scales = neuron_scales(render_rescale(hidden_biases, 1));
+        output_scales = neuron_scales(render_rescale(output_biases, 1));
+        weightImageNeuron = null;
+        render_static_layers();
+        // Draw the current activity with the new model even if no new packet arrives
+        last_rendered_packet = null;
 
         model_initialized = true;
-        requestAnimationFrame(render_loop);
+        if (!render_loop_started) {
+            // render_loop re-queues itself, so there must only ever be one chain of it
+            render_loop_started = true;
+            requestAnimationFrame(render_loop);
+        }
+    }
+}
+
+function start_decoder() {
+    // Decode MQTT payloads in a worker so parsing never delays a frame. Pages opened without the server (file://)
+    // can't start one and decode on the UI thread instead.
+    try {
+        decoder = new Worker("js/decode_worker.js");
+    } catch (error) {
+        console.log("Decoding on the UI thread: " + error);
+        decoder = null;
+        return;
+    }
+    decoder.onmessage = on_decoded;
+    decoder.onerror = function(error) {
+        console.log("Decoder worker failed, decoding on the UI thread: " + error.message);
+        decoder = null;
+    };
+}
+
+function decode_in_background(type, payload) {
+    /*
+    Hand a payload to the decoder. Only one payload of each type is decoded at a time; a newer one replaces any
+    payload still waiting, so a burst of messages can never queue up stale frames.
+    */
+    if (!decoder) {
+        if (type === "activation") {
+            last_activations = payload; // Decoded by render_loop if it is actually rendered
+        } else if (typeof(payload) === "string") {
+            const image = new Image();
+            image.onload = function() { set_depth_image(image); };
+            image.src = 'data:image/jpg;base64,' + JSON.parse(payload)["feed"];
+        } else {
+            load_depth_image(payload);
+        }
+        return;
+    }
+    if (decoding[type]) {
+        waiting_payloads[type] = payload;
+        return;
+    }
+    decoding[type] = true;
+    if (typeof(payload) === "string") {
+        decoder.postMessage({type: type, payload: payload});
+    } else {
+        // Copy out of the MQTT client's buffer so it can be transferred
+        const bytes = payload.slice();
+        decoder.postMessage({type: type, payload: bytes}, [bytes.buffer]);
+    }
+}
+
+function on_decoded(event) {
+    const message = event.data;
+    let type = message.type;
+    if (type === "activation") {
+        latest_packet = message.packet;
+    } else if (type === "depth") {
+        if (message.bitmap) {
+            set_depth_image(message.bitmap);
+        } else {
+            load_depth_image(message.bytes);
+        }
+    } else {
+        console.log("Couldn't decode " + message.source + ": " + message.error);
+        type = message.source;
+    }
+
+    decoding[type] = false;
+    const payload = waiting_payloads[type];
+    if (payload !== undefined && payload !== null) {
+        waiting_payloads[type] = null;
+        decode_in_background(type, payload);
+    }
+}
+
+function load_models() {
+    // Fetch the packed model of every level (written by scripts/export_visualizer_models.py)
+    for (const level in MODEL_FILES) {
+        load_model_pack(MODEL_FILES[level])
+            .then(pack => {
+                level_models[level] = pack;
+                console.log("Loaded model for level " + level);
+                if (pending_model_level == level) {
+                    init_model(pending_model_level);
+                }
+            })
+            .catch(error => console.log("Couldn't load " + MODEL_FILES[level] + ": " + error));
     }
 }
 
@@ -572,7 +681,8 @@ function init() {
     client.onMessageArrived = myMethod; // onMessageArrived;
 
     // connect the client
-    client.connect({onSuccess:onConnect});
+    // The broker announces we went offline if the page dies without disconnecting
+    client.connect({onSuccess:onConnect, willMessage: visualizer_status_message(false)});
 
     // Canvas for the nodes and output of neural network
     canvas = document.getElementById("visualizer");
@@ -639,10 +749,15 @@ function init() {
     frameCanvas = document.createElement('canvas');
     // This one will hold a model weight image overlay to see what the network is picking up on
     weightImageCanvas = document.createElement('canvas');
+    // Offscreen layers holding what only changes with the model: the level highlight and the idle network
+    backgroundLayer = document.createElement('canvas');
+    networkLayer = document.createElement('canvas');
 
     // A listener to appropriately resize our canvases when the window size changes
     window.addEventListener('resize', onWindowResizeV, false);
 
+    start_decoder();
+    load_models();
     initialized = true;
 }
  
@@ -686,7 +801,10 @@ function onWindowResizeV() {
 
     infoCanvas_width = infoCanvas.width
     infoCanvas_height = infoCanvas.height
-    
+
+    // Resizing cleared the depth canvas, and the cached layers and positions depend on the canvas size
+    drawnDepthImage = null;
+    if (model_initialized) init_model(current_model_level);
 }
 
 // This function gets set from opponent.js
@@ -703,14 +821,24 @@ var canvas = null;
 var d_canvas = null;
 var frameCanvas = null;
 var weightImageCanvas = null;
+var backgroundLayer = null; // Offscreen: level highlight
+var networkLayer = null; // Offscreen: idle neurons and output labels
+var frameImageData = null; // Reused pixel buffer of the game frame
+var weightImageNeuron = null; // Neuron currently drawn in weightImageCanvas
 var infoCanvas = null;
 
 // Track initialization status
 var initialized = false;
 var model_initialized = false;
+var render_loop_started = false;
 
 // Structure data
-var hidden_weights = null;
+// Open the page with ?game=<id> to watch one station of a shared AI server, whose topics live under games/<id>/
+var GAME_ID = new URLSearchParams(window.location.search).get("game");
+var MODEL_FILES = {1: "models/easy.bin", 2: "models/medium.bin", 3: "models/hard.bin"};
+var level_models = {}; // Decoded model packs by level, filled in as they download
+var pending_model_level = null; // Level requested before its model finished downloading
+var current_model_level = null;
 var hidden_biases = null;
 var output_weights = null;
 var output_biases = null;
@@ -720,12 +848,16 @@ var pixel_pos = null;
 var hidden_pos = null;
 var out_pos = null;
 
-// Weights that are important enough to render
-var significant_hw = null;
-var significant_ow = null;
+// Neuron scale factors from the biases
+var hidden_scales = null;
+var output_scales = null;
+
+// Weights that are important enough to render, as {inputs, outputs, widths} edge lists from the model pack
+var hidden_edges = null;
+var output_edges = null;
 
-// Precompute normalized hidden weights for nicer rendering
-var rescaled_hw = null;
+// Weight image of each hidden neuron, [neuron][pixel] bytes
+var hidden_weight_maps = null;
 
 // Rendering config
 var NEURON_SIZE = null;
@@ -752,8 +884,14 @@ var d_canvas_height = null;
 var infoCanvas_width = null;
 var infoCanvas_height = null;
 
-var last_activations = null;
-var last_rendered_activations = null;
+var last_activations = null; // Undecoded payload, only used when decoding on the UI thread
+var latest_packet = null; // Most recent decoded ai/activation message
+var last_rendered_packet = null;
+
+// Payload decoding in the worker (decode_worker.js)
+var decoder = null;
+var decoding = {}; // Payload types currently being decoded
+var waiting_payloads = {}; // Newest payload of each type that arrived while decoding
 
 let rightInterval1;
 let rightInterval0;
@@ -780,6 +918,9 @@ var visResizeCounter = 1;
 // A value that we use for moving the info labels in
 var info_step = 40;
 
-var depthFeedStr = "";
+var depthImage = null; // Latest decoded depth camera image (ImageBitmap or Image)
+var drawnDepthImage = null;
+var VISUALIZER_HEARTBEAT_MS = 2000;
+var visualizerHeartbeat = null;
 
 window.onload = init
\ No newline at end of file